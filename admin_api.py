@@ -0,0 +1,193 @@
+"""管理接口模块 - 需要管理员令牌的运维接口"""
+
+import secrets
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from bulk_grant import bulk_grant_runner
+from config import settings
+from database import async_engine, get_session
+from export_service import iter_export
+from json_response import api_response
+from profiler import profile_event_loop, profile_in_progress
+from runtime_config import runtime_settings, update_settings
+from schemas import (
+    ApiResponse,
+    BulkGrantJobData,
+    BulkGrantRequest,
+    RuntimeSettings,
+    Stats,
+)
+from stats_service import read_stats
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def require_admin(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+):
+    """校验管理员令牌"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="管理接口未启用")
+
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials, settings.admin_token
+    ):
+        raise HTTPException(status_code=401, detail="管理员令牌无效")
+
+
+router = APIRouter(
+    prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)]
+)
+
+
+@router.get("/stats", response_model=ApiResponse[Stats])
+async def get_stats(
+    days: int = Query(7, ge=1, le=90, description="返回最近多少天的按天领取数"),
+    session: AsyncSession = Depends(get_session),
+):
+    """获取库存与领取统计（读取物化计数器，不扫描业务表）"""
+    try:
+        stats = await read_stats(session, days=days)
+        return api_response(stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
+
+
+@router.get("/export")
+async def export_records(
+    format: Literal["csv", "ndjson"] = Query("csv", description="导出格式"),
+    start: Optional[datetime] = Query(None, description="起始时间（包含）"),
+    end: Optional[datetime] = Query(None, description="结束时间（不包含）"),
+    source: Optional[str] = Query(None, description="只导出指定来源"),
+):
+    """流式导出兑换记录（含归档记录），内存占用与表大小无关"""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"redeem_records_{datetime.now():%Y%m%d%H%M%S}.{format}"
+    return StreamingResponse(
+        iter_export(async_engine, format, start, end, source),
+        media_type=f"{media_type}; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0, description="采样时长（秒）"),
+    interval_ms: float = Query(5, ge=1, le=1000, description="采样间隔（毫秒）"),
+):
+    """
+    对事件循环做采样剖析，返回 collapsed stack 文本
+
+    可直接交给 flamegraph.pl 或 speedscope 生成火焰图，同一时间只允许一个剖析。
+    """
+    if seconds > settings.profile_max_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"采样时长不能超过 {settings.profile_max_seconds} 秒",
+        )
+    if profile_in_progress():
+        raise HTTPException(status_code=409, detail="已有剖析正在进行")
+
+    profiler = await profile_event_loop(seconds, interval_ms / 1000)
+    filename = f"profile_{datetime.now():%Y%m%d%H%M%S}.collapsed"
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Profile-Samples": str(profiler.samples),
+        },
+    )
+
+
+@router.post("/grants", response_model=ApiResponse[BulkGrantJobData])
+async def create_bulk_grant(body: BulkGrantRequest):
+    """
+    创建批量发放任务
+
+    任务在后台分批申请兑换码并写入兑换记录，可通过 /api/admin/grants/{job_id}/progress
+    以 NDJSON 查看进度。
+    """
+    if len(body.users) > settings.bulk_grant_max_users:
+        raise HTTPException(
+            status_code=400,
+            detail=f"发放对象不能超过 {settings.bulk_grant_max_users} 个",
+        )
+    users = [
+        (user, None) if isinstance(user, int) else (user.user_id, user.username)
+        for user in body.users
+    ]
+    job = await bulk_grant_runner.create(body.name, body.quota, users)
+    return api_response(job, message="批量发放任务已创建")
+
+
+@router.get("/grants", response_model=ApiResponse[List[BulkGrantJobData]])
+async def list_bulk_grants(
+    limit: int = Query(20, ge=1, le=100, description="返回最近多少个任务"),
+):
+    """最近的批量发放任务"""
+    return api_response(await bulk_grant_runner.list(limit))
+
+
+@router.get("/grants/{job_id}", response_model=ApiResponse[BulkGrantJobData])
+async def get_bulk_grant(job_id: int):
+    """批量发放任务状态"""
+    job = await bulk_grant_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return api_response(job)
+
+
+@router.get("/grants/{job_id}/progress")
+async def stream_bulk_grant(job_id: int):
+    """以 NDJSON 推送任务进度（每完成一批推送一行），任务结束后关闭连接"""
+    if await bulk_grant_runner.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return StreamingResponse(
+        bulk_grant_runner.iter_progress(job_id),
+        media_type="application/x-ndjson; charset=utf-8",
+    )
+
+
+@router.post("/grants/{job_id}/resume", response_model=ApiResponse[BulkGrantJobData])
+async def resume_bulk_grant(job_id: int):
+    """从检查点继续失败或中断的批量发放任务"""
+    try:
+        job = await bulk_grant_runner.resume(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return api_response(job, message="批量发放任务已继续")
+
+
+@router.get("/settings", response_model=ApiResponse[RuntimeSettings])
+async def get_runtime_settings():
+    """可运行时修改的配置项的当前值与最近的修改记录"""
+    return api_response(runtime_settings())
+
+
+@router.patch("/settings", response_model=ApiResponse[RuntimeSettings])
+async def patch_runtime_settings(
+    request: Request,
+    changes: Dict[str, Any] = Body(..., description="配置项 -> 新值"),
+):
+    """
+    运行时修改配置（不重启进程，重启后恢复为 .env 中的值）
+
+    只能修改 runtime_config.TUNABLE_SETTINGS 中的配置项；任何一项不合法时全部不生效。
+    """
+    if not changes:
+        raise HTTPException(status_code=400, detail="没有要修改的配置项")
+    source = request.client.host if request.client else "-"
+    try:
+        applied = update_settings(changes, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return api_response(
+        {**runtime_settings(), "applied": applied},
+        message=f"已修改 {len(applied)} 个配置项",
+    )
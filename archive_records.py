@@ -0,0 +1,42 @@
+"""兑换记录归档脚本"""
+
+import argparse
+import logging
+from archive_service import archive_cutoff, archive_old_records_sync
+from config import settings
+from database import create_db_and_tables, sync_engine
+from logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将过期的兑换记录按月移动到归档表")
+    parser.add_argument(
+        "--horizon-days",
+        type=int,
+        default=settings.archive_horizon_days,
+        help=f"热表保留最近多少天的记录（默认 {settings.archive_horizon_days}）",
+    )
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批移动的记录数")
+    parser.add_argument(
+        "--vacuum", action="store_true", help="归档完成后执行 VACUUM 回收热表空间"
+    )
+    args = parser.parse_args()
+    setup_logging(log_format="text")
+
+    create_db_and_tables()
+
+    cutoff = archive_cutoff(args.horizon_days)
+    logger.info("📦 归档 %s 之前的兑换记录...", f"{cutoff:%Y-%m-%d}")
+    moved = archive_old_records_sync(sync_engine, args.horizon_days, args.batch_size)
+    logger.info("✅ 已移动 %d 条兑换记录到归档表", moved)
+
+    if args.vacuum and moved:
+        with sync_engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        logger.info("🧹 VACUUM 完成")
+
+
+if __name__ == "__main__":
+    main()
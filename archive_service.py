@@ -0,0 +1,321 @@
+"""兑换记录归档模块 - 将过期的 user_redeem_records 按月迁移到归档表
+
+热表 user_redeem_records 只保留最近 archive_horizon_days 天的记录，
+更早的记录按兑换月份移动到 user_redeem_records_YYYYMM 归档表。
+归档表结构与热表相同，并带有 (user_id, redeemed_at) 索引，
+历史查询按"热表 → 归档表（由新到旧）"的顺序透明地翻页。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import (
+    Column,
+    Index,
+    MetaData,
+    Table,
+    delete,
+    func,
+    insert,
+    select,
+    text,
+    tuple_,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+from models import UserRedeemRecord
+
+logger = logging.getLogger(__name__)
+
+HOT_TABLE: Table = UserRedeemRecord.__table__
+ARCHIVE_PREFIX = f"{HOT_TABLE.name}_"
+
+# 归档表列表缓存刷新间隔（秒），其他进程执行归档后最多延迟这么久可见
+_ARCHIVE_LIST_TTL = 60.0
+
+_archive_metadata = MetaData()
+_archive_tables: Dict[str, Table] = {}
+_archive_names: Optional[List[str]] = None
+_archive_names_loaded_at = 0.0
+
+
+def archive_table_name(when: datetime) -> str:
+    """记录所属的归档表名"""
+    return f"{ARCHIVE_PREFIX}{when:%Y%m}"
+
+
+def get_archive_table(name: str) -> Table:
+    """获取（必要时定义）指定名称的归档表"""
+    table = _archive_tables.get(name)
+    if table is None:
+        table = Table(
+            name,
+            _archive_metadata,
+            *(Column(c.name, c.type, primary_key=c.primary_key) for c in HOT_TABLE.c),
+        )
+        Index(f"ix_{name}_user_redeemed", table.c.user_id, table.c.redeemed_at)
+        Index(f"ix_{name}_redeemed_id", table.c.redeemed_at, table.c.id)
+        _archive_tables[name] = table
+    return table
+
+
+def create_archive_table(conn: Connection, name: str) -> Table:
+    """创建归档表，并为已存在的归档表补建新增的索引"""
+    table = get_archive_table(name)
+    table.create(conn, checkfirst=True)
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+    return table
+
+
+def month_range(name: str) -> Tuple[datetime, datetime]:
+    """归档表覆盖的时间范围 [月初, 下月初)"""
+    start = datetime.strptime(name[len(ARCHIVE_PREFIX) :], "%Y%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def list_archive_names(conn: Connection) -> List[str]:
+    """从 sqlite_master 读取归档表名，按月份由新到旧排序"""
+    rows = conn.execute(
+        text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name GLOB :pattern ORDER BY name DESC"
+        ),
+        {"pattern": f"{ARCHIVE_PREFIX}[0-9][0-9][0-9][0-9][0-9][0-9]"},
+    )
+    return [row[0] for row in rows]
+
+
+async def get_archive_names(session: AsyncSession) -> List[str]:
+    """获取归档表名列表（带缓存）"""
+    global _archive_names, _archive_names_loaded_at
+
+    now = time.monotonic()
+    if _archive_names is None or now - _archive_names_loaded_at > _ARCHIVE_LIST_TTL:
+        connection = await session.connection()
+        _archive_names = await connection.run_sync(list_archive_names)
+        _archive_names_loaded_at = now
+    return _archive_names
+
+
+def _invalidate_archive_names():
+    global _archive_names
+    _archive_names = None
+
+
+def _archive_batch(
+    conn: Connection, start: datetime, end: datetime, batch_size: int
+) -> int:
+    """
+    将 [start, end) 内的一批记录移动到对应月份的归档表
+
+    INSERT 与 DELETE 选取同一批 id，并在调用方的同一事务中执行。
+
+    Returns:
+        本批移动的记录数
+    """
+    archive = create_archive_table(conn, archive_table_name(start))
+
+    batch_ids = (
+        select(HOT_TABLE.c.id)
+        .where(HOT_TABLE.c.redeemed_at >= start)
+        .where(HOT_TABLE.c.redeemed_at < end)
+        .order_by(HOT_TABLE.c.id)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    columns = [c.name for c in HOT_TABLE.c]
+    conn.execute(
+        insert(archive).from_select(
+            columns, select(*HOT_TABLE.c).where(HOT_TABLE.c.id.in_(batch_ids))
+        )
+    )
+    return conn.execute(delete(HOT_TABLE).where(HOT_TABLE.c.id.in_(batch_ids))).rowcount
+
+
+def _pending_months(conn: Connection, cutoff: datetime) -> List[Tuple[datetime, datetime]]:
+    """需要归档的月份范围，结束时间不超过 cutoff"""
+    oldest = conn.execute(
+        select(func.min(HOT_TABLE.c.redeemed_at)).where(
+            HOT_TABLE.c.redeemed_at < cutoff
+        )
+    ).scalar()
+    if oldest is None:
+        return []
+
+    months = []
+    start = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while start < cutoff:
+        end = (start + timedelta(days=32)).replace(day=1)
+        months.append((start, min(end, cutoff)))
+        start = end
+    return months
+
+
+def archive_cutoff(horizon_days: Optional[int] = None) -> datetime:
+    """归档分界时间：早于该时间的记录会被归档"""
+    horizon_days = settings.archive_horizon_days if horizon_days is None else horizon_days
+    if horizon_days < 2:
+        # 每日领取检查只查询热表，至少保留今天和昨天的记录
+        raise ValueError("archive_horizon_days 不能小于 2")
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=horizon_days)
+
+
+def archive_old_records_sync(
+    engine, horizon_days: Optional[int] = None, batch_size: int = 5000
+) -> int:
+    """
+    同步执行归档（用于命令行脚本）
+
+    Returns:
+        移动的记录总数
+    """
+    cutoff = archive_cutoff(horizon_days)
+    moved = 0
+    with engine.connect() as conn:
+        months = _pending_months(conn, cutoff)
+    for start, end in months:
+        while True:
+            with engine.begin() as conn:
+                count = _archive_batch(conn, start, end, batch_size)
+            moved += count
+            if count < batch_size:
+                break
+    _invalidate_archive_names()
+    return moved
+
+
+async def archive_old_records(
+    engine, horizon_days: Optional[int] = None, batch_size: int = 5000
+) -> int:
+    """
+    异步执行归档，每批一个短事务，避免长时间占用写锁
+
+    Returns:
+        移动的记录总数
+    """
+    cutoff = archive_cutoff(horizon_days)
+    moved = 0
+    async with engine.connect() as conn:
+        months = await conn.run_sync(_pending_months, cutoff)
+    for start, end in months:
+        while True:
+            async with engine.begin() as conn:
+                count = await conn.run_sync(_archive_batch, start, end, batch_size)
+            moved += count
+            if count < batch_size:
+                break
+            # 让出事件循环，避免批量归档阻塞请求处理
+            await asyncio.sleep(0)
+    _invalidate_archive_names()
+    return moved
+
+
+async def archive_loop(engine, interval_hours: float):
+    """后台定期归档任务"""
+    while True:
+        try:
+            moved = await archive_old_records(engine)
+            if moved:
+                logger.info("归档任务完成，移动 %d 条兑换记录", moved)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("归档任务失败: %s", e)
+        await asyncio.sleep(interval_hours * 3600)
+
+
+def encode_cursor(redeemed_at: datetime, record_id: int) -> str:
+    """生成历史记录翻页游标"""
+    return f"{record_id}@{redeemed_at.isoformat()}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    解析历史记录翻页游标
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    record_id, sep, redeemed_at = cursor.partition("@")
+    try:
+        if not sep:
+            raise ValueError
+        return datetime.fromisoformat(redeemed_at), int(record_id)
+    except ValueError:
+        raise ValueError(f"无效的翻页游标: {cursor}") from None
+
+
+async def fetch_history(
+    session: AsyncSession,
+    user_id: int,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    分页获取用户兑换历史，热表读完后自动延续到归档表
+
+    Args:
+        session: 数据库会话
+        user_id: 用户ID
+        limit: 每页数量
+        cursor: 上一页返回的 next_cursor，为空表示第一页
+
+    Returns:
+        包含 history、next_cursor，第一页额外包含 total
+    """
+    before = decode_cursor(cursor) if cursor else None
+    archive_names = await get_archive_names(session)
+    tables = [HOT_TABLE] + [get_archive_table(name) for name in archive_names]
+
+    history: List[Dict[str, Any]] = []
+    last: Optional[Tuple[datetime, int]] = None
+    for table in tables:
+        remaining = limit - len(history)
+        if remaining <= 0:
+            break
+        if table is not HOT_TABLE and before is not None:
+            month_start, _ = month_range(table.name)
+            if month_start > before[0]:
+                continue
+
+        query = (
+            select(table.c.id, table.c.code, table.c.redeemed_at)
+            .where(table.c.user_id == user_id)
+            .order_by(table.c.redeemed_at.desc(), table.c.id.desc())
+            .limit(remaining)
+        )
+        if before is not None:
+            query = query.where(
+                tuple_(table.c.redeemed_at, table.c.id) < tuple_(*before)
+            )
+
+        for row in await session.execute(query):
+            history.append(
+                {"code": row.code, "redeemed_at": row.redeemed_at}
+            )
+            last = (row.redeemed_at, row.id)
+
+    data: Dict[str, Any] = {
+        "history": history,
+        "next_cursor": encode_cursor(*last) if last and len(history) == limit else None,
+    }
+
+    if cursor is None:
+        total = 0
+        for table in tables:
+            total += (
+                await session.execute(
+                    select(func.count()).select_from(table).where(
+                        table.c.user_id == user_id
+                    )
+                )
+            ).scalar_one()
+        data["total"] = total
+
+    return data
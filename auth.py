@@ -0,0 +1,80 @@
+"""认证模块 - 基于会话、带缓存的用户认证依赖"""
+
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from fastapi import HTTPException, Request
+from config import settings
+from oauth2_service import oauth2_service
+from ratelimit import check_user_limit
+from sessions import get_session_id, session_store
+from token_refresh import token_refresher
+
+
+class UserInfoCache:
+    """access_token -> 用户信息的 LRU + TTL 缓存，避免每个请求都调用上游认证"""
+
+    def __init__(self, ttl: float, max_size: int):
+        """
+        Args:
+            ttl: 缓存有效期（秒）
+            max_size: 最多缓存的 token 数量
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    def get(self, access_token: str) -> Optional[dict]:
+        entry = self._entries.get(access_token)
+        if entry is None:
+            return None
+        expires_at, user_info = entry
+        if expires_at <= time.monotonic():
+            del self._entries[access_token]
+            return None
+        self._entries.move_to_end(access_token)
+        return user_info
+
+    def set(self, access_token: str, user_info: dict):
+        self._entries[access_token] = (time.monotonic() + self.ttl, user_info)
+        self._entries.move_to_end(access_token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+user_info_cache = UserInfoCache(settings.auth_cache_ttl, settings.auth_cache_size)
+
+
+async def authenticate(request: Request, access_token: str) -> dict:
+    """
+    校验访问令牌并按用户限流
+
+    Args:
+        request: 当前请求（用于确定限流路由）
+        access_token: 访问令牌
+
+    Returns:
+        用户信息字典
+    """
+    user_info = user_info_cache.get(access_token)
+    if user_info is None:
+        try:
+            user_info = await oauth2_service.get_user_info(access_token)
+        except Exception as e:
+            raise HTTPException(status_code=401, detail=f"认证失败: {str(e)}")
+        if settings.auth_cache_ttl > 0:
+            user_info_cache.set(access_token, user_info)
+
+    check_user_limit(request, user_info["id"])
+    return user_info
+
+
+async def get_current_user(request: Request) -> dict:
+    """当前登录用户（FastAPI 依赖），由会话 Cookie 中保存的访问令牌认证"""
+    session_id = get_session_id(request)
+    data = await session_store.get(session_id) if session_id else None
+    if not data or not data.get("access_token"):
+        raise HTTPException(status_code=401, detail="未登录或登录已过期")
+    # 正常情况下 token 已在过期前由后台刷新，这里只处理错过刷新的会话
+    data = await token_refresher.ensure_fresh(session_id, data)
+    return await authenticate(request, data["access_token"])
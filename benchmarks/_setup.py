@@ -0,0 +1,28 @@
+"""基准测试环境准备
+
+必须在导入 config / database 之前调用，确保基准测试使用临时 SQLite 文件，
+不会触碰真实数据库。
+"""
+
+import os
+import tempfile
+
+
+_db_path = None
+
+
+def use_temp_database() -> str:
+    """
+    将 DATABASE_URL 指向临时目录中的 SQLite 文件（同一进程内只创建一次）
+
+    Returns:
+        临时数据库文件路径
+    """
+    global _db_path
+    if _db_path is None:
+        tmp_dir = tempfile.mkdtemp(prefix="newapi-bench-")
+        _db_path = os.path.join(tmp_dir, "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_path}"
+        os.environ.setdefault("OAUTH2_CLIENT_ID", "bench")
+        os.environ.setdefault("OAUTH2_CLIENT_SECRET", "bench")
+    return _db_path
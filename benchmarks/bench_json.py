@@ -0,0 +1,97 @@
+"""大体量兑换历史响应的序列化开销基准测试
+
+对比原先的"isoformat + jsonable_encoder + JSONResponse"路径与
+FastJSONResponse 在各个可用后端下的耗时。
+
+用法:
+    python -m benchmarks.bench_json --items 10000 --repeat 20
+"""
+
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from benchmarks._setup import use_temp_database
+
+use_temp_database()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+import json_response  # noqa: E402
+
+
+def _history_payload(items: int) -> dict:
+    now = datetime.now()
+    history = [
+        {"code": f"CODE-{i:012d}", "redeemed_at": now - timedelta(days=i)}
+        for i in range(items)
+    ]
+    return {
+        "success": True,
+        "data": {"history": history, "next_cursor": None, "total": items},
+    }
+
+
+def _with_isoformat(payload: dict) -> dict:
+    """原接口的做法：组装响应前逐条调用 isoformat"""
+    data = payload["data"]
+    history = [
+        {"code": item["code"], "redeemed_at": item["redeemed_at"].isoformat()}
+        for item in data["history"]
+    ]
+    return {"success": True, "data": {**data, "history": history}}
+
+
+def _backends() -> dict:
+    """可用的序列化后端"""
+    backends = {
+        "json": lambda content: json.dumps(
+            content,
+            ensure_ascii=False,
+            separators=(",", ":"),
+            default=json_response._default,
+        ).encode("utf-8")
+    }
+    if json_response.msgspec is not None:
+        encoder = json_response.msgspec.json.Encoder()
+        backends["msgspec"] = encoder.encode
+    if json_response.orjson is not None:
+        backends["orjson"] = lambda content: json_response.orjson.dumps(
+            content, option=json_response.orjson.OPT_NON_STR_KEYS
+        )
+    return backends
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 序列化基准测试")
+    parser.add_argument("--items", type=int, default=10000, help="历史记录条数")
+    parser.add_argument("--repeat", type=int, default=20, help="重复次数")
+    args = parser.parse_args()
+
+    payload = _history_payload(args.items)
+
+    def baseline():
+        return JSONResponse(jsonable_encoder(_with_isoformat(payload))).body
+
+    results = {
+        "原路径 (isoformat + jsonable_encoder + JSONResponse)": min(
+            timeit.repeat(baseline, number=1, repeat=args.repeat)
+        )
+    }
+    for name, encode in _backends().items():
+        results[f"{name} (datetime 原生序列化)"] = min(
+            timeit.repeat(lambda: encode(payload), number=1, repeat=args.repeat)
+        )
+
+    size = len(json_response.dumps(payload))
+    print(f"📦 {args.items} 条历史记录，响应体 {size / 1024:.1f} KiB")
+    print(f"   FastJSONResponse 当前后端: {json_response.JSON_BACKEND}")
+    for name, seconds in results.items():
+        print(f"  - {name}: {seconds * 1000:.2f} ms")
+    # 新旧路径输出的 JSON 语义一致
+    assert json.loads(json_response.dumps(payload)) == json.loads(baseline())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""旧兑换码池并发分配基准测试
+
+用法:
+    python -m benchmarks.bench_legacy_pool --pool 1000000 --claims 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks._setup import use_temp_database
+
+DB_PATH = use_temp_database()
+
+from sqlalchemy import text  # noqa: E402
+from database import async_engine, async_session_maker, init_db  # noqa: E402
+from import_codes import _import_stream  # noqa: E402
+from legacy_pool import allocate_legacy_code  # noqa: E402
+import models  # noqa: E402,F401  注册数据表
+
+
+async def _claimer(user_id: int, remaining: list, latencies: list, claimed: list):
+    """持续领取直到达到目标数量"""
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        started = time.perf_counter()
+        async with async_session_maker() as session:
+            result = await allocate_legacy_code(session, user_id)
+            await session.commit()
+        latencies.append(time.perf_counter() - started)
+        if result is not None:
+            claimed.append(result[0])
+
+
+async def run(pool_size: int, claims: int, concurrency: int):
+    await init_db()
+    print(f"📦 准备 {pool_size} 个兑换码的兑换码池: {DB_PATH}")
+    _import_stream(f"BENCH-{i:010d}" for i in range(pool_size))
+
+    async with async_engine.connect() as conn:
+        plan = await conn.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT id FROM redeem_codes "
+                "WHERE is_used = 0 ORDER BY id LIMIT 1"
+            )
+        )
+        print("🔍 查询计划: " + "; ".join(row[-1] for row in plan))
+
+    remaining = [claims]
+    latencies: list = []
+    claimed: list = []
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _claimer(user_id, remaining, latencies, claimed)
+            for user_id in range(concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - started
+
+    async with async_engine.connect() as conn:
+        used = (
+            await conn.execute(text("SELECT COUNT(*) FROM redeem_codes WHERE is_used = 1"))
+        ).scalar_one()
+    await async_engine.dispose()
+
+    latencies.sort()
+    print(f"\n📊 并发 {concurrency}，共领取 {len(claimed)} 个兑换码")
+    print(f"  - 吞吐: {len(claimed) / elapsed:,.0f} 次/秒")
+    print(f"  - 延迟 p50: {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"  - 延迟 p99: {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+    print(f"  - 重复分配: {len(claimed) - len(set(claimed))}")
+    print(f"  - 数据库已使用数: {used}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="旧兑换码池并发分配基准测试")
+    parser.add_argument("--pool", type=int, default=1_000_000, help="兑换码池大小")
+    parser.add_argument("--claims", type=int, default=5000, help="领取次数")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发领取者数量")
+    args = parser.parse_args()
+    asyncio.run(run(args.pool, args.claims, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""大量日志输出时的事件循环延迟基准测试
+
+模拟 stdout 被下游（终端、管道、日志采集器）拖慢的情况：输出流每次 write
+都会阻塞一段时间。对比三种写日志方式下事件循环的调度延迟：
+
+- print：原先 queue_manager 的做法，直接在事件循环中写 stdout
+- StreamHandler：标准 logging，但仍在调用线程中同步写出
+- QueueHandler：logging_config.setup_logging()，写出在后台线程中完成
+
+用法:
+    python -m benchmarks.bench_logging --producers 20 --messages 500 --write-delay-us 50
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from benchmarks._setup import use_temp_database
+
+use_temp_database()
+
+import logging_config  # noqa: E402
+
+
+class SlowStream:
+    """每次写入都阻塞一段时间的输出流"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, data: str) -> int:
+        time.sleep(self.delay)
+        self.writes += 1
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+async def _probe(lags: list, stop: asyncio.Event, interval: float = 0.001):
+    """测量事件循环的调度延迟：sleep(interval) 实际多睡了多久"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - expected)
+
+
+async def _produce(emit, worker_id: int, messages: int):
+    """模拟工作进程：每处理一个任务写一条日志"""
+    for i in range(messages):
+        emit(worker_id, i)
+        await asyncio.sleep(0)
+
+
+async def _run(emit, producers: int, messages: int) -> tuple:
+    lags: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(_produce(emit, w, messages) for w in range(producers)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    return sorted(lags), elapsed
+
+
+def _percentile(values: list, q: float) -> float:
+    return values[min(int(len(values) * q), len(values) - 1)] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志输出对事件循环延迟的影响")
+    parser.add_argument("--producers", type=int, default=20, help="并发写日志的协程数")
+    parser.add_argument("--messages", type=int, default=500, help="每个协程写的日志条数")
+    parser.add_argument(
+        "--write-delay-us", type=float, default=50, help="输出流每次 write 阻塞的微秒数"
+    )
+    args = parser.parse_args()
+
+    delay = args.write_delay_us / 1e6
+    logger = logging.getLogger("bench")
+    results = {}
+
+    stream = SlowStream(delay)
+
+    def emit_print(worker_id, i):
+        print(f"任务 {worker_id}-{i} 处理完成", file=stream)
+
+    results["print"] = asyncio.run(_run(emit_print, args.producers, args.messages))
+
+    root = logging.getLogger()
+    handler = logging.StreamHandler(SlowStream(delay))
+    handler.setFormatter(logging_config.JSONFormatter())
+    root.handlers[:] = [handler]
+    root.setLevel(logging.INFO)
+
+    def emit_log(worker_id, i):
+        logger.info("任务处理完成", extra={"task_id": f"{worker_id}-{i}"})
+
+    results["StreamHandler (同步写出)"] = asyncio.run(
+        _run(emit_log, args.producers, args.messages)
+    )
+
+    logging_config.setup_logging(level="INFO", log_format="json", stream=SlowStream(delay))
+    results["QueueHandler (logging_config)"] = asyncio.run(
+        _run(emit_log, args.producers, args.messages)
+    )
+    # 等待后台线程写完剩余日志，单独计时
+    drain_started = time.perf_counter()
+    logging_config.shutdown_logging()
+    drain = time.perf_counter() - drain_started
+
+    total = args.producers * args.messages
+    print(
+        f"📝 {args.producers} 个协程 × {args.messages} 条日志 = {total} 条，"
+        f"每次写入阻塞 {args.write_delay_us:g} µs"
+    )
+    for name, (lags, elapsed) in results.items():
+        print(
+            f"  - {name}: 事件循环延迟 p50 {_percentile(lags, 0.5) * 1000:.2f} ms, "
+            f"p99 {_percentile(lags, 0.99) * 1000:.2f} ms, "
+            f"max {lags[-1] * 1000 if lags else 0:.2f} ms；"
+            f"写日志总耗时 {elapsed * 1000:.0f} ms"
+        )
+    print(f"    QueueHandler 后台线程写完剩余日志耗时 {drain * 1000:.0f} ms（不占用事件循环）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""启动耗时基准测试
+
+在子进程中启动服务（指向模拟上游与临时 SQLite 文件），测量：
+
+- 就绪耗时：从启动进程到 /health/ready 第一次返回 200
+- 首个请求：就绪后第一次登录回调与第一次页面聚合状态请求的耗时
+- 启动各阶段：服务 /metrics 中的 app_startup_phase_seconds（建表检查、预热各步骤）
+
+对比三种情况：空数据库首次启动、表结构未变时再次启动、关闭预热再次启动。
+
+用法:
+    python -m benchmarks.bench_startup --repeat 3
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.fake_upstreams import (
+    FakeUpstreamConfig,
+    ServerThread,
+    create_app,
+    free_port,
+)
+
+_PHASE_METRIC = "app_startup_phase_seconds"
+
+
+def _start(upstream_url: str, db_path: str, warmup: bool) -> tuple:
+    """启动服务子进程"""
+    port = free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{db_path}",
+        "OAUTH2_CLIENT_ID": "bench",
+        "OAUTH2_CLIENT_SECRET": "bench",
+        "OAUTH2_TOKEN_URL": f"{upstream_url}/oauth2/token",
+        "OAUTH2_USER_INFO_URL": f"{upstream_url}/api/user",
+        "NEWAPI_SITE_URL": upstream_url,
+        "NEWAPI_ACCESS_TOKEN": "bench",
+        "RATE_LIMIT_ENABLED": "False",
+        "STARTUP_WARMUP_ENABLED": str(warmup),
+        "LOG_LEVEL": "ERROR",
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+def _wait_ready(process: subprocess.Popen, base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("服务启动失败")
+        try:
+            if httpx.get(f"{base_url}/health/ready", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError("服务启动超时")
+
+
+def _timed(client: httpx.Client, method: str, url: str, **kwargs) -> float:
+    started = time.perf_counter()
+    response = client.request(method, url, **kwargs)
+    elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f"{url} 返回 HTTP {response.status_code}")
+    return elapsed
+
+
+def _phases(client: httpx.Client) -> Dict[str, float]:
+    """从 /metrics 读取启动各阶段耗时"""
+    phases = {}
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith(_PHASE_METRIC + "{"):
+            labels, _, value = line.rpartition(" ")
+            phases[labels.split('"')[1]] = float(value)
+    return phases
+
+
+def _run_once(upstream_url: str, db_path: str, warmup: bool, user_id: int) -> dict:
+    started = time.perf_counter()
+    process, base_url = _start(upstream_url, db_path, warmup)
+    try:
+        _wait_ready(process, base_url)
+        ready = time.perf_counter() - started
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            login = _timed(
+                client,
+                "GET",
+                "/oauth2/callback",
+                params={"code": f"user-{user_id}", "state": "bench"},
+            )
+            dashboard = _timed(client, "GET", "/api/redeem/dashboard")
+            phases = _phases(client)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"ready": ready, "login": login, "dashboard": dashboard, "phases": phases}
+
+
+def _median(runs: List[dict], key: str) -> float:
+    return statistics.median(run[key] for run in runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="服务启动耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=3, help="每种情况启动的次数")
+    args = parser.parse_args()
+
+    upstream = ServerThread(create_app(FakeUpstreamConfig()), free_port()).start()
+    tmp_dir = tempfile.mkdtemp(prefix="newapi-bench-startup-")
+    shared_db = os.path.join(tmp_dir, "shared.db")
+    scenarios = {
+        "空数据库首次启动": lambda i: (os.path.join(tmp_dir, f"fresh-{i}.db"), True),
+        "表结构未变，预热": lambda i: (shared_db, True),
+        "表结构未变，不预热": lambda i: (shared_db, False),
+    }
+
+    results = {}
+    try:
+        # 先初始化共用数据库，之后的情况都是"表结构未变"
+        _run_once(upstream.url, shared_db, True, user_id=1)
+        user_id = 2
+        for name, setup in scenarios.items():
+            runs = []
+            for i in range(args.repeat):
+                db_path, warmup = setup(i)
+                runs.append(_run_once(upstream.url, db_path, warmup, user_id))
+                user_id += 1
+            results[name] = runs
+    finally:
+        upstream.stop()
+
+    print(f"🚀 每种情况启动 {args.repeat} 次，取中位数")
+    for name, runs in results.items():
+        print(
+            f"  - {name}: 就绪 {_median(runs, 'ready') * 1000:.0f} ms，"
+            f"首次登录 {_median(runs, 'login') * 1000:.1f} ms，"
+            f"首次页面状态 {_median(runs, 'dashboard') * 1000:.1f} ms"
+        )
+        phases = sorted({phase for run in runs for phase in run["phases"]})
+        for phase in phases:
+            values = [run["phases"][phase] for run in runs if phase in run["phases"]]
+            print(f"      {phase:<24} {statistics.median(values) * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
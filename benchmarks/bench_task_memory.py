@@ -0,0 +1,122 @@
+"""队列任务的内存占用基准测试
+
+队列管理器会在内存中保留当天的全部任务，高峰期可达百万级。用 tracemalloc 统计
+以 QueueManager.tasks 的方式保存 N 个已完成任务时，平均每个任务占用的字节数：
+
+- legacy：原先的表示，普通 dataclass，UUID 字符串作为任务 ID 与字典键，
+  时间为 datetime 对象，用户名每次从上游响应中解析得到（各自独立的字符串）
+- compact：当前的 RedeemTask，slots、整数任务 ID、单调时间浮点数、用户名驻留
+
+用法:
+    python -m benchmarks.bench_task_memory --tasks 1000000 --users 100000
+"""
+
+import argparse
+import gc
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+from benchmarks._setup import use_temp_database
+
+use_temp_database()
+
+from queue_manager import RedeemTask, TaskStatus  # noqa: E402
+from tracing import SpanContext  # noqa: E402
+
+
+@dataclass
+class LegacyRedeemTask:
+    """原先的任务表示，仅用于对比"""
+
+    task_id: str
+    user_id: int
+    username: str
+    quota: int
+    status: TaskStatus = TaskStatus.PENDING
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    result: Optional[str] = None
+    error: Optional[str] = None
+    source: str = "newapi_queue"
+    redeem_code_id: Optional[int] = None
+    queue_seq: int = 0
+    trace_context: Optional[SpanContext] = None
+
+
+def _code(i: int) -> str:
+    return f"{i:032x}"
+
+
+def build_legacy(count: int, users: int) -> dict:
+    tasks = {}
+    for i in range(count):
+        task_id = str(uuid.uuid4())
+        now = datetime.now()
+        tasks[task_id] = LegacyRedeemTask(
+            task_id=task_id,
+            user_id=i % users,
+            username=f"user{i % users}",
+            quota=500000,
+            status=TaskStatus.COMPLETED,
+            created_at=now,
+            started_at=datetime.now(),
+            completed_at=datetime.now(),
+            result=_code(i),
+            queue_seq=i,
+        )
+    return tasks
+
+
+def build_compact(count: int, users: int) -> dict:
+    tasks = {}
+    for i in range(count):
+        task = RedeemTask(
+            id=i,
+            user_id=i % users,
+            username=f"user{i % users}",
+            quota=500000,
+            status=TaskStatus.COMPLETED,
+            result=_code(i),
+            queue_seq=i,
+        )
+        task.started = task.completed = task.created
+        tasks[task.id] = task
+    return tasks
+
+
+def measure(build: Callable[[int, int], dict], count: int, users: int) -> float:
+    """返回平均每个任务占用的字节数（含字典中的键与槽位）"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = build(count, users)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(tasks) == count
+    del tasks
+    gc.collect()
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="队列任务内存占用对比")
+    parser.add_argument("--tasks", type=int, default=10**6, help="任务数")
+    parser.add_argument(
+        "--users", type=int, default=10**5, help="不同用户数（多个任务属于同一用户）"
+    )
+    args = parser.parse_args()
+
+    print(f"🧪 {args.tasks} 个已完成任务，{args.users} 个用户")
+    legacy = measure(build_legacy, args.tasks, args.users)
+    print(f"   legacy : {legacy:8.1f} 字节/任务，共 {legacy * args.tasks / 2**20:8.1f} MiB")
+    compact = measure(build_compact, args.tasks, args.users)
+    print(f"   compact: {compact:8.1f} 字节/任务，共 {compact * args.tasks / 2**20:8.1f} MiB")
+    print(f"✅ 每个任务节省 {legacy - compact:.1f} 字节（{1 - compact / legacy:.0%}）")
+
+
+if __name__ == "__main__":
+    main()
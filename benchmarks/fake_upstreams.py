@@ -0,0 +1,230 @@
+"""本地模拟的 OAuth2 与 New API 上游服务
+
+实现服务实际调用的三个接口，响应格式与 connect.linux.do / New API 一致：
+
+- POST /oauth2/token：授权码或 refresh_token 换取 access_token
+  授权码 "user-<id>" 会登录为对应 ID 的用户，方便压测脚本控制用户数
+- GET /api/user：根据 Bearer token 返回用户信息
+- POST /api/redemption/：创建兑换码
+- GET /api/status：New API 状态（健康探测使用）
+
+每个接口可以单独配置延迟、错误率与限流（超限返回 429），用于模拟上游变慢、
+故障或被上游限流时服务的表现。
+
+既可以被压测脚本在进程内启动，也可以单独运行，供手动启动的服务实例使用:
+    python -m benchmarks.fake_upstreams --port 9100 --latency-ms 50 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import random
+import secrets
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qs
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+from benchmarks._setup import use_temp_database
+
+use_temp_database()
+
+from ratelimit import RateLimiter, parse_rate  # noqa: E402
+
+
+@dataclass
+class EndpointBehavior:
+    """单个模拟接口的行为"""
+
+    latency_ms: float = 20.0  # 平均延迟
+    jitter_ms: float = 10.0  # 延迟抖动（均匀分布 ±jitter）
+    error_rate: float = 0.0  # 返回 500 的概率
+    rate_limit: Optional[str] = None  # 全局限流，例如 "100/second"
+
+    def __post_init__(self):
+        self._limiter = None
+        if self.rate_limit:
+            count, period = parse_rate(self.rate_limit)
+            self._limiter = RateLimiter(count, period)
+
+    async def apply(self):
+        """按配置延迟、限流或注入错误"""
+        if self._limiter is not None:
+            retry_after = self._limiter.hit("global")
+            if retry_after:
+                raise HTTPException(
+                    status_code=429,
+                    detail="rate limited",
+                    headers={"Retry-After": str(max(1, round(retry_after)))},
+                )
+
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if self.error_rate and random.random() < self.error_rate:
+            raise HTTPException(status_code=500, detail="injected failure")
+
+
+@dataclass
+class FakeUpstreamConfig:
+    """模拟上游的整体配置"""
+
+    token: EndpointBehavior = field(default_factory=EndpointBehavior)
+    user: EndpointBehavior = field(default_factory=EndpointBehavior)
+    redemption: EndpointBehavior = field(default_factory=EndpointBehavior)
+
+
+def create_app(config: FakeUpstreamConfig) -> FastAPI:
+    """创建模拟上游应用"""
+    app = FastAPI(title="Fake OAuth2 / New API")
+    app.state.stats = {"token": 0, "user": 0, "redemption": 0}
+    tokens: dict = {}  # access_token / refresh_token -> user_id
+
+    def _issue(user_id: int) -> dict:
+        access_token = f"fake-{user_id}-{secrets.token_hex(8)}"
+        refresh_token = f"refresh-{user_id}-{secrets.token_hex(8)}"
+        tokens[access_token] = user_id
+        tokens[refresh_token] = user_id
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expires_in": 3600,
+            "token_type": "bearer",
+        }
+
+    @app.post("/oauth2/token")
+    async def token(request: Request):
+        app.state.stats["token"] += 1
+        await config.token.apply()
+        # 表单很简单，直接解析，避免依赖 python-multipart
+        form = {k: v[0] for k, v in parse_qs((await request.body()).decode()).items()}
+        grant_type = form.get("grant_type")
+        code = form.get("code")
+        refresh_token = form.get("refresh_token")
+        if grant_type == "authorization_code" and code:
+            if code.startswith("user-") and code[5:].isdigit():
+                return _issue(int(code[5:]))
+            return _issue(random.randint(10**6, 10**7))
+        if grant_type == "refresh_token" and refresh_token in tokens:
+            return _issue(tokens.pop(refresh_token))
+        raise HTTPException(status_code=400, detail="invalid_grant")
+
+    @app.get("/api/user")
+    async def user(authorization: str = Header("")):
+        app.state.stats["user"] += 1
+        await config.user.apply()
+        user_id = tokens.get(authorization.removeprefix("Bearer "))
+        if user_id is None:
+            raise HTTPException(status_code=401, detail="invalid token")
+        return {
+            "id": user_id,
+            "username": f"user{user_id}",
+            "name": f"User {user_id}",
+            "active": True,
+            "trust_level": 2,
+            "silenced": False,
+        }
+
+    @app.post("/api/redemption/")
+    async def redemption(request: Request):
+        app.state.stats["redemption"] += 1
+        await config.redemption.apply()
+        payload = await request.json()
+        count = int(payload.get("count", 1))
+        codes = [secrets.token_hex(16) for _ in range(count)]
+        return JSONResponse({"success": True, "message": "", "data": codes})
+
+    @app.get("/api/status")
+    async def status():
+        return {"success": True, "message": "", "data": {"version": "fake"}}
+
+    return app
+
+
+def free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """在后台线程（独立事件循环）中运行的 uvicorn 服务"""
+
+    def __init__(self, app: FastAPI, port: int):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self, timeout: float = 10.0) -> "ServerThread":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("模拟上游启动超时")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def add_behavior_arguments(parser: argparse.ArgumentParser):
+    """添加模拟上游行为相关的命令行参数"""
+    group = parser.add_argument_group("模拟上游")
+    group.add_argument("--latency-ms", type=float, default=20, help="上游平均延迟")
+    group.add_argument("--jitter-ms", type=float, default=10, help="上游延迟抖动")
+    group.add_argument("--error-rate", type=float, default=0.0, help="上游错误率（0-1）")
+    group.add_argument(
+        "--newapi-latency-ms", type=float, help="New API 平均延迟（默认同 --latency-ms）"
+    )
+    group.add_argument("--newapi-error-rate", type=float, help="New API 错误率")
+    group.add_argument("--newapi-rate-limit", help="New API 限流，例如 50/second")
+    group.add_argument("--oauth-rate-limit", help="OAuth2 用户信息接口限流")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeUpstreamConfig:
+    """根据命令行参数构造模拟上游配置"""
+
+    def behavior(latency=None, error_rate=None, rate_limit=None) -> EndpointBehavior:
+        return EndpointBehavior(
+            latency_ms=args.latency_ms if latency is None else latency,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate if error_rate is None else error_rate,
+            rate_limit=rate_limit,
+        )
+
+    return FakeUpstreamConfig(
+        token=behavior(),
+        user=behavior(rate_limit=args.oauth_rate_limit),
+        redemption=behavior(
+            args.newapi_latency_ms, args.newapi_error_rate, args.newapi_rate_limit
+        ),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 OAuth2 与 New API 上游")
+    parser.add_argument("--port", type=int, default=9100, help="监听端口")
+    add_behavior_arguments(parser)
+    args = parser.parse_args()
+
+    app = create_app(config_from_args(args))
+    print(f"🧪 模拟上游: http://127.0.0.1:{args.port}")
+    print(f"   OAUTH2_TOKEN_URL=http://127.0.0.1:{args.port}/oauth2/token")
+    print(f"   OAUTH2_USER_INFO_URL=http://127.0.0.1:{args.port}/api/user")
+    print(f"   NEWAPI_SITE_URL=http://127.0.0.1:{args.port}")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
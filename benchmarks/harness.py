@@ -0,0 +1,83 @@
+"""微基准测试的用例注册与计时工具"""
+
+import inspect
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+@dataclass
+class Measurement:
+    """一个用例的测量结果"""
+
+    ops: int  # 每轮的操作数
+    samples: List[float]  # 每轮的单次操作耗时（秒）
+
+    @property
+    def per_op(self) -> float:
+        return statistics.median(self.samples)
+
+
+@dataclass
+class Benchmark:
+    """注册的用例"""
+
+    name: str
+    fn: Callable[["Options"], Awaitable[Measurement]]
+    slow: bool = False  # --quick 时跳过
+
+
+@dataclass
+class Options:
+    """传给用例的运行参数"""
+
+    repeat: int
+    quick: bool
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, slow: bool = False):
+    """注册一个用例（async def fn(options) -> Measurement）"""
+
+    def decorator(fn):
+        BENCHMARKS.append(Benchmark(name, fn, slow))
+        return fn
+
+    return decorator
+
+
+async def sample(
+    fn: Callable[..., Any],
+    ops: int,
+    repeat: int,
+    setup: Optional[Callable[[], Any]] = None,
+) -> Measurement:
+    """
+    多轮计时
+
+    Args:
+        fn: 被测函数（同步或异步），有 setup 时以 setup 的返回值为参数
+        ops: fn 每次调用包含的操作数
+        repeat: 轮数
+        setup: 每轮计时前执行的准备函数（不计时，可为异步）
+
+    Returns:
+        测量结果
+    """
+    samples = []
+    for _ in range(repeat):
+        args = ()
+        if setup is not None:
+            prepared = setup()
+            if inspect.isawaitable(prepared):
+                prepared = await prepared
+            args = (prepared,)
+        started = time.perf_counter()
+        result = fn(*args)
+        if inspect.isawaitable(result):
+            await result
+        samples.append((time.perf_counter() - started) / ops)
+    return Measurement(ops, samples)
@@ -0,0 +1,327 @@
+"""端到端压测：模拟零点领取高峰
+
+在进程内启动模拟上游（benchmarks.fake_upstreams），在子进程中启动服务并指向模拟上游，
+然后按到达曲线发起虚拟用户，每个用户完整走一遍：
+
+    登录（OAuth2 回调拿到会话 Cookie + /api/bootstrap） → 领取 → 轮询任务直到拿到兑换码 → 查看历史
+
+每个虚拟用户有独立的 AsyncClient（各自的 Cookie），共用同一个连接池。
+
+输出各阶段的吞吐与 p50/p95/p99 延迟，结果写成 JSON，便于在不同提交之间对比。
+
+用法:
+    python -m benchmarks.loadtest --users 2000 --ramp 5 --output results/loadtest.json
+    python -m benchmarks.loadtest --users 500 --newapi-latency-ms 200 --newapi-error-rate 0.05
+
+也可以用 --target 压测已经运行的实例（该实例需自行配置为使用模拟上游或真实上游）。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_upstreams import (
+    ServerThread,
+    add_behavior_arguments,
+    config_from_args,
+    create_app,
+    free_port,
+)
+
+STAGES = ("login", "claim", "poll", "claim_to_code", "history")
+
+
+class Recorder:
+    """按阶段记录延迟与错误"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Counter] = defaultdict(Counter)
+        self.outcomes: Counter = Counter()
+        self.requests = 0
+
+    def ok(self, stage: str, seconds: float):
+        self.latencies[stage].append(seconds)
+
+    def error(self, stage: str, reason: str):
+        self.errors[stage][reason] += 1
+
+    @staticmethod
+    def _percentile(values: List[float], q: float) -> float:
+        return values[min(int(len(values) * q), len(values) - 1)]
+
+    def summary(self, elapsed: float) -> dict:
+        stages = {}
+        for stage in STAGES:
+            values = sorted(self.latencies.get(stage, []))
+            errors = dict(self.errors.get(stage, {}))
+            entry = {"count": len(values), "errors": sum(errors.values())}
+            if errors:
+                entry["error_reasons"] = errors
+            if values:
+                entry.update(
+                    {
+                        "throughput_per_s": round(len(values) / elapsed, 2),
+                        "p50_ms": round(self._percentile(values, 0.50) * 1000, 2),
+                        "p95_ms": round(self._percentile(values, 0.95) * 1000, 2),
+                        "p99_ms": round(self._percentile(values, 0.99) * 1000, 2),
+                        "max_ms": round(values[-1] * 1000, 2),
+                    }
+                )
+            stages[stage] = entry
+        return {
+            "duration_s": round(elapsed, 3),
+            "requests": self.requests,
+            "requests_per_s": round(self.requests / elapsed, 2),
+            "claims_completed_per_s": round(self.outcomes["completed"] / elapsed, 2),
+            "outcomes": dict(self.outcomes),
+            "stages": stages,
+        }
+
+
+class VirtualUser:
+    """一个走完整领取流程的虚拟用户"""
+
+    def __init__(self, client: httpx.AsyncClient, user_id: int, recorder: Recorder, args):
+        self.client = client
+        self.user_id = user_id
+        self.recorder = recorder
+        self.args = args
+
+    async def _request(self, stage: str, method: str, url: str, **kwargs):
+        """发送请求并计时，非 2xx/3xx 记为错误"""
+        self.recorder.requests += 1
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.error(stage, type(e).__name__)
+            return None
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            self.recorder.error(stage, f"HTTP {response.status_code}")
+            return None
+        return response, elapsed
+
+    async def login(self) -> bool:
+        started = time.perf_counter()
+        result = await self._request(
+            "login",
+            "GET",
+            "/oauth2/callback",
+            params={"code": f"user-{self.user_id}", "state": "loadtest"},
+        )
+        if result is None:
+            return False
+
+        # 回调设置的会话 Cookie 已保存在该用户的 client 中
+        result = await self._request("login", "GET", "/api/bootstrap")
+        if result is None:
+            return False
+        logged_in = result[0].json()["data"].get("logged_in", False)
+        if logged_in:
+            self.recorder.ok("login", time.perf_counter() - started)
+        return logged_in
+
+    async def claim(self) -> Optional[str]:
+        result = await self._request("claim", "POST", "/api/redeem/daily")
+        if result is None:
+            return None
+        self.recorder.ok("claim", result[1])
+        return result[0].json()["data"]["task_id"]
+
+    async def wait_for_code(self, task_id: str, claimed_at: float) -> str:
+        """按页面的轮询节奏查询任务状态，返回最终状态"""
+        for _ in range(self.args.poll_attempts):
+            await asyncio.sleep(self.args.poll_interval)
+            result = await self._request("poll", "GET", f"/api/task/{task_id}")
+            if result is None:
+                continue
+            self.recorder.ok("poll", result[1])
+            status = result[0].json()["data"]["status"]
+            if status == "completed":
+                self.recorder.ok("claim_to_code", time.perf_counter() - claimed_at)
+                return status
+            if status == "failed":
+                self.recorder.error("claim_to_code", "task failed")
+                return status
+        self.recorder.error("claim_to_code", "timeout")
+        return "timeout"
+
+    async def history(self):
+        result = await self._request("history", "GET", "/api/redeem/history")
+        if result is not None:
+            self.recorder.ok("history", result[1])
+
+    async def run(self):
+        if not await self.login():
+            self.recorder.outcomes["login_failed"] += 1
+            return
+        claimed_at = time.perf_counter()
+        task_id = await self.claim()
+        if task_id is None:
+            self.recorder.outcomes["claim_failed"] += 1
+            return
+        self.recorder.outcomes[await self.wait_for_code(task_id, claimed_at)] += 1
+        await self.history()
+
+
+async def run_load(base_url: str, args) -> dict:
+    """按到达曲线发起虚拟用户，返回汇总结果"""
+    recorder = Recorder()
+    # 连接池由所有虚拟用户共用；只传入 transport 的 AsyncClient 创建开销很小
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(max_connections=args.connections)
+    )
+    async with transport:
+        # 高峰到达：在 ramp 秒内随机到达，模拟零点前后涌入
+        arrivals = sorted(random.uniform(0, args.ramp) for _ in range(args.users))
+        started = time.perf_counter()
+
+        async def arrive(index: int, at: float):
+            await asyncio.sleep(max(0.0, at - (time.perf_counter() - started)))
+            # 不关闭 client，否则会一并关闭共用的 transport
+            client = httpx.AsyncClient(
+                base_url=base_url, transport=transport, timeout=args.timeout
+            )
+            await VirtualUser(client, args.first_user_id + index, recorder, args).run()
+
+        await asyncio.gather(*(arrive(i, at) for i, at in enumerate(arrivals)))
+        elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _start_service(upstream_url: str, args) -> tuple:
+    """在子进程中启动服务，指向模拟上游"""
+    from benchmarks._setup import use_temp_database
+
+    port = free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{use_temp_database()}",
+        "OAUTH2_CLIENT_ID": "loadtest",
+        "OAUTH2_CLIENT_SECRET": "loadtest",
+        "OAUTH2_TOKEN_URL": f"{upstream_url}/oauth2/token",
+        "OAUTH2_USER_INFO_URL": f"{upstream_url}/api/user",
+        "NEWAPI_SITE_URL": upstream_url,
+        "NEWAPI_ACCESS_TOKEN": "loadtest",
+        "RATE_LIMIT_ENABLED": str(args.rate_limit),
+        "LOG_LEVEL": "ERROR",
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("服务启动失败")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("服务启动超时")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测：模拟零点领取高峰")
+    parser.add_argument("--users", type=int, default=500, help="虚拟用户数")
+    parser.add_argument("--ramp", type=float, default=5.0, help="用户在多少秒内全部到达")
+    parser.add_argument("--connections", type=int, default=200, help="最大并发连接数")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单个请求超时（秒）")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="轮询间隔（秒）")
+    parser.add_argument("--poll-attempts", type=int, default=60, help="最多轮询次数")
+    parser.add_argument("--first-user-id", type=int, default=1, help="第一个虚拟用户的 ID")
+    parser.add_argument(
+        "--rate-limit", action="store_true", help="保留服务的限流（默认关闭，所有请求来自同一 IP）"
+    )
+    parser.add_argument("--target", help="压测已运行的实例，不启动服务与模拟上游")
+    parser.add_argument("--output", "-o", help="结果 JSON 文件路径")
+    add_behavior_arguments(parser)
+    args = parser.parse_args()
+
+    upstream = service = None
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+        else:
+            upstream = ServerThread(create_app(config_from_args(args)), free_port()).start()
+            service, base_url = _start_service(upstream.url, args)
+        print(f"🚀 {args.users} 个用户在 {args.ramp:g} 秒内到达: {base_url}")
+        summary = asyncio.run(run_load(base_url, args))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(timeout=10)
+        if upstream is not None:
+            upstream.stop()
+
+    result = {
+        "commit": _git_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output",)
+        },
+        **summary,
+    }
+
+    print(
+        f"✅ {summary['duration_s']} 秒，{summary['requests']} 个请求 "
+        f"({summary['requests_per_s']} 请求/秒)，结果: {summary['outcomes']}"
+    )
+    for stage, entry in summary["stages"].items():
+        if entry["count"]:
+            print(
+                f"  - {stage:<14} n={entry['count']:<6} "
+                f"p50 {entry['p50_ms']:>8.1f} ms  p95 {entry['p95_ms']:>8.1f} ms  "
+                f"p99 {entry['p99_ms']:>8.1f} ms  错误 {entry['errors']}"
+            )
+        elif entry["errors"]:
+            print(f"  - {stage:<14} 错误 {entry['errors']}: {entry.get('error_reasons')}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""核心路径的微基准测试用例
+
+- 队列：add_task / get_queue_info（大量任务时）、RedeemTask 创建、公平调度队列出入队
+- 数据库：每日领取检查、历史分页（热表 10^3 / 10^5 / 10^7 行）、启动时的建表检查（表结构未变）
+- 导入：import_codes_from_list 吞吐
+
+数据库用例共用 benchmarks._setup 创建的临时 SQLite 文件。
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from sqlalchemy import text
+
+from benchmarks._setup import use_temp_database
+
+use_temp_database()
+# 导入兑换码会逐批写日志，避免干扰基准测试输出
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.harness import Measurement, Options, benchmark, sample  # noqa: E402
+from archive_service import fetch_history  # noqa: E402
+from database import async_session_maker, init_db, sync_engine  # noqa: E402
+from import_codes import generate_sample_codes, import_codes_from_list  # noqa: E402
+from main import _has_claimed_today  # noqa: E402
+from fair_queue import FairQueue  # noqa: E402
+from queue_manager import QueueManager, RedeemTask, TaskPriority  # noqa: E402
+
+# 大规模队列用例的任务数
+QUEUE_SIZES = (10**4, 10**5)
+
+# 历史查询用例的热表行数
+HISTORY_SIZES = (10**3, 10**5, 10**7)
+
+# 被查询用户的记录数（其余行属于其他用户）
+HISTORY_USER_ID = 0
+HISTORY_USER_ROWS = 100
+
+
+def _filled_queue(size: int) -> QueueManager:
+    """预先放入 size 个任务的队列（不启动工作进程）"""
+    manager = QueueManager()
+    for i in range(size):
+        manager.tasks[i] = RedeemTask(id=i, user_id=i, username=f"user{i}", quota=500000)
+        manager.queue.put_nowait(i, flow=i)
+    return manager
+
+
+for _size in QUEUE_SIZES:
+
+    @benchmark(f"queue.add_task[tasks={_size}]")
+    async def _bench_add_task(options: Options, size: int = _size) -> Measurement:
+        batch = 1000
+
+        async def add(manager: QueueManager):
+            for i in range(batch):
+                await manager.add_task(user_id=size + i, username=f"user{i}")
+
+        return await sample(add, batch, options.repeat, setup=lambda: _filled_queue(size))
+
+    @benchmark(f"queue.get_queue_info[tasks={_size}]")
+    async def _bench_queue_info(options: Options, size: int = _size) -> Measurement:
+        manager = _filled_queue(size)
+        calls = 20
+
+        def info():
+            for _ in range(calls):
+                manager.get_queue_info()
+
+        return await sample(info, calls, options.repeat)
+
+
+@benchmark("queue.RedeemTask()")
+async def _bench_task_creation(options: Options) -> Measurement:
+    count = 100000
+
+    def create():
+        now = time.monotonic()
+        for i in range(count):
+            RedeemTask(id=i, user_id=i, username="user", quota=500000, created=now)
+
+    return await sample(create, count, options.repeat)
+
+
+for _size in QUEUE_SIZES:
+
+    @benchmark(f"queue.FairQueue put+get[tasks={_size}]")
+    async def _bench_fair_queue(options: Options, size: int = _size) -> Measurement:
+        """一半是少数批次的批量任务，一半是各不相同用户的实时任务，全部入队后再全部出队"""
+        classes = [priority.name.lower() for priority in TaskPriority]
+
+        def put_get():
+            queue = FairQueue(classes)
+            for i in range(size):
+                if i % 2:
+                    queue.put_nowait(i, TaskPriority.INTERACTIVE, flow=i)
+                else:
+                    queue.put_nowait(i, TaskPriority.BULK, flow=i % 8)
+            for _ in range(size):
+                queue.get_nowait()
+
+        return await sample(put_get, size, options.repeat)
+
+
+def _fill_history(rows: int):
+    """
+    把热表补足到 rows 行
+
+    被查询用户固定有 HISTORY_USER_ROWS 条记录，其余为其他用户的记录，
+    时间分布在最近 10 年内。只追加缺少的行，因此按规模从小到大执行即可复用。
+    """
+    with sync_engine.begin() as conn:
+        existing = conn.execute(text("SELECT COUNT(*) FROM user_redeem_records")).scalar()
+        if existing == 0:
+            conn.execute(
+                text(
+                    "WITH RECURSIVE seq(n) AS ("
+                    "  SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :count"
+                    ") "
+                    "INSERT INTO user_redeem_records "
+                    "(user_id, username, code, redeemed_at, source) "
+                    "SELECT :user_id, 'bench', 'HIST-' || n, "
+                    "datetime('now', '-' || n || ' days'), 'newapi_queue' FROM seq"
+                ),
+                {"count": HISTORY_USER_ROWS, "user_id": HISTORY_USER_ID},
+            )
+            existing = HISTORY_USER_ROWS
+        missing = rows - existing
+        if missing <= 0:
+            return
+        conn.execute(
+            text(
+                "WITH RECURSIVE seq(n) AS ("
+                "  SELECT :start UNION ALL SELECT n + 1 FROM seq WHERE n < :end"
+                ") "
+                "INSERT INTO user_redeem_records "
+                "(user_id, username, code, redeemed_at, source) "
+                "SELECT 1 + n % 100000, 'bench', 'FILL-' || n, "
+                "datetime('now', '-' || (n % 3650) || ' days'), 'newapi_queue' FROM seq"
+            ),
+            {"start": existing, "end": rows - 1},
+        )
+    with sync_engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+for _rows in HISTORY_SIZES:
+
+    @benchmark(f"db.claimed_today[rows={_rows}]", slow=_rows >= 10**7)
+    async def _bench_claimed_today(options: Options, rows: int = _rows) -> Measurement:
+        await init_db()
+        await asyncio.to_thread(_fill_history, rows)
+        calls = 200
+
+        async def check():
+            async with async_session_maker() as session:
+                for i in range(calls):
+                    await _has_claimed_today(session, i)
+
+        return await sample(check, calls, options.repeat)
+
+    @benchmark(f"db.history_page[rows={_rows}]", slow=_rows >= 10**7)
+    async def _bench_history(options: Options, rows: int = _rows) -> Measurement:
+        await init_db()
+        await asyncio.to_thread(_fill_history, rows)
+        calls = 100
+
+        async def first_two_pages():
+            async with async_session_maker() as session:
+                for _ in range(calls):
+                    page = await fetch_history(session, HISTORY_USER_ID, limit=50)
+                    await fetch_history(
+                        session, HISTORY_USER_ID, limit=50, cursor=page["next_cursor"]
+                    )
+
+        return await sample(first_two_pages, calls, options.repeat)
+
+
+@benchmark("db.init_db[unchanged]")
+async def _bench_init_db(options: Options) -> Measurement:
+    """表结构未变时启动的建表检查（只比对结构指纹）"""
+    await init_db()
+    calls = 20
+
+    async def bootstrap():
+        for _ in range(calls):
+            await init_db()
+
+    return await sample(bootstrap, calls, options.repeat)
+
+
+@benchmark("import.import_codes_from_list[100000]")
+async def _bench_import(options: Options) -> Measurement:
+    count = 100000
+
+    def codes():
+        return generate_sample_codes(count, prefix=f"B{uuid.uuid4().hex[:6]}")
+
+    return await sample(
+        import_codes_from_list, count, max(1, options.repeat // 2), setup=codes
+    )
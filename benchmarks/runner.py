@@ -0,0 +1,137 @@
+"""微基准测试运行器
+
+用法:
+    python -m benchmarks.runner                    # 运行全部并与基线对比
+    python -m benchmarks.runner --filter history   # 只运行名称包含 history 的用例
+    python -m benchmarks.runner --save             # 运行并把结果保存为新的基线
+    python -m benchmarks.runner --quick            # 跳过 10^7 行等耗时用例
+
+用例注册在 benchmarks.micro 中。每个用例报告单次操作的耗时（取多轮的中位数），
+与基线相比变慢超过 --threshold 时标记为回归，并以退出码 1 结束，可以直接用于 CI。
+基线与机器相关，请在同一台机器上生成和对比。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from benchmarks._setup import use_temp_database
+
+DB_PATH = use_temp_database()
+
+from benchmarks import micro  # noqa: E402,F401  注册用例
+from benchmarks.harness import BENCHMARKS, Benchmark, Options  # noqa: E402
+from database import async_engine  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _format_duration(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+async def run(benchmarks: List[Benchmark], options: Options) -> Dict[str, Any]:
+    results = {}
+    for case in benchmarks:
+        print(f"⏳ {case.name} ...", end="", flush=True)
+        measurement = await case.fn(options)
+        results[case.name] = {
+            "per_op_s": measurement.per_op,
+            "ops": measurement.ops,
+            "rounds": len(measurement.samples),
+        }
+        print(f"\r   {case.name:<44} {_format_duration(measurement.per_op):>12}/op")
+    # 关闭连接池，否则 aiosqlite 的连接线程会阻止进程退出
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="核心路径微基准测试")
+    parser.add_argument("--filter", "-k", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例的轮数")
+    parser.add_argument("--quick", action="store_true", help="跳过耗时的大规模用例")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument(
+        "--threshold", type=float, default=0.10, help="变慢超过该比例视为回归（默认 10%%）"
+    )
+    parser.add_argument("--output", "-o", help="本次结果 JSON 文件路径")
+    args = parser.parse_args()
+
+    selected = [
+        case
+        for case in BENCHMARKS
+        if args.filter in case.name and not (args.quick and case.slow)
+    ]
+    print(f"🧪 运行 {len(selected)} 个用例，临时数据库: {DB_PATH}")
+    results = asyncio.run(run(selected, Options(repeat=args.repeat, quick=args.quick)))
+
+    baseline = load_baseline(args.baseline)
+    regressions = []
+    if baseline:
+        print(f"\n📊 与基线对比（{args.baseline}，阈值 {args.threshold:.0%}）:")
+        for name, result in results.items():
+            base = baseline.get(name)
+            if not base:
+                print(f"   {name:<44} {'(新用例)':>12}")
+                continue
+            change = result["per_op_s"] / base["per_op_s"] - 1
+            flag = ""
+            if change > args.threshold:
+                regressions.append(name)
+                flag = " ❌ 回归"
+            elif change < -args.threshold:
+                flag = " ✅ 提升"
+            print(f"   {name:<44} {change:>+11.1%}{flag}")
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save:
+        # 保留未运行用例的旧基线
+        report["results"] = {**baseline, **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 基线已保存到 {args.baseline}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} 个用例出现回归: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""批量发放模块 - 给一批用户发放兑换码（活动奖励、故障补偿等）
+
+不为每个用户创建一个队列任务，而是按 BULK_GRANT_BATCH_SIZE 分批：
+每批作为一个批量优先级的队列任务调用一次 create_redemption_code(count=N)，
+再在同一个事务中写入 N 条兑换记录、更新领取计数器并推进任务的检查点（bulk_grant_jobs.processed）。
+
+- 检查点与兑换记录同事务提交，中断（进程重启、上游失败）后从检查点继续，
+  已发放的用户不会重复发放；中断时已申请但未写入的那一批兑换码会作废
+- 同一时间只运行一个批量任务，其余任务排队等待（状态为 pending）
+- 队列先处理实时领取与重试，最后才取出批量任务，批量发放不挤占普通用户
+- 进度以 NDJSON 推送，每一批完成后推送一行
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import insert, select, update
+from config import settings
+from database import async_session_maker
+from json_response import dumps
+from models import BulkGrantJob, UserRedeemRecord
+from newapi_service import short_error
+from queue_manager import queue_manager
+from stats_service import apply_deltas, claim_deltas
+
+logger = logging.getLogger(__name__)
+
+# 批量发放的兑换记录来源（不占用当天的每日领取）
+BULK_SOURCE = "bulk"
+
+# 可以从检查点继续的任务状态
+_RESUMABLE_STATUSES = ("failed", "interrupted")
+
+# 进度流在没有变化时重复推送当前状态的间隔（秒），避免连接被代理判定为空闲
+_HEARTBEAT_SECONDS = 15
+
+
+class _RunningJob:
+    """运行中任务的内存状态"""
+
+    def __init__(self, job: BulkGrantJob):
+        self.job = job
+        self.users: List[Tuple[int, str]] = [tuple(u) for u in json.loads(job.users)]
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        """唤醒等待进度的订阅者"""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+def job_snapshot(job: BulkGrantJob) -> Dict[str, Any]:
+    """任务的对外状态"""
+    return {
+        "job_id": job.id,
+        "name": job.name,
+        "quota": job.quota,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+class BulkGrantRunner:
+    """批量发放任务的执行器"""
+
+    def __init__(self, batch_size: int):
+        """
+        Args:
+            batch_size: 每批申请的兑换码数量
+        """
+        self.batch_size = batch_size
+        self._running: Dict[int, _RunningJob] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._slot = asyncio.Semaphore(1)
+
+    async def create(
+        self, name: str, quota: int, users: List[Tuple[int, Optional[str]]]
+    ) -> Dict[str, Any]:
+        """
+        创建并启动批量任务
+
+        Args:
+            name: 批次名称（同时作为兑换码名称，1-20 个字符）
+            quota: 每个兑换码的额度
+            users: (用户ID, 用户名) 列表，重复的用户ID只保留第一个
+
+        Returns:
+            任务状态
+        """
+        unique: Dict[int, str] = {}
+        for user_id, username in users:
+            unique.setdefault(user_id, username or str(user_id))
+
+        job = BulkGrantJob(
+            name=name,
+            quota=quota,
+            users=json.dumps(list(unique.items()), ensure_ascii=False),
+            total=len(unique),
+        )
+        async with async_session_maker() as session:
+            session.add(job)
+            await session.commit()
+
+        logger.info("创建批量发放任务 %s（%s），共 %d 个用户", job.id, name, job.total)
+        self._start(job)
+        return job_snapshot(job)
+
+    async def resume(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        从检查点继续失败或中断的任务
+
+        Returns:
+            任务状态，任务不存在时返回 None
+
+        Raises:
+            ValueError: 任务正在运行或已完成
+        """
+        if job_id in self._running:
+            raise ValueError("任务正在运行")
+        # 以条件更新在数据库中认领任务：并发的 resume 只有一个能成功，
+        # 避免同一任务运行两次、按过期的检查点重复发放
+        async with async_session_maker() as session:
+            result = await session.execute(
+                update(BulkGrantJob)
+                .where(BulkGrantJob.id == job_id)
+                .where(BulkGrantJob.status.in_(_RESUMABLE_STATUSES))
+                .values(status="pending", error=None, updated_at=datetime.now())
+            )
+            await session.commit()
+        job = await self._load(job_id)
+        if job is None:
+            return None
+        if result.rowcount != 1:
+            if job.status == "completed":
+                raise ValueError("任务已完成")
+            raise ValueError("任务正在运行")
+
+        logger.info("从第 %d/%d 个用户继续批量发放任务 %s", job.processed, job.total, job_id)
+        self._start(job)
+        return job_snapshot(job)
+
+    def _start(self, job: BulkGrantJob):
+        job.status, job.error = "pending", None
+        running = _RunningJob(job)
+        self._running[job.id] = running
+        task = asyncio.create_task(self._run(running))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """任务状态，任务不存在时返回 None"""
+        running = self._running.get(job_id)
+        if running is not None:
+            return job_snapshot(running.job)
+        job = await self._load(job_id)
+        return job_snapshot(job) if job is not None else None
+
+    async def list(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """最近创建的任务状态"""
+        async with async_session_maker() as session:
+            jobs = (
+                await session.execute(
+                    select(BulkGrantJob).order_by(BulkGrantJob.id.desc()).limit(limit)
+                )
+            ).scalars()
+            return [
+                job_snapshot(self._running[job.id].job if job.id in self._running else job)
+                for job in jobs
+            ]
+
+    async def iter_progress(self, job_id: int) -> AsyncIterator[bytes]:
+        """
+        以 NDJSON 逐行推送任务状态，直到任务结束
+
+        任务不在本进程中运行时只推送一行当前状态。
+        """
+        while True:
+            running = self._running.get(job_id)
+            if running is None:
+                snapshot = await self.get(job_id)
+                if snapshot is not None:
+                    yield dumps(snapshot) + b"\n"
+                return
+
+            # 先取得事件再输出状态，输出期间发生的变化不会丢失
+            changed = running.changed
+            yield dumps(job_snapshot(running.job)) + b"\n"
+            try:
+                await asyncio.wait_for(changed.wait(), _HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def recover(self):
+        """启动时把上次运行中（进程退出时未结束）的任务标记为中断，可通过 resume 继续"""
+        async with async_session_maker() as session:
+            result = await session.execute(
+                update(BulkGrantJob)
+                .where(BulkGrantJob.status.in_(("pending", "running")))
+                .values(status="interrupted", updated_at=datetime.now())
+            )
+            await session.commit()
+        if result.rowcount:
+            logger.warning("%d 个批量发放任务在上次退出时中断，可从检查点继续", result.rowcount)
+
+    async def stop(self):
+        """取消运行中的任务（检查点之后的进度会在继续时重新发放）"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _load(job_id: int) -> Optional[BulkGrantJob]:
+        async with async_session_maker() as session:
+            return await session.get(BulkGrantJob, job_id)
+
+    async def _run(self, running: _RunningJob):
+        job = running.job
+        await self._set_status(running, "pending")
+        try:
+            async with self._slot:
+                await self._set_status(running, "running")
+                while job.processed < job.total:
+                    batch = running.users[job.processed : job.processed + self.batch_size]
+                    codes = await self._mint(job, len(batch))
+                    await self._persist(running, batch, codes)
+            await self._set_status(running, "completed")
+            logger.info("批量发放任务 %s 完成，共 %d 个用户", job.id, job.total)
+        except asyncio.CancelledError:
+            await self._set_status(running, "interrupted")
+            raise
+        except Exception as e:
+            logger.warning(
+                "批量发放任务 %s 在第 %d/%d 个用户处失败: %s",
+                job.id,
+                job.processed,
+                job.total,
+                short_error(e),
+            )
+            await self._set_status(running, "failed", short_error(e))
+        finally:
+            self._running.pop(job.id, None)
+            running.notify()
+
+    @staticmethod
+    async def _mint(job: BulkGrantJob, count: int) -> List[str]:
+        """通过队列向 New API 申请一批兑换码（批量优先级，按任务轮转）"""
+        return await queue_manager.run_batch(job.name, job.quota, count, flow=job.id)
+
+    async def _persist(
+        self, running: _RunningJob, batch: List[Tuple[int, str]], codes: List[str]
+    ):
+        """写入一批兑换记录并推进检查点（同一事务）"""
+        job = running.job
+        now = datetime.now()
+        processed = job.processed + len(batch)
+        async with async_session_maker() as session:
+            await session.execute(
+                insert(UserRedeemRecord),
+                [
+                    {
+                        "user_id": user_id,
+                        "username": username,
+                        "code": code,
+                        "redeemed_at": now,
+                        "source": BULK_SOURCE,
+                    }
+                    for (user_id, username), code in zip(batch, codes)
+                ],
+            )
+            await apply_deltas(
+                session,
+                [(key, delta * len(batch)) for key, delta in claim_deltas(BULK_SOURCE, now)],
+            )
+            await session.execute(
+                update(BulkGrantJob)
+                .where(BulkGrantJob.id == job.id)
+                .values(processed=processed, updated_at=now)
+            )
+            await session.commit()
+
+        job.processed = processed
+        job.updated_at = now
+        running.notify()
+
+    @staticmethod
+    async def _set_status(
+        running: _RunningJob, status: str, error: Optional[str] = None
+    ):
+        job = running.job
+        job.status = status
+        job.error = error
+        job.updated_at = datetime.now()
+        async with async_session_maker() as session:
+            await session.execute(
+                update(BulkGrantJob)
+                .where(BulkGrantJob.id == job.id)
+                .values(status=status, error=error, updated_at=job.updated_at)
+            )
+            await session.commit()
+        running.notify()
+
+
+bulk_grant_runner = BulkGrantRunner(settings.bulk_grant_batch_size)
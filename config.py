@@ -1,8 +1,29 @@
 """配置管理模块"""
 
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
 
 
+def check_task_deadline(
+    task_deadline_seconds: float, newapi_timeout: float, newapi_max_attempts: int
+):
+    """
+    校验任务处理时限能容纳全部 New API 尝试
+
+    处理时限不大于"单次超时 × 尝试次数"时，挂起的站点会被处理时限取消，
+    后面的站点没有机会尝试。
+
+    Raises:
+        ValueError: 处理时限过短
+    """
+    budget = newapi_timeout * newapi_max_attempts
+    if task_deadline_seconds <= budget:
+        raise ValueError(
+            f"TASK_DEADLINE_SECONDS（{task_deadline_seconds:g}）必须大于 "
+            f"NEWAPI_TIMEOUT × NEWAPI_MAX_ATTEMPTS（{budget:g}）"
+        )
+
+
 class Settings(BaseSettings):
     """应用配置"""
 
@@ -19,6 +40,7 @@ class Settings(BaseSettings):
     oauth2_authorize_url: str = "https://connect.linux.do/oauth2/authorize"
     oauth2_token_url: str = "https://connect.linux.do/oauth2/token"
     oauth2_user_info_url: str = "https://connect.linux.do/api/user"
+    oauth2_timeout: float = 5.0  # OAuth2 上游请求超时（秒）
 
     # 数据库配置
     database_url: str = "sqlite+aiosqlite:///./redeem_codes.db"
@@ -29,6 +51,108 @@ class Settings(BaseSettings):
     newapi_access_token: str = ""  # New API Access Token
     newapi_user: str = ""  # New API 用户标识（用于 New-Api-User 头）
     newapi_redeem_quota: int = 500000  # 每次创建的兑换码额度（默认 500000 tokens）
+    # 多个 New API 站点："地址|访问令牌|New-Api-User|权重"，逗号分隔；为空时使用上面的单站点配置
+    newapi_backends: str = ""
+    newapi_balancer: str = "p2c"  # p2c=两个随机站点中负载较低者, least_outstanding=进行中请求最少
+    newapi_eject_failures: int = 3  # 连续失败多少次后摘除站点
+    newapi_eject_cooldown: float = 30.0  # 摘除后多久恢复（秒）
+    newapi_max_attempts: int = Field(2, ge=1)  # 单次创建最多尝试的站点数（失败时换站点重试）
+    newapi_timeout: float = 8.0  # New API 单次请求超时（秒），乘以尝试次数须小于任务处理时限
+
+    # 上游 HTTP 连接池配置（OAuth2 与每个 New API 站点各一个连接池）
+    http_max_connections: int = 100  # 连接数上限
+    http_max_keepalive_connections: int = 20  # 保持空闲的连接数上限
+
+    # 响应压缩配置
+    gzip_enabled: bool = True  # 是否启用 GZip 响应压缩
+    gzip_minimum_size: int = 1000  # 小于该字节数的响应不压缩
+    gzip_compresslevel: int = 6  # GZip 压缩级别（1-9）
+
+    # 页面缓存配置
+    page_cache_max_age: int = 300  # 静态页面 Cache-Control max-age（秒）
+
+    # 管理接口配置
+    admin_token: str = ""  # 管理接口令牌（Authorization: Bearer <token>），为空时禁用管理接口
+
+    # 批量发放配置
+    bulk_grant_batch_size: int = 100  # 每次向 New API 申请的兑换码数量，也是一个事务写入的记录数
+    bulk_grant_max_users: int = 100000  # 单个批量任务最多的发放对象数
+
+    # 兑换记录归档配置
+    archive_horizon_days: int = 90  # 热表保留最近多少天的兑换记录（至少 2 天）
+    archive_interval_hours: float = 0  # 后台归档间隔（小时），0 表示不在应用内自动归档
+
+    # 链路追踪配置
+    trace_sample_rate: float = 0.0  # 采样率（0-1），0 表示关闭追踪
+    trace_exporter: str = "file"  # file=本地滚动 NDJSON 文件, otlp=OTLP/HTTP collector
+    trace_file: str = "traces.ndjson"  # 本地 trace 文件路径
+    trace_file_max_bytes: int = 10 * 1024 * 1024  # 单个 trace 文件最大字节数
+    trace_file_backup_count: int = 5  # 保留的历史 trace 文件数
+    trace_otlp_endpoint: str = ""  # OTLP collector 地址，例如 http://localhost:4318
+
+    # 认证缓存配置
+    auth_cache_ttl: int = 60  # access_token 对应用户信息的缓存时间（秒），0 表示不缓存
+    auth_cache_size: int = 10000  # 最多缓存的 access_token 数量
+
+    # 会话配置
+    session_store: str = "memory"  # memory=进程内 LRU, sqlite=user_sessions 表（重启后保留）
+    session_ttl: int = 7 * 24 * 3600  # 会话有效期（秒）
+    session_max_size: int = 100000  # 内存存储最多保存的会话数量
+    session_gc_interval: int = 600  # SQLite 存储批量清理过期会话的最小间隔（秒）
+    session_cookie_name: str = "session"  # 会话 Cookie 名称
+    session_cookie_secure: bool = False  # 仅通过 HTTPS 发送会话 Cookie（生产环境建议开启）
+
+    # access token 主动刷新配置
+    token_refresh_enabled: bool = True  # 是否在 access token 过期前后台刷新
+    token_refresh_lead_seconds: int = 300  # 提前多少秒刷新
+    token_refresh_jitter_seconds: int = 60  # 在提前量基础上再随机提前 0~N 秒，避免集中刷新
+    token_refresh_concurrency: int = 4  # 同时进行的刷新请求数上限
+    token_refresh_retry_seconds: int = 30  # 刷新失败（网络错误或上游 5xx）后的重试间隔
+
+    # 任务队列配置
+    queue_max_concurrent: int = 1  # 同时处理的任务数（工作进程数）
+    queue_retry_attempts: int = 0  # New API 创建失败后自动重试的次数，重试任务排在实时领取之后
+    queue_retry_delay: float = 5.0  # 失败后多久重新入队（秒）
+    task_deadline_seconds: float = 20.0  # 单个任务的处理时限（秒），超时按失败处理
+    task_watchdog_interval: float = 5.0  # 看门狗检查卡住任务的间隔（秒）
+    task_stuck_grace_seconds: float = 10.0  # 超过处理时限该秒数仍未结束的任务由看门狗回收
+
+    # 健康检查配置
+    health_probe_interval: float = 15.0  # 后台探测上游与数据库的间隔（秒）
+    health_probe_timeout: float = 5.0  # 单次探测超时（秒）
+    health_max_queue_depth: int = Field(5000, ge=1)  # 排队任务数达到该值时 /health/ready 返回 503
+    health_max_db_latency_ms: float = 500.0  # 数据库探测耗时超过该值时 /health/ready 返回 503
+
+    # 启动预热配置
+    startup_warmup_enabled: bool = True  # 开始接收请求前预热数据库连接池、上游连接与热点查询
+    startup_warmup_timeout: float = 10.0  # 预热最长耗时（秒），超时后照常启动
+
+    # 限流配置（规则格式："路由=次数/周期"，逗号分隔，* 表示其他路由）
+    rate_limit_enabled: bool = True
+    rate_limit_ip_routes: str = "/api/redeem/daily=30/minute,*=600/minute"  # 按客户端 IP
+    rate_limit_user_routes: str = (
+        "/api/redeem/daily=5/minute,/api/task/{task_id}=120/minute,*=300/minute"
+    )  # 按用户 ID（认证之后）
+    rate_limit_max_keys: int = 100000  # 每条规则最多跟踪的 key 数量
+
+    # 日志配置
+    log_level: str = "INFO"  # 根日志级别
+    log_format: str = "json"  # json=每行一个 JSON 对象, text=人类可读的单行文本
+    log_levels: str = ""  # 单独设置日志级别，例如 "queue_manager=DEBUG,httpx=WARNING"
+
+    # 性能剖析配置
+    profile_max_seconds: int = 60  # 单次采样剖析的最长时长（秒）
+    loop_block_threshold_ms: int = 100  # 事件循环阻塞告警阈值（毫秒），0 表示关闭检测
+
+    # 旧兑换码池配置
+    legacy_pool_fallback: bool = False  # New API 不可用时是否从 redeem_codes 表分配兑换码
+
+    @model_validator(mode="after")
+    def _check_task_deadline(self) -> "Settings":
+        check_task_deadline(
+            self.task_deadline_seconds, self.newapi_timeout, self.newapi_max_attempts
+        )
+        return self
 
     class Config:
         env_file = ".env"
@@ -1,18 +1,41 @@
 """数据库配置和会话管理"""
 
-from typing import AsyncGenerator
+import hashlib
+from typing import AsyncGenerator, Dict, Optional
 from sqlmodel import SQLModel, create_engine
+from sqlalchemy import Connection, Engine, inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.schema import CreateIndex, CreateTable
 from config import settings
+from metrics import instrument_engine
+
+# 数据表结构指纹保存在 stat_counters 中的键；与当前模型一致时跳过建表与补建索引
+SCHEMA_VERSION_KEY = "meta.schema_version"
+
+_sync_engine: Optional[Engine] = None
+_fingerprints: Dict[str, int] = {}
+
+
+def get_sync_engine() -> Engine:
+    """同步数据库引擎（用于脚本），首次使用时创建，应用进程只使用异步引擎"""
+    global _sync_engine
+    if _sync_engine is None:
+        _sync_engine = create_engine(
+            settings.database_url.replace("sqlite+aiosqlite:///", "sqlite:///"),
+            echo=settings.debug,
+            connect_args={"check_same_thread": False}
+            if "sqlite" in settings.database_url
+            else {},
+        )
+    return _sync_engine
+
+
+def __getattr__(name: str):
+    # 兼容 from database import sync_engine，导入时才创建同步引擎（PEP 562）
+    if name == "sync_engine":
+        return get_sync_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 创建同步数据库引擎（用于初始化和脚本）
-sync_engine = create_engine(
-    settings.database_url.replace("sqlite+aiosqlite:///", "sqlite:///"),
-    echo=settings.debug,
-    connect_args={"check_same_thread": False}
-    if "sqlite" in settings.database_url
-    else {},
-)
 
 # 创建异步数据库引擎
 async_engine = create_async_engine(
@@ -23,15 +46,87 @@ async_engine = create_async_engine(
     else {},
 )
 
+# 记录应用内数据库语句耗时
+instrument_engine(async_engine.sync_engine)
+
 # 创建异步会话工厂
 async_session_maker = async_sessionmaker(
     async_engine, class_=AsyncSession, expire_on_commit=False
 )
 
 
-def create_db_and_tables():
-    """创建数据库表（同步方式，用于初始化）"""
-    SQLModel.metadata.create_all(sync_engine)
+def _schema_fingerprint(conn: Connection) -> int:
+    """当前模型在该数据库方言下的建表与建索引语句的摘要（模型在进程内不变，按方言缓存）"""
+    fingerprint = _fingerprints.get(conn.dialect.name)
+    if fingerprint is not None:
+        return fingerprint
+    statements = []
+    for table in SQLModel.metadata.sorted_tables:
+        statements.append(str(CreateTable(table).compile(dialect=conn.dialect)))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            statements.append(str(CreateIndex(index).compile(dialect=conn.dialect)))
+    digest = hashlib.sha256("\n".join(statements).encode("utf-8")).hexdigest()
+    # 取前 60 位，保证能存入 64 位整数列
+    fingerprint = _fingerprints[conn.dialect.name] = int(digest[:15], 16)
+    return fingerprint
+
+
+def _stored_schema_version(conn: Connection) -> Optional[int]:
+    if not inspect(conn).has_table("stat_counters"):
+        return None
+    return conn.execute(
+        text("SELECT value FROM stat_counters WHERE key = :key"),
+        {"key": SCHEMA_VERSION_KEY},
+    ).scalar()
+
+
+def bootstrap_schema(conn: Connection) -> bool:
+    """
+    创建数据表、补建索引并回填统计计数器（同步，在事务中执行）
+
+    数据表结构指纹与上次记录的一致时直接返回，启动时只需要一次查询。
+
+    Returns:
+        是否执行了建表（结构有变化或首次初始化）
+    """
+    import models  # noqa: F401  确保所有数据表已注册到 metadata
+    from archive_service import create_archive_table, list_archive_names
+    from stats_service import ensure_counters
+
+    fingerprint = _schema_fingerprint(conn)
+    if _stored_schema_version(conn) == fingerprint:
+        return False
+
+    SQLModel.metadata.create_all(conn)
+    # create_all 不会为已存在的表补建新增的索引
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    # 归档表不在 metadata 中，同样补建新增的索引
+    for name in list_archive_names(conn):
+        create_archive_table(conn, name)
+    # 首次启用统计计数器时从业务表回填
+    ensure_counters(conn)
+    conn.execute(
+        text(
+            "INSERT INTO stat_counters (key, value) VALUES (:key, :value) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+        ),
+        {"key": SCHEMA_VERSION_KEY, "value": fingerprint},
+    )
+    return True
+
+
+def create_db_and_tables() -> bool:
+    """创建数据库表（同步方式，用于初始化脚本）"""
+    with get_sync_engine().begin() as conn:
+        return bootstrap_schema(conn)
+
+
+async def init_db() -> bool:
+    """创建数据库表（异步方式，用于应用启动，不阻塞事件循环）"""
+    async with async_engine.begin() as conn:
+        return await conn.run_sync(bootstrap_schema)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
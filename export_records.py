@@ -0,0 +1,48 @@
+"""兑换记录导出脚本"""
+
+import argparse
+import logging
+import sys
+from datetime import datetime
+from database import sync_engine
+from export_service import EXPORT_FORMATS, iter_export_sync
+from logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式导出兑换记录（含归档记录）")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv", help="导出格式")
+    parser.add_argument(
+        "--start", type=datetime.fromisoformat, help="起始时间（包含），例如 2025-01-01"
+    )
+    parser.add_argument(
+        "--end", type=datetime.fromisoformat, help="结束时间（不包含），例如 2025-02-01"
+    )
+    parser.add_argument("--source", help="只导出指定来源，例如 newapi_queue / legacy")
+    parser.add_argument("--output", "-o", help="输出文件路径（默认输出到标准输出）")
+    args = parser.parse_args()
+    # 数据可能输出到标准输出，日志写到标准错误
+    setup_logging(log_format="text", stream=sys.stderr)
+
+    out = (
+        open(args.output, "w", encoding="utf-8", newline="")
+        if args.output
+        else sys.stdout
+    )
+    try:
+        for chunk in iter_export_sync(
+            sync_engine, args.format, args.start, args.end, args.source
+        ):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+    if args.output:
+        logger.info("✅ 已导出到 %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""兑换记录导出模块 - 以 CSV / NDJSON 流式导出 user_redeem_records
+
+导出按 (redeemed_at, id) 键集分页读取，每页在单独的短连接中查询，按页生成文本：
+内存占用与表大小无关，向慢速客户端输出期间也不持有数据库连接（SQLite 回滚日志模式下，
+长时间打开的读游标会持有共享锁，阻塞所有写入）。
+已归档的记录按月份顺序一并导出，最后导出热表。
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import Select, Table, select, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from archive_service import (
+    HOT_TABLE,
+    month_range,
+    get_archive_table,
+    list_archive_names,
+)
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_FIELDS = [c.name for c in HOT_TABLE.c]
+
+# 每页读取的行数，同时也是生成一个输出块的行数
+PAGE_SIZE = 1000
+
+
+def _export_tables(
+    archive_names: List[str], start: Optional[datetime], end: Optional[datetime]
+) -> List[Table]:
+    """按时间顺序列出需要读取的表，跳过不在日期范围内的归档月份"""
+    tables = []
+    for name in sorted(archive_names):
+        month_start, month_end = month_range(name)
+        if start is not None and month_end <= start:
+            continue
+        if end is not None and month_start >= end:
+            continue
+        tables.append(get_archive_table(name))
+    tables.append(HOT_TABLE)
+    return tables
+
+
+def _export_query(
+    table: Table,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    source: Optional[str],
+) -> Select:
+    query = select(*table.c).order_by(table.c.redeemed_at, table.c.id)
+    if start is not None:
+        query = query.where(table.c.redeemed_at >= start)
+    if end is not None:
+        query = query.where(table.c.redeemed_at < end)
+    if source:
+        query = query.where(table.c.source == source)
+    return query
+
+
+def _page_query(
+    table: Table,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    source: Optional[str],
+    after: Optional[Tuple[datetime, int]],
+) -> Select:
+    """导出查询的一页：排在 after（上一页最后一行的 (redeemed_at, id)）之后的 PAGE_SIZE 行"""
+    query = _export_query(table, start, end, source).limit(PAGE_SIZE)
+    if after is not None:
+        query = query.where(tuple_(table.c.redeemed_at, table.c.id) > tuple_(*after))
+    return query
+
+
+def _next_page(rows: List) -> Optional[Tuple[datetime, int]]:
+    """下一页的起点，本页不满时返回 None（已读完）"""
+    if len(rows) < PAGE_SIZE:
+        return None
+    return rows[-1].redeemed_at, rows[-1].id
+
+
+class _Formatter:
+    """将一批行格式化为 CSV 或 NDJSON 文本"""
+
+    def __init__(self, fmt: str):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        self.fmt = fmt
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def header(self) -> str:
+        if self.fmt != "csv":
+            return ""
+        self._writer.writerow(EXPORT_FIELDS)
+        return self._drain()
+
+    def rows(self, rows: Iterable) -> str:
+        if self.fmt == "csv":
+            for row in rows:
+                self._writer.writerow(
+                    v.isoformat() if isinstance(v, datetime) else v for v in row
+                )
+            return self._drain()
+
+        lines = []
+        for row in rows:
+            item = dict(zip(EXPORT_FIELDS, row))
+            item["redeemed_at"] = item["redeemed_at"].isoformat()
+            lines.append(json.dumps(item, ensure_ascii=False))
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def _drain(self) -> str:
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text
+
+
+async def iter_export(
+    engine: AsyncEngine,
+    fmt: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    source: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    异步流式导出兑换记录（用于 StreamingResponse）
+
+    Args:
+        engine: 异步数据库引擎
+        fmt: csv 或 ndjson
+        start: 起始时间（包含）
+        end: 结束时间（不包含）
+        source: 只导出指定来源的记录
+    """
+    formatter = _Formatter(fmt)
+    header = formatter.header()
+    if header:
+        yield header
+
+    async with engine.connect() as conn:
+        archive_names = await conn.run_sync(list_archive_names)
+    for table in _export_tables(archive_names, start, end):
+        after = None
+        while True:
+            # 连接在输出这一页之前归还，客户端读得慢时不阻塞写入
+            async with engine.connect() as conn:
+                rows = (
+                    await conn.execute(_page_query(table, start, end, source, after))
+                ).all()
+            if rows:
+                yield formatter.rows(rows)
+            after = _next_page(rows)
+            if after is None:
+                break
+
+
+def iter_export_sync(
+    engine: Engine,
+    fmt: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    source: Optional[str] = None,
+) -> Iterator[str]:
+    """同步流式导出兑换记录（用于命令行脚本），参数同 iter_export"""
+    formatter = _Formatter(fmt)
+    header = formatter.header()
+    if header:
+        yield header
+
+    with engine.connect() as conn:
+        archive_names = list_archive_names(conn)
+    for table in _export_tables(archive_names, start, end):
+        after = None
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(_page_query(table, start, end, source, after)).all()
+            if rows:
+                yield formatter.rows(rows)
+            after = _next_page(rows)
+            if after is None:
+                break
@@ -0,0 +1,194 @@
+"""公平调度队列 - 按优先级分类、类内按流（用户）轮转的 asyncio 队列
+
+替代单个 FIFO 的 asyncio.Queue：管理员批量任务或失败重试一次性放入大量任务时，
+不会让普通用户的实时领取排在它们后面。
+
+- 类间严格优先：总是先取编号最小的非空类（0 最高）
+- 类内赤字轮转（Deficit Round Robin）：每个流（默认按用户）一个子队列，活跃的流轮流出队，
+  每轮可出队的任务数与流的权重成正比；同一个流大量入队只会拉长它自己的子队列
+- 入队、出队均为 O(1)（权重不小于 1 时；出队需要扫描的类数是常数）
+
+接口与 asyncio.Queue 保持一致（put_nowait / get_nowait / get / qsize / empty），
+工作进程无需关心调度细节；另外提供 remove 用于取消尚未出队的元素。
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, List, Sequence
+
+
+class _Flow:
+    """类内的一个流：子队列与赤字计数"""
+
+    __slots__ = ("key", "weight", "deficit", "items")
+
+    def __init__(self, key: Hashable, weight: float):
+        self.key = key
+        self.weight = weight
+        self.deficit = 0.0
+        self.items: Deque[Any] = deque()
+
+
+class FairQueue:
+    """多优先级类 + 类内赤字轮转的异步队列"""
+
+    def __init__(self, classes: Sequence[str]):
+        """
+        Args:
+            classes: 各优先级类的名称，按优先级从高到低排列
+        """
+        self.classes = tuple(classes)
+        count = len(self.classes)
+        self._flows: List[Dict[Hashable, _Flow]] = [{} for _ in range(count)]
+        self._active: List[Deque[_Flow]] = [deque() for _ in range(count)]
+        self._sizes = [0] * count
+        self._size = 0
+        self.enqueued = [0] * count  # 各类累计入队数
+        self.dequeued = [0] * count  # 各类累计离开队列数（出队或被移除）
+        self._getters: Deque[asyncio.Future] = deque()
+
+    def qsize(self) -> int:
+        """排队中的元素总数"""
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def depth(self, cls: int) -> int:
+        """某个优先级类中排队的元素数"""
+        return self._sizes[cls]
+
+    def depths(self) -> Dict[str, int]:
+        """各优先级类的排队元素数（类名 -> 数量）"""
+        return dict(zip(self.classes, self._sizes))
+
+    def flow_count(self, cls: int) -> int:
+        """某个优先级类中有元素排队的流数量"""
+        return len(self._flows[cls])
+
+    def put_nowait(
+        self, item: Any, cls: int = 0, flow: Hashable = None, weight: float = 1.0
+    ) -> int:
+        """
+        放入一个元素
+
+        Args:
+            item: 元素
+            cls: 优先级类编号（0 最高）
+            flow: 流标识，同一个流的元素按 FIFO 出队，不同流之间轮转
+            weight: 流的权重（大于 0），每轮可出队 weight 个元素；
+                仅在流新建时生效，流排空后下次入队重新设置
+
+        Returns:
+            该元素在所属类中的入队序号（从 1 开始）
+        """
+        if weight <= 0:
+            raise ValueError("流的权重必须大于 0")
+        flows = self._flows[cls]
+        entry = flows.get(flow)
+        if entry is None:
+            entry = flows[flow] = _Flow(flow, weight)
+            self._active[cls].append(entry)
+        entry.items.append(item)
+
+        self._sizes[cls] += 1
+        self._size += 1
+        self.enqueued[cls] += 1
+        self._wakeup_next()
+        return self.enqueued[cls]
+
+    def get_nowait(self) -> Any:
+        """
+        取出下一个元素
+
+        Raises:
+            asyncio.QueueEmpty: 队列为空
+        """
+        if not self._size:
+            raise asyncio.QueueEmpty
+        cls = next(i for i, size in enumerate(self._sizes) if size)
+        active = self._active[cls]
+
+        # 队首的流赤字不足一个元素时补充一次配额；权重小于 1 的流可能需要跳过几轮
+        while True:
+            flow = active[0]
+            if not flow.items:
+                # remove() 取空的流，惰性地退出轮转
+                active.popleft()
+                continue
+            if flow.deficit < 1:
+                flow.deficit += flow.weight
+                if flow.deficit < 1:
+                    active.rotate(-1)
+                    continue
+            break
+
+        item = flow.items.popleft()
+        flow.deficit -= 1
+        if not flow.items:
+            # 排空的流退出轮转，剩余赤字作废（与 DRR 一致，避免空闲的流攒配额）
+            active.popleft()
+            del self._flows[cls][flow.key]
+        elif flow.deficit < 1:
+            active.rotate(-1)
+
+        self._sizes[cls] -= 1
+        self._size -= 1
+        self.dequeued[cls] += 1
+        return item
+
+    def remove(self, item: Any, cls: int = 0, flow: Hashable = None) -> bool:
+        """
+        从队列中移除一个尚未出队的元素（用于取消）
+
+        耗时与该流的子队列长度成正比，按用户分流时通常只有一个元素。
+
+        Args:
+            item: 元素
+            cls: 入队时的优先级类编号
+            flow: 入队时的流标识
+
+        Returns:
+            是否找到并移除
+        """
+        entry = self._flows[cls].get(flow)
+        if entry is None:
+            return False
+        try:
+            entry.items.remove(item)
+        except ValueError:
+            return False
+        if not entry.items:
+            # 空流留在轮转中，出队时再跳过，避免在轮转队列中线性查找
+            del self._flows[cls][flow]
+
+        self._sizes[cls] -= 1
+        self._size -= 1
+        self.dequeued[cls] += 1
+        return True
+
+    async def get(self) -> Any:
+        """取出下一个元素，队列为空时等待"""
+        while not self._size:
+            getter = asyncio.get_running_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except BaseException:
+                getter.cancel()
+                try:
+                    self._getters.remove(getter)
+                except ValueError:
+                    pass
+                # 被唤醒后又取消（例如 wait_for 超时），把唤醒机会让给下一个等待者
+                if self._size and not getter.cancelled():
+                    self._wakeup_next()
+                raise
+        return self.get_nowait()
+
+    def _wakeup_next(self):
+        while self._getters:
+            getter = self._getters.popleft()
+            if not getter.done():
+                getter.set_result(None)
+                return
@@ -1,10 +1,15 @@
 """生成测试兑换码并导入"""
 
+import logging
 from import_codes import generate_sample_codes, import_codes_from_list
+from logging_config import setup_logging
+
+setup_logging(log_format="text")
+logger = logging.getLogger(__name__)
 
 # 生成 20 个示例兑换码
 codes = generate_sample_codes(20, prefix="TEST")
-print(f"生成了 {len(codes)} 个兑换码")
+logger.info("生成了 %d 个兑换码", len(codes))
 
 # 导入到数据库
 import_codes_from_list(codes)
@@ -0,0 +1,160 @@
+"""健康检查模块 - 后台探测上游与数据库，提供存活与就绪状态
+
+后台协程每 HEALTH_PROBE_INTERVAL 秒探测一次：
+- OAuth2 提供方（用户信息接口能否连通）
+- 每个 New API 站点（NewAPIService.test_connection）
+- 数据库（SELECT 1 的耗时）
+
+结果缓存在内存中，/health/ready 直接读取缓存，不会因为负载均衡器频繁探测而放大上游请求。
+
+就绪状态只由本实例自身的过载情况决定：排队任务数超过 HEALTH_MAX_QUEUE_DEPTH，或数据库
+不可用、延迟超过 HEALTH_MAX_DB_LATENCY_MS 时返回 503，让负载均衡器暂时把流量分给其他实例。
+上游状态只做展示 —— 所有实例共用同一批上游，上游故障时让所有实例同时"未就绪"没有意义。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from config import settings
+from database import async_session_maker
+from metrics import REGISTRY
+from newapi_service import newapi_pool
+from oauth2_service import oauth2_service
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_UP = REGISTRY.gauge(
+    "health_probe_up", "最近一次健康探测是否成功（1=成功）", ("target",)
+)
+
+
+class HealthProber:
+    """定期探测依赖并缓存结果"""
+
+    def __init__(self, interval: float):
+        """
+        Args:
+            interval: 探测间隔（秒）
+        """
+        self.interval = interval
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.started_at = time.time()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, delay: float = 0):
+        """
+        启动后台探测
+
+        Args:
+            delay: 第一次探测前等待的秒数（启动预热已探测过一次时传入探测间隔）
+        """
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(delay))
+
+    async def stop(self):
+        """停止后台探测"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, delay: float):
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                logger.exception("健康探测出错: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def probe(self):
+        """并发探测所有依赖，更新缓存结果"""
+        checks = {"oauth2": self._check_oauth2(), "database": self._check_database()}
+        for backend in newapi_pool.backends:
+            checks[f"newapi:{backend.name}"] = backend.service.test_connection()
+
+        names = list(checks)
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(self._timed(check) for check in checks.values())
+        )
+        for name, (ok, latency, error) in zip(names, outcomes):
+            previous = self.results.get(name)
+            if previous is not None and previous["ok"] != ok:
+                logger.warning("依赖 %s 状态变化: %s", name, "正常" if ok else "异常")
+            self.results[name] = {
+                "ok": ok,
+                "latency_ms": round(latency * 1000, 1),
+                "checked_at": time.time(),
+                "error": error,
+            }
+            UPSTREAM_UP.labels(name).set(1 if ok else 0)
+        logger.debug("健康探测完成，用时 %.1f ms", (time.perf_counter() - started) * 1000)
+
+    @staticmethod
+    async def _timed(check) -> tuple:
+        """执行一次探测，返回 (是否成功, 耗时秒数, 错误信息)"""
+        started = time.perf_counter()
+        try:
+            ok = await asyncio.wait_for(check, settings.health_probe_timeout)
+            error = None if ok else "探测失败"
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+        return bool(ok), time.perf_counter() - started, error
+
+    @staticmethod
+    async def _check_oauth2() -> bool:
+        return await oauth2_service.check_connection()
+
+    @staticmethod
+    async def _check_database() -> bool:
+        async with async_session_maker() as session:
+            await session.execute(text("SELECT 1"))
+        return True
+
+    def readiness(self, queue_depth: int) -> Dict[str, Any]:
+        """
+        就绪状态
+
+        Args:
+            queue_depth: 当前排队中的任务数
+
+        Returns:
+            包含 ready 与各项检查结果的字典
+        """
+        reasons = []
+        if queue_depth >= settings.health_max_queue_depth:
+            reasons.append("queue_saturated")
+
+        database = self.results.get("database")
+        if database is None:
+            reasons.append("not_probed")
+        elif not database["ok"]:
+            reasons.append("database_unavailable")
+        elif database["latency_ms"] > settings.health_max_db_latency_ms:
+            reasons.append("database_slow")
+
+        upstreams = {
+            name: result for name, result in self.results.items() if name != "database"
+        }
+        return {
+            "ready": not reasons,
+            "reasons": reasons,
+            "queue": {
+                "depth": queue_depth,
+                "limit": settings.health_max_queue_depth,
+                "saturation": round(queue_depth / settings.health_max_queue_depth, 3),
+            },
+            "database": database,
+            "upstreams": upstreams,
+        }
+
+
+health_prober = HealthProber(settings.health_probe_interval)
@@ -0,0 +1,45 @@
+"""共用 HTTP 客户端的创建与替换
+
+OAuth2 与 New API 各自持有一个长期复用的 httpx.AsyncClient。连接池上限
+（HTTP_MAX_CONNECTIONS / HTTP_MAX_KEEPALIVE_CONNECTIONS）与超时在创建时确定，
+运行时修改这些配置后，服务用新配置创建新客户端，旧客户端等进行中的请求结束后再关闭。
+"""
+
+import asyncio
+import logging
+from typing import Set
+import httpx
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 等待关闭的旧客户端（保留引用，避免关闭任务被垃圾回收）
+_retiring: Set[asyncio.Task] = set()
+
+
+def create_client(timeout: float) -> httpx.AsyncClient:
+    """按当前连接池配置创建客户端"""
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+        ),
+    )
+
+
+def retire_client(client: httpx.AsyncClient, grace: float):
+    """
+    在 grace 秒后关闭旧客户端
+
+    新请求已经改用新客户端，旧客户端上进行中的请求最多再持续一个超时周期。
+    """
+
+    async def close_later():
+        await asyncio.sleep(grace)
+        await client.aclose()
+        logger.debug("旧的 HTTP 客户端已关闭")
+
+    task = asyncio.create_task(close_later())
+    _retiring.add(task)
+    task.add_done_callback(_retiring.discard)
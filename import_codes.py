@@ -1,108 +1,176 @@
 """兑换码导入脚本"""
 
+import logging
 import sys
+import time
 from datetime import datetime
-from sqlmodel import Session, select
-from database import sync_engine
-from models import RedeemCode
+from typing import Iterable, Iterator, Tuple
+from sqlalchemy import DateTime, bindparam, text
+from database import create_db_and_tables, sync_engine
+from logging_config import setup_logging
+from stats_service import record_import
 
+logger = logging.getLogger(__name__)
 
-def import_codes_from_file(file_path: str):
+# 每批写入的兑换码数量，决定导入时的内存上限
+DEFAULT_CHUNK_SIZE = 10000
+
+# 导入进度日志的最小间隔（秒）
+_PROGRESS_INTERVAL = 1.0
+
+_INSERT_CODE_SQL = text(
+    "INSERT OR IGNORE INTO redeem_codes (code, is_used, created_at) "
+    "VALUES (:code, 0, :created_at)"
+).bindparams(bindparam("created_at", type_=DateTime()))
+
+
+def _iter_chunks(codes: Iterable[str], chunk_size: int) -> Iterator[list[str]]:
     """
-    从文件导入兑换码
+    将兑换码流切分为固定大小的批次，过滤空行
 
     Args:
-        file_path: 兑换码文件路径，每行一个兑换码
+        codes: 兑换码可迭代对象（可以是文件对象）
+        chunk_size: 每批数量
     """
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            codes = [line.strip() for line in f if line.strip()]
-
-        if not codes:
-            print("❌ 文件为空或没有有效的兑换码")
-            return
+    chunk: list[str] = []
+    for raw in codes:
+        code = raw.strip()
+        if not code:
+            continue
+        chunk.append(code)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _import_stream(
+    codes: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Tuple[int, int]:
+    """
+    流式导入兑换码
 
-        print(f"📖 从文件中读取到 {len(codes)} 个兑换码")
+    分批读取，每批通过 executemany 执行 INSERT OR IGNORE，
+    所有批次在同一个事务中提交，重复的兑换码由唯一索引直接忽略，
+    库存计数器也在该事务内一并更新。
 
-        # 导入到数据库
-        with Session(sync_engine) as session:
-            # 检查重复
-            existing_codes = session.exec(
-                select(RedeemCode.code).where(RedeemCode.code.in_(codes))
-            ).all()
+    Args:
+        codes: 兑换码可迭代对象
+        chunk_size: 每批数量
 
-            existing_codes_set = set(existing_codes)
-            new_codes = [code for code in codes if code not in existing_codes_set]
+    Returns:
+        (读取数量, 实际插入数量)
+    """
+    read_count = 0
+    inserted_count = 0
+    started = time.perf_counter()
+    last_progress = started
+
+    # 确保表结构与统计计数器已就绪
+    create_db_and_tables()
+
+    with sync_engine.begin() as conn:
+        for chunk in _iter_chunks(codes, chunk_size):
+            now = datetime.now()
+            result = conn.execute(
+                _INSERT_CODE_SQL,
+                [{"code": code, "created_at": now} for code in chunk],
+            )
+            read_count += len(chunk)
+            inserted_count += max(result.rowcount, 0)
+
+            now_perf = time.perf_counter()
+            if now_perf - last_progress >= _PROGRESS_INTERVAL:
+                last_progress = now_perf
+                rate = read_count / (now_perf - started)
+                logger.info(
+                    "⏳ 已处理 %d 个兑换码，新增 %d 个 (%s 个/秒)",
+                    read_count,
+                    inserted_count,
+                    f"{rate:,.0f}",
+                )
+
+        # 库存计数器与兑换码在同一事务内提交
+        record_import(conn, inserted_count)
+
+    elapsed = time.perf_counter() - started
+    if read_count:
+        rate = read_count / elapsed if elapsed > 0 else 0
+        logger.info("⏱️  耗时 %.2f 秒，吞吐 %s 个/秒", elapsed, f"{rate:,.0f}")
+
+    return read_count, inserted_count
+
+
+def _log_stats():
+    """使用 COUNT 聚合输出兑换码统计信息"""
+    with sync_engine.connect() as conn:
+        total, used = conn.execute(
+            text("SELECT COUNT(*), COALESCE(SUM(is_used), 0) FROM redeem_codes")
+        ).one()
+
+    logger.info(
+        "📊 数据库统计: 总兑换码数 %d，已使用 %d，可用 %d", total, used, total - used
+    )
+
+
+def _report(read_count: int, inserted_count: int):
+    """输出导入结果"""
+    skipped = read_count - inserted_count
+    if skipped:
+        logger.warning("⚠️  跳过 %d 个已存在的兑换码", skipped)
+
+    if not inserted_count:
+        logger.info("✅ 没有新的兑换码需要导入")
+    else:
+        logger.info("✅ 成功导入 %d 个兑换码", inserted_count)
 
-            if existing_codes:
-                print(f"⚠️  跳过 {len(existing_codes)} 个已存在的兑换码")
 
-            if not new_codes:
-                print("✅ 没有新的兑换码需要导入")
-                return
+def import_codes_from_file(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    从文件导入兑换码
 
-            # 批量插入新兑换码
-            for code in new_codes:
-                redeem_code = RedeemCode(code=code)
-                session.add(redeem_code)
+    文件按行流式读取，内存占用只与 chunk_size 有关，与文件大小无关。
 
-            session.commit()
-            print(f"✅ 成功导入 {len(new_codes)} 个兑换码")
+    Args:
+        file_path: 兑换码文件路径，每行一个兑换码
+        chunk_size: 每批写入的数量
+    """
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            logger.info("📖 开始从文件导入兑换码: %s", file_path)
+            read_count, inserted_count = _import_stream(f, chunk_size)
 
-            # 统计信息
-            total = session.exec(select(RedeemCode)).all()
-            used = session.exec(
-                select(RedeemCode).where(RedeemCode.is_used == True)
-            ).all()
-            available = len(total) - len(used)
+        if not read_count:
+            logger.error("❌ 文件为空或没有有效的兑换码")
+            return
 
-            print(f"\n📊 数据库统计:")
-            print(f"  - 总兑换码数: {len(total)}")
-            print(f"  - 已使用: {len(used)}")
-            print(f"  - 可用: {available}")
+        logger.info("📖 从文件中读取到 %d 个兑换码", read_count)
+        _report(read_count, inserted_count)
+        _log_stats()
 
     except FileNotFoundError:
-        print(f"❌ 文件不存在: {file_path}")
+        logger.error("❌ 文件不存在: %s", file_path)
     except Exception as e:
-        print(f"❌ 导入失败: {str(e)}")
+        logger.exception("❌ 导入失败: %s", e)
 
 
-def import_codes_from_list(codes: list):
+def import_codes_from_list(codes: list, chunk_size: int = DEFAULT_CHUNK_SIZE):
     """
     从列表导入兑换码
 
     Args:
         codes: 兑换码列表
+        chunk_size: 每批写入的数量
     """
     if not codes:
-        print("❌ 兑换码列表为空")
+        logger.error("❌ 兑换码列表为空")
         return
 
-    print(f"📝 准备导入 {len(codes)} 个兑换码")
-
-    with Session(sync_engine) as session:
-        # 检查重复
-        existing_codes = session.exec(
-            select(RedeemCode.code).where(RedeemCode.code.in_(codes))
-        ).all()
+    logger.info("📝 准备导入 %d 个兑换码", len(codes))
 
-        existing_codes_set = set(existing_codes)
-        new_codes = [code for code in codes if code not in existing_codes_set]
-
-        if existing_codes:
-            print(f"⚠️  跳过 {len(existing_codes)} 个已存在的兑换码")
-
-        if not new_codes:
-            print("✅ 没有新的兑换码需要导入")
-            return
-
-        # 批量插入新兑换码
-        for code in new_codes:
-            redeem_code = RedeemCode(code=code)
-            session.add(redeem_code)
-
-        session.commit()
-        print(f"✅ 成功导入 {len(new_codes)} 个兑换码")
+    read_count, inserted_count = _import_stream(codes, chunk_size)
+    _report(read_count, inserted_count)
 
 
 def generate_sample_codes(count: int = 10, prefix: str = "CODE"):
@@ -127,18 +195,21 @@ def generate_sample_codes(count: int = 10, prefix: str = "CODE"):
 
 
 if __name__ == "__main__":
+    setup_logging(log_format="text")
+
     if len(sys.argv) < 2:
-        print("使用方法:")
-        print("  1. 从文件导入: python import_codes.py <文件路径>")
-        print("     例如: python import_codes.py codes.txt")
-        print()
-        print("  2. 生成并导入示例兑换码: python import_codes.py --sample [数量]")
-        print("     例如: python import_codes.py --sample 100")
+        logger.error(
+            "使用方法:\n"
+            "  1. 从文件导入: python import_codes.py <文件路径>\n"
+            "     例如: python import_codes.py codes.txt\n\n"
+            "  2. 生成并导入示例兑换码: python import_codes.py --sample [数量]\n"
+            "     例如: python import_codes.py --sample 100"
+        )
         sys.exit(1)
 
     if sys.argv[1] == "--sample":
         count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
-        print(f"🎲 生成 {count} 个示例兑换码...")
+        logger.info("🎲 生成 %d 个示例兑换码...", count)
         sample_codes = generate_sample_codes(count)
         import_codes_from_list(sample_codes)
     else:
@@ -1,18 +1,24 @@
 """数据库初始化脚本"""
 
+import logging
 from database import create_db_and_tables
+from logging_config import setup_logging
 from models import RedeemCode, UserRedeemRecord
 
+logger = logging.getLogger(__name__)
+
 
 def init_database():
     """初始化数据库，创建所有表"""
-    print("开始初始化数据库...")
+    logger.info("开始初始化数据库...")
     create_db_and_tables()
-    print("数据库初始化完成！")
-    print("已创建以下表：")
-    print("  - redeem_codes (兑换码表)")
-    print("  - user_redeem_records (用户兑换记录表)")
+    logger.info(
+        "数据库初始化完成！已创建以下表：\n"
+        "  - redeem_codes (兑换码表)\n"
+        "  - user_redeem_records (用户兑换记录表)"
+    )
 
 
 if __name__ == "__main__":
+    setup_logging(log_format="text")
     init_database()
@@ -0,0 +1,77 @@
+"""JSON 响应模块 - 优先使用 orjson / msgspec 加速序列化，缺失时回退到标准库
+
+接口直接返回 FastJSONResponse 时，FastAPI 会跳过 response_model 校验与
+jsonable_encoder，datetime 等类型由序列化器原生处理，无需提前 isoformat。
+"""
+
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Optional
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec 为可选依赖
+    msgspec = None
+
+
+def _default(value: Any) -> Any:
+    """标准库 json 无法直接序列化的类型"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"无法序列化类型: {type(value).__name__}")
+
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+
+    def dumps(content: Any) -> bytes:
+        """序列化为 JSON 字节"""
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+elif msgspec is not None:
+    JSON_BACKEND = "msgspec"
+    _encoder = msgspec.json.Encoder()
+
+    def dumps(content: Any) -> bytes:
+        """序列化为 JSON 字节"""
+        return _encoder.encode(content)
+
+else:
+    JSON_BACKEND = "json"
+
+    def dumps(content: Any) -> bytes:
+        """序列化为 JSON 字节"""
+        return json.dumps(
+            content, ensure_ascii=False, separators=(",", ":"), default=_default
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """使用最快可用序列化器的 JSON 响应"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def api_response(data: Any = None, message: Optional[str] = None) -> FastJSONResponse:
+    """
+    构造统一格式的成功响应
+
+    Args:
+        data: 响应数据
+        message: 提示信息（可选）
+    """
+    content: dict = {"success": True}
+    if message is not None:
+        content["message"] = message
+    content["data"] = data
+    return FastJSONResponse(content)
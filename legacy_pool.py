@@ -0,0 +1,46 @@
+"""旧兑换码池模块 - New API 不可用时从预导入的 redeem_codes 表分配兑换码"""
+
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# 单条 UPDATE ... RETURNING 完成"查找 + 标记"：
+# - 子查询命中部分索引 ix_redeem_codes_unused，按 id 取第一个未使用的兑换码，O(log n)
+# - 整条语句在同一个写事务内执行，SQLite 串行化写入，并发领取不会拿到同一个兑换码
+# - 外层再次校验 is_used = 0，在行级锁数据库上并发冲突时返回空而不是重复分配
+_CLAIM_SQL = text(
+    """
+    UPDATE redeem_codes
+    SET is_used = 1, used_by = :user_id, used_at = :used_at
+    WHERE id = (
+        SELECT id FROM redeem_codes WHERE is_used = 0 ORDER BY id LIMIT 1
+    )
+    AND is_used = 0
+    RETURNING id, code
+    """
+).bindparams(bindparam("used_at", type_=DateTime()))
+
+
+async def allocate_legacy_code(
+    session: AsyncSession, user_id: int
+) -> Optional[Tuple[int, str]]:
+    """
+    从旧兑换码池中原子地领取一个未使用的兑换码
+
+    不会提交事务，由调用方决定何时 commit。
+
+    Args:
+        session: 数据库会话
+        user_id: 领取者用户ID
+
+    Returns:
+        (兑换码ID, 兑换码)，兑换码池为空时返回 None
+    """
+    result = await session.execute(
+        _CLAIM_SQL, {"user_id": user_id, "used_at": datetime.now()}
+    )
+    row = result.first()
+    if row is None:
+        return None
+    return row.id, row.code
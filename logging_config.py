@@ -0,0 +1,183 @@
+"""日志配置模块 - 结构化、非阻塞的日志输出
+
+所有日志经 QueueHandler 放入内存队列，由 QueueListener 在后台线程中格式化并写出，
+事件循环只负责把日志记录放入队列，不会被 stdout 等慢速 I/O 阻塞。
+
+通过 log_context() 绑定的字段（例如 task_id、user_id）会附加到该上下文中产生的
+每一条日志上，JSON 格式下作为独立字段输出，便于日志系统检索。
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
+from config import settings
+
+LOG_FORMATS = ("json", "text")
+
+# LogRecord 自带的属性，其余属性视为结构化字段
+_RESERVED_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "taskName"}
+
+_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar(
+    "log_context", default={}
+)
+
+_listener: Optional[QueueListener] = None
+
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+    """
+    在当前上下文中绑定日志字段
+
+    Args:
+        fields: 需要附加到日志上的字段
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    """日志记录上的结构化字段"""
+    return {
+        key: value
+        for key, value in record.__dict__.items()
+        if key not in _RESERVED_ATTRS and not key.startswith("_")
+    }
+
+
+class ContextFilter(logging.Filter):
+    """把 log_context() 绑定的字段写入日志记录（在产生日志的线程中执行）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """人类可读的单行日志，结构化字段以 key=value 追加在末尾"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if not fields:
+            return line
+        suffix = " ".join(f"{key}={value}" for key, value in fields.items())
+        head, sep, tail = line.partition("\n")
+        return f"{head} [{suffix}]{sep}{tail}"
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    只在调用线程中完成必须立即做的工作（合并参数、格式化异常），
+    其余格式化交给监听线程
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # 异常对象可能引用大量栈帧，在这里转成文本后释放
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """解析 "logger=LEVEL,logger=LEVEL" 格式的单独日志级别"""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.strip().partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    stream=None,
+) -> QueueListener:
+    """
+    配置根日志器（重复调用时只生效一次）
+
+    Args:
+        level: 根日志级别，默认读取 settings.log_level
+        log_format: json 或 text，默认读取 settings.log_format
+        stream: 输出流，默认 stdout
+
+    Returns:
+        后台日志监听器
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_format = log_format or settings.log_format
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"不支持的日志格式: {log_format}")
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JSONFormatter() if log_format == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _NonBlockingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel((level or settings.log_level).upper())
+    for name, logger_level in _parse_levels(settings.log_levels).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """停止后台监听线程，写出队列中剩余的日志"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
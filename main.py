@@ -1,95 +1,88 @@
 """FastAPI 应用主文件 - Linux.do OAuth2 登录集成"""
 
+import asyncio
+import logging
+import time
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, Query, Depends
-from fastapi.responses import RedirectResponse, HTMLResponse
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Depends, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import RedirectResponse, HTMLResponse, Response
 from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from config import settings
 from oauth2_service import oauth2_service
-from database import get_session, create_db_and_tables
+from database import async_engine, async_session_maker, get_session, init_db
 from models import RedeemCode, UserRedeemRecord
-from newapi_service import NewAPIService
-from queue_manager import queue_manager, TaskStatus
+from newapi_service import newapi_pool
+from queue_manager import queue_manager, RedeemTask, TaskStatus
+from stats_service import record_claim
+from admin_api import router as admin_router
+from bulk_grant import BULK_SOURCE, bulk_grant_runner
+from archive_service import archive_loop, decode_cursor, fetch_history
+from pages import HOME_PAGE, REDEEM_PAGE
+from json_response import FastJSONResponse, api_response
+from tracing import tracer
+from profiler import LoopBlockDetector
+from health import health_prober
+from warmup import startup_phase, warm_up
+from logging_config import setup_logging
+from auth import get_current_user, user_info_cache
+from sessions import create_session, destroy_session, get_session_id, load_session
+from token_refresh import token_refresher
+from ratelimit import limit_by_ip
+from runtime_config import runtime_settings
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from schemas import (
+    ApiResponse,
+    BootstrapData,
+    ClaimData,
+    DashboardData,
+    HistoryPage,
+    QueueInfo,
+    TaskData,
+)
 import secrets
 
+# 结构化日志，写出在后台线程中完成，不阻塞事件循环
+setup_logging()
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="Linux.do OAuth2 Demo",
     description="使用 Linux.do OAuth2 认证的 FastAPI 应用",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
+    dependencies=[Depends(limit_by_ip)],
 )
 
-# 用于存储 token 的简单内存存储（生产环境应使用数据库或 Redis）
-token_storage = {}
+if settings.gzip_enabled:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.gzip_minimum_size,
+        compresslevel=settings.gzip_compresslevel,
+    )
+
+# 最外层中间件，请求耗时包含压缩时间
+app.add_middleware(MetricsMiddleware)
+
+app.include_router(admin_router)
+
+# 后台归档任务
+archive_task: Optional[asyncio.Task] = None
+
+# 事件循环阻塞检测
+loop_block_detector = (
+    LoopBlockDetector(settings.loop_block_threshold_ms / 1000)
+    if settings.loop_block_threshold_ms > 0
+    else None
+)
 
 
 @app.get("/", response_class=HTMLResponse)
-async def home():
+async def home(request: Request):
     """首页，显示登录链接"""
-    html_content = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Linux.do OAuth2 Demo</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                max-width: 800px;
-                margin: 50px auto;
-                padding: 20px;
-                background-color: #f5f5f5;
-            }
-            .container {
-                background-color: white;
-                padding: 30px;
-                border-radius: 8px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }
-            h1 {
-                color: #333;
-            }
-            .btn {
-                display: inline-block;
-                padding: 12px 24px;
-                background-color: #007bff;
-                color: white;
-                text-decoration: none;
-                border-radius: 4px;
-                margin-top: 20px;
-            }
-            .btn:hover {
-                background-color: #0056b3;
-            }
-            .info {
-                margin-top: 30px;
-                padding: 15px;
-                background-color: #e7f3ff;
-                border-left: 4px solid #007bff;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🚀 Linux.do OAuth2 登录演示</h1>
-            <p>这是一个使用 FastAPI 和 Linux.do OAuth2 认证的示例应用。</p>
-            <a href="/login" class="btn">使用 Linux.do 登录</a>
-            
-            <div class="info">
-                <h3>可用端点：</h3>
-                <ul>
-                    <li><code>GET /</code> - 首页</li>
-                    <li><code>GET /login</code> - 开始 OAuth2 登录流程</li>
-                    <li><code>GET /oauth2/callback</code> - OAuth2 回调处理</li>
-                    <li><code>GET /user</code> - 获取用户信息（需要 access_token）</li>
-                    <li><code>POST /refresh</code> - 刷新 access token（需要 refresh_token）</li>
-                    <li><code>GET /docs</code> - API 文档</li>
-                </ul>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    return html_content
+    return HOME_PAGE.response(request)
 
 
 @app.get("/login")
@@ -108,6 +101,7 @@ async def login():
 
 @app.get("/oauth2/callback")
 async def oauth2_callback(
+    request: Request,
     code: str = Query(..., description="授权码"),
     state: str = Query(..., description="状态参数"),
 ):
@@ -125,17 +119,43 @@ async def oauth2_callback(
         # 获取用户信息
         user_info = await oauth2_service.get_user_info(token_data["access_token"])
 
-        # 存储 token（生产环境应使用更安全的方式）
-        user_id = user_info["id"]
-        token_storage[user_id] = token_data
+        # 预热认证缓存，页面的第一批接口请求无需再访问上游
+        user_info_cache.set(token_data["access_token"], user_info)
 
-        # 直接重定向到兑换码页面，通过 URL 参数传递 user_id
-        return RedirectResponse(url=f"/redeem?user_id={user_id}")
+        # token 与用户信息保存在服务端会话中，浏览器只拿到会话 Cookie
+        response = RedirectResponse(url="/redeem")
+        expires_at = time.time() + token_data.get("expires_in", 3600)
+        session_id = await create_session(
+            request,
+            response,
+            {
+                "user_id": user_info["id"],
+                "access_token": token_data["access_token"],
+                "refresh_token": token_data.get("refresh_token"),
+                "expires_at": expires_at,
+                "user_info": user_info,
+            },
+        )
+        # 在 access token 过期前后台刷新
+        if settings.token_refresh_enabled and token_data.get("refresh_token"):
+            token_refresher.schedule(session_id, expires_at)
+        return response
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"认证失败: {str(e)}")
 
 
+@app.get("/logout")
+async def logout(request: Request):
+    """退出登录，删除会话"""
+    response = RedirectResponse(url="/")
+    session_id = get_session_id(request)
+    if session_id:
+        token_refresher.unschedule(session_id)
+    await destroy_session(request, response)
+    return response
+
+
 @app.get("/user")
 async def get_user_info(access_token: str = Query(..., description="访问令牌")):
     """
@@ -172,9 +192,76 @@ async def health_check():
     return {"status": "healthy", "service": "Linux.do OAuth2 Demo"}
 
 
-@app.post("/api/redeem/daily")
+@app.get("/health/live")
+async def liveness():
+    """存活检查：进程与事件循环能正常响应即可"""
+    return {"status": "alive", "uptime_s": round(time.time() - health_prober.started_at)}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    就绪检查
+
+    读取后台探测的缓存结果，排队任务过多或数据库不可用/过慢时返回 503，
+    负载均衡器据此暂停向本实例分发流量。上游状态仅供展示。
+    """
+    result = health_prober.readiness(queue_manager.queue.qsize())
+    result["status"] = "ready" if result["ready"] else "not_ready"
+    return FastJSONResponse(result, status_code=200 if result["ready"] else 503)
+
+
+async def _has_claimed_today(session: AsyncSession, user_id: int) -> bool:
+    """检查用户今天是否已经领取过兑换码"""
+    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    today_end = today_start + timedelta(days=1)
+
+    existing_record = await session.execute(
+        select(UserRedeemRecord.id)
+        .where(UserRedeemRecord.user_id == user_id)
+        .where(UserRedeemRecord.redeemed_at >= today_start)
+        .where(UserRedeemRecord.redeemed_at < today_end)
+        # 管理员批量发放的兑换码不占用每日领取
+        .where(UserRedeemRecord.source != BULK_SOURCE)
+        .limit(1)
+    )
+    return existing_record.first() is not None
+
+
+def _task_payload(task: RedeemTask) -> dict:
+    """任务状态响应数据"""
+    payload = {
+        "task_id": task.task_id,
+        "status": task.status.value,
+        "created_at": task.created_at,
+    }
+
+    if task.started_at:
+        payload["started_at"] = task.started_at
+
+    if task.status == TaskStatus.PENDING:
+        payload["queue_position"] = queue_manager.get_queue_position(task)
+    elif task.status == TaskStatus.COMPLETED:
+        payload["completed_at"] = task.completed_at
+        payload["code"] = task.result
+    elif task.status == TaskStatus.FAILED:
+        payload["completed_at"] = task.completed_at
+        payload["error"] = task.error
+    elif task.status == TaskStatus.CANCELLED:
+        payload["completed_at"] = task.completed_at
+
+    return payload
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标端点"""
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.post("/api/redeem/daily", response_model=ApiResponse[ClaimData])
 async def claim_daily_code(
-    access_token: str = Query(..., description="访问令牌"),
+    request: Request,
     session: AsyncSession = Depends(get_session),
 ):
     """
@@ -185,60 +272,53 @@ async def claim_daily_code(
     - 兑换码通过队列异步创建，立即返回任务ID
     """
     try:
-        # 获取用户信息
-        user_info = await oauth2_service.get_user_info(access_token)
-        user_id = user_info["id"]
-        username = user_info["username"]
-
-        # 检查今天是否已经领取过
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
-
-        existing_record = await session.execute(
-            select(UserRedeemRecord)
-            .where(UserRedeemRecord.user_id == user_id)
-            .where(UserRedeemRecord.redeemed_at >= today_start)
-            .where(UserRedeemRecord.redeemed_at < today_end)
-        )
+        with tracer.span("claim") as root:
+            # 获取用户信息
+            with tracer.span("auth"):
+                user_info = await get_current_user(request)
+            user_id = user_info["id"]
+            username = user_info["username"]
+            if root:
+                root.set_attribute("user_id", user_id)
+
+            # 检查今天是否已经领取过
+            with tracer.span("db.check_claimed"):
+                claimed = await _has_claimed_today(session, user_id)
+            if claimed:
+                raise HTTPException(
+                    status_code=400, detail="今天已经领取过兑换码了，请明天再来！"
+                )
 
-        if existing_record.scalar_one_or_none():
-            raise HTTPException(
-                status_code=400, detail="今天已经领取过兑换码了，请明天再来！"
-            )
+            # 检查 New API 配置（启用旧兑换码池回退时由队列从兑换码池分配）
+            if not newapi_pool.configured and not settings.legacy_pool_fallback:
+                raise HTTPException(
+                    status_code=500,
+                    detail="系统配置错误：New API 未配置。请联系管理员配置 NEWAPI_SITE_URL 和 NEWAPI_ACCESS_TOKEN（或 NEWAPI_BACKENDS）环境变量。",
+                )
 
-        # 检查 New API 配置
-        if not settings.newapi_site_url or not settings.newapi_access_token:
-            raise HTTPException(
-                status_code=500,
-                detail="系统配置错误：New API 未配置。请联系管理员配置 NEWAPI_SITE_URL 和 NEWAPI_ACCESS_TOKEN 环境变量。",
-            )
+            # 添加任务到队列（span 上下文随任务进入队列）
+            with tracer.span("queue.enqueue"):
+                task_id = await queue_manager.add_task(
+                    user_id=user_id,
+                    username=username,
+                    quota=settings.newapi_redeem_quota,
+                )
 
-        # 添加任务到队列
-        task_id = await queue_manager.add_task(
-            user_id=user_id,
-            username=username,
-            quota=settings.newapi_redeem_quota,
+        return api_response(
+            {"task_id": task_id, "status": "pending"},
+            message="兑换码生成任务已加入队列",
         )
 
-        return {
-            "success": True,
-            "message": "兑换码生成任务已加入队列",
-            "data": {
-                "task_id": task_id,
-                "status": "pending",
-            },
-        }
-
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"领取失败: {str(e)}")
 
 
-@app.get("/api/task/{task_id}")
+@app.get("/api/task/{task_id}", response_model=ApiResponse[TaskData])
 async def get_task_status(
     task_id: str,
-    access_token: str = Query(..., description="访问令牌"),
+    user_info: dict = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
     """
@@ -247,8 +327,6 @@ async def get_task_status(
     当任务完成后,会自动将兑换码保存到数据库
     """
     try:
-        # 获取用户信息
-        user_info = await oauth2_service.get_user_info(access_token)
         user_id = user_info["id"]
 
         # 获取任务信息
@@ -261,19 +339,9 @@ async def get_task_status(
         if task.user_id != user_id:
             raise HTTPException(status_code=403, detail="无权访问此任务")
 
-        response_data = {
-            "task_id": task.task_id,
-            "status": task.status.value,
-            "created_at": task.created_at.isoformat(),
-        }
-
-        if task.started_at:
-            response_data["started_at"] = task.started_at.isoformat()
+        response_data = _task_payload(task)
 
         if task.status == TaskStatus.COMPLETED:
-            response_data["completed_at"] = task.completed_at.isoformat()
-            response_data["code"] = task.result
-
             # 如果任务完成,保存到数据库
             existing = await session.execute(
                 select(UserRedeemRecord)
@@ -282,24 +350,20 @@ async def get_task_status(
             )
 
             if not existing.scalar_one_or_none():
-                record = UserRedeemRecord(
-                    user_id=user_id,
-                    username=task.username,
-                    redeem_code_id=None,
-                    code=task.result,
-                    source="newapi_queue",
-                )
-                session.add(record)
-                await session.commit()
-
-        elif task.status == TaskStatus.FAILED:
-            response_data["completed_at"] = task.completed_at.isoformat()
-            response_data["error"] = task.error
-
-        return {
-            "success": True,
-            "data": response_data,
-        }
+                with tracer.span("db.persist_record", parent=task.trace_context):
+                    record = UserRedeemRecord(
+                        user_id=user_id,
+                        username=task.username,
+                        redeem_code_id=task.redeem_code_id,
+                        code=task.result,
+                        source=task.source,
+                    )
+                    session.add(record)
+                    # 领取计数器与兑换记录在同一事务内提交
+                    await record_claim(session, record.source, record.redeemed_at)
+                    await session.commit()
+
+        return api_response(response_data)
 
     except HTTPException:
         raise
@@ -307,352 +371,185 @@ async def get_task_status(
         raise HTTPException(status_code=500, detail=f"查询任务失败: {str(e)}")
 
 
-@app.get("/api/queue/info")
+@app.post("/api/task/{task_id}/cancel", response_model=ApiResponse[TaskData])
+async def cancel_task(task_id: str, user_info: dict = Depends(get_current_user)):
+    """
+    取消排队中的任务
+
+    只能取消自己尚未开始处理的任务，取消后当天仍可重新领取。
+    """
+    task = await queue_manager.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if task.user_id != user_info["id"]:
+        raise HTTPException(status_code=403, detail="无权访问此任务")
+    if not queue_manager.cancel_task(task):
+        raise HTTPException(status_code=409, detail="任务已开始处理或已结束，无法取消")
+
+    return api_response(_task_payload(task), message="任务已取消")
+
+
+@app.get("/api/queue/info", response_model=ApiResponse[QueueInfo])
 async def get_queue_info(
-    access_token: str = Query(..., description="访问令牌"),
+    user_info: dict = Depends(get_current_user),
 ):
     """获取队列信息"""
     try:
-        # 验证用户身份
-        await oauth2_service.get_user_info(access_token)
-
         queue_info = queue_manager.get_queue_info()
+        queue_info["runtime"] = runtime_settings()
 
-        return {
-            "success": True,
-            "data": queue_info,
-        }
+        return api_response(queue_info)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取队列信息失败: {str(e)}")
 
 
-@app.get("/api/redeem/history")
+@app.get("/api/redeem/history", response_model=ApiResponse[HistoryPage])
 async def get_redeem_history(
-    access_token: str = Query(..., description="访问令牌"),
+    user_info: dict = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="翻页游标（上一页的 next_cursor）"),
     session: AsyncSession = Depends(get_session),
 ):
-    """获取用户的兑换历史记录"""
+    """获取用户的兑换历史记录（热表读完后自动延续到归档表）"""
     try:
-        # 获取用户信息
-        user_info = await oauth2_service.get_user_info(access_token)
         user_id = user_info["id"]
 
-        # 查询用户的兑换记录
-        from sqlalchemy import desc
-        from sqlmodel import col
-
-        records = await session.execute(
-            select(UserRedeemRecord)
-            .where(UserRedeemRecord.user_id == user_id)
-            .order_by(col(UserRedeemRecord.redeemed_at).desc())
-        )
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="无效的翻页游标")
 
-        history = []
-        for record in records.scalars().all():
-            history.append(
-                {"code": record.code, "redeemed_at": record.redeemed_at.isoformat()}
-            )
+        history = await fetch_history(session, user_id, limit=limit, cursor=cursor)
 
-        return {"success": True, "data": {"total": len(history), "history": history}}
+        return api_response(history)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取历史记录失败: {str(e)}")
 
 
-@app.get("/redeem", response_class=HTMLResponse)
-async def redeem_page(user_id: int = Query(None, description="用户ID")):
-    """兑换码领取页面"""
-
-    # 如果有 user_id，从内存中获取 token
-    access_token = ""
-    user_info_data = {}
-    if user_id and user_id in token_storage:
-        access_token = token_storage[user_id].get("access_token", "")
-        try:
-            user_info_data = await oauth2_service.get_user_info(access_token)
-        except:
-            pass
-
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>每日兑换码</title>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                max-width: 800px;
-                margin: 50px auto;
-                padding: 20px;
-                background-color: #f5f5f5;
-            }}
-            .container {{
-                background-color: white;
-                padding: 30px;
-                border-radius: 8px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }}
-            h1 {{
-                color: #333;
-            }}
-            .btn {{
-                display: inline-block;
-                padding: 12px 24px;
-                background-color: #28a745;
-                color: white;
-                text-decoration: none;
-                border: none;
-                border-radius: 4px;
-                margin-top: 20px;
-                cursor: pointer;
-                font-size: 16px;
-            }}
-            .btn:hover {{
-                background-color: #218838;
-            }}
-            .btn:disabled {{
-                background-color: #6c757d;
-                cursor: not-allowed;
-            }}
-            .result {{
-                margin-top: 20px;
-                padding: 15px;
-                border-radius: 4px;
-                display: none;
-            }}
-            .result.success {{
-                background-color: #d4edda;
-                border: 1px solid #c3e6cb;
-                color: #155724;
-            }}
-            .result.error {{
-                background-color: #f8d7da;
-                border: 1px solid #f5c6cb;
-                color: #721c24;
-            }}
-            .code-display {{
-                font-size: 24px;
-                font-weight: bold;
-                margin: 15px 0;
-                padding: 15px;
-                background-color: #fff;
-                border: 2px dashed #28a745;
-                text-align: center;
-                border-radius: 4px;
-            }}
-            .history {{
-                margin-top: 30px;
-            }}
-            .history-item {{
-                padding: 10px;
-                margin: 5px 0;
-                background-color: #f8f9fa;
-                border-radius: 4px;
-                display: flex;
-                justify-content: space-between;
-            }}
-            .back-btn {{
-                background-color: #007bff;
-                margin-right: 10px;
-            }}
-            .back-btn:hover {{
-                background-color: #0056b3;
-            }}
-            .user-info {{
-                background-color: #e7f3ff;
-                padding: 15px;
-                border-radius: 4px;
-                margin-bottom: 20px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🎁 每日兑换码</h1>
+@app.get("/api/redeem/dashboard", response_model=ApiResponse[DashboardData])
+async def get_dashboard(
+    user_info: dict = Depends(get_current_user),
+    history_limit: int = Query(20, ge=1, le=200, description="首页历史记录数量"),
+):
+    """
+    兑换码页面的聚合状态
+
+    一次请求返回用户信息、今日是否已领取、进行中的任务（含排队位置）
+    以及第一页历史记录，只做一次认证（带缓存），数据库查询并发执行。
+    """
+    try:
+        user_id = user_info["id"]
+
+        # 并发查询需要各自独立的会话
+        async def claimed_today() -> bool:
+            async with async_session_maker() as session:
+                return await _has_claimed_today(session, user_id)
+
+        async def first_history_page() -> dict:
+            async with async_session_maker() as session:
+                return await fetch_history(session, user_id, limit=history_limit)
+
+        claimed, history = await asyncio.gather(claimed_today(), first_history_page())
+        active_task = queue_manager.get_active_task(user_id)
+
+        return api_response(
             {
-        f'''
-            <div class="user-info">
-                <p><strong>欢迎：</strong>{user_info_data.get("username", "未知用户")}</p>
-                <p><strong>信任等级：</strong>{user_info_data.get("trust_level", "N/A")}</p>
-            </div>
-            '''
-        if user_info_data
-        else '<p>每天可以领取一个兑换码，<a href="/login">点击登录</a></p>'
-    }
-            
-            <button class="btn" onclick="claimCode()" {
-        "" if access_token else 'disabled title="请先登录"'
-    }>领取今日兑换码</button>
-            <button class="btn back-btn" onclick="location.href='/'">返回首页</button>
-            
-            <div class="result" id="result"></div>
-            
-            <div class="history" id="history" style="display:none;">
-                <h2>📜 领取历史</h2>
-                <div id="history-list"></div>
-            </div>
-        </div>
-        
-        <script>
-            const accessToken = "{access_token}";
-            
-            async function claimCode() {{
-                const resultDiv = document.getElementById('result');
-                const btn = event.target;
-                
-                if (!accessToken) {{
-                    showResult('error', '请先<a href="/login">登录</a>！');
-                    return;
-                }}
-                
-                btn.disabled = true;
-                btn.textContent = '提交中...';
-                
-                try {{
-                    const response = await fetch(`/api/redeem/daily?access_token=${{encodeURIComponent(accessToken)}}`, {{
-                        method: 'POST'
-                    }});
-                    
-                    const data = await response.json();
-                    
-                    if (data.success) {{
-                        // 任务已提交到队列，开始轮询状态
-                        const taskId = data.data.task_id;
-                        showResult('success', `<p>⏳ 任务已提交，正在生成兑换码...</p>`);
-                        btn.textContent = '生成中...';
-                        
-                        // 轮询任务状态
-                        await pollTaskStatus(taskId, btn);
-                    }} else {{
-                        showResult('error', data.detail || '提交失败');
-                        btn.disabled = false;
-                        btn.textContent = '领取今日兑换码';
-                    }}
-                }} catch (error) {{
-                    showResult('error', '网络错误，请重试');
-                    btn.disabled = false;
-                    btn.textContent = '领取今日兑换码';
-                }}
-            }}
-            
-            async function pollTaskStatus(taskId, btn) {{
-                const maxAttempts = 60; // 最多轮询60次
-                const interval = 1000; // 每秒轮询一次
-                let attempts = 0;
-                
-                const poll = async () => {{
-                    try {{
-                        const response = await fetch(`/api/task/${{taskId}}?access_token=${{encodeURIComponent(accessToken)}}`);
-                        const data = await response.json();
-                        
-                        if (data.success) {{
-                            const status = data.data.status;
-                            
-                            if (status === 'completed') {{
-                                // 任务完成
-                                showResult('success', `
-                                    <p>✅ 领取成功！</p>
-                                    <div class="code-display">${{data.data.code}}</div>
-                                    <p>完成时间：${{new Date(data.data.completed_at).toLocaleString('zh-CN')}}</p>
-                                `);
-                                btn.disabled = false;
-                                btn.textContent = '领取今日兑换码';
-                                loadHistory();
-                                return;
-                            }} else if (status === 'failed') {{
-                                // 任务失败
-                                showResult('error', `生成失败：${{data.data.error || '未知错误'}}`);
-                                btn.disabled = false;
-                                btn.textContent = '领取今日兑换码';
-                                return;
-                            }} else if (status === 'processing') {{
-                                showResult('success', `<p>⚙️ 正在生成兑换码，请稍候...</p>`);
-                            }}
-                        }}
-                        
-                        // 继续轮询
-                        attempts++;
-                        if (attempts < maxAttempts) {{
-                            setTimeout(poll, interval);
-                        }} else {{
-                            showResult('error', '任务超时，请稍后查看历史记录');
-                            btn.disabled = false;
-                            btn.textContent = '领取今日兑换码';
-                        }}
-                    }} catch (error) {{
-                        console.error('轮询失败:', error);
-                        attempts++;
-                        if (attempts < maxAttempts) {{
-                            setTimeout(poll, interval);
-                        }} else {{
-                            showResult('error', '网络错误，请稍后查看历史记录');
-                            btn.disabled = false;
-                            btn.textContent = '领取今日兑换码';
-                        }}
-                    }}
-                }};
-                
-                // 开始轮询
-                poll();
-            }}
-            
-            async function loadHistory() {{
-                if (!accessToken) return;
-                
-                try {{
-                    const response = await fetch(`/api/redeem/history?access_token=${{encodeURIComponent(accessToken)}}`);
-                    const data = await response.json();
-                    
-                    if (data.success && data.data.history.length > 0) {{
-                        const historyDiv = document.getElementById('history');
-                        const historyList = document.getElementById('history-list');
-                        
-                        historyList.innerHTML = data.data.history.map(item => `
-                            <div class="history-item">
-                                <span><strong>${{item.code}}</strong></span>
-                                <span>${{new Date(item.redeemed_at).toLocaleString('zh-CN')}}</span>
-                            </div>
-                        `).join('');
-                        
-                        historyDiv.style.display = 'block';
-                    }}
-                }} catch (error) {{
-                    console.error('加载历史记录失败:', error);
-                }}
-            }}
-            
-            function showResult(type, message) {{
-                const resultDiv = document.getElementById('result');
-                resultDiv.className = `result ${{type}}`;
-                resultDiv.innerHTML = message;
-                resultDiv.style.display = 'block';
-            }}
-            
-            // 页面加载时自动加载历史记录
-            window.onload = function() {{
-                if (accessToken) {{
-                    loadHistory();
-                }}
-            }};
-        </script>
-    </body>
-    </html>
+                "user": {
+                    "id": user_id,
+                    "username": user_info.get("username"),
+                    "trust_level": user_info.get("trust_level"),
+                },
+                "claimed_today": claimed,
+                "task": _task_payload(active_task) if active_task else None,
+                "history": history,
+            }
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取页面状态失败: {str(e)}")
+
+
+@app.get("/api/bootstrap", response_model=ApiResponse[BootstrapData])
+async def bootstrap(request: Request):
     """
-    return html_content
+    兑换码页面的用户数据
+
+    数据来自登录时保存在会话中的用户信息，不会请求上游。
+    """
+    stored = await load_session(request)
+    if not stored:
+        return api_response({"logged_in": False})
+
+    user_info = stored.get("user_info", {})
+    return api_response(
+        {
+            "logged_in": True,
+            "username": user_info.get("username"),
+            "trust_level": user_info.get("trust_level"),
+        }
+    )
+
+
+@app.get("/redeem", response_class=HTMLResponse)
+async def redeem_page(request: Request):
+    """兑换码领取页面（静态页面，用户数据由 /api/bootstrap 提供）"""
+    return REDEEM_PAGE.response(request)
 
 
 @app.on_event("startup")
 async def startup_event():
-    """应用启动时创建数据库表并启动队列"""
-    create_db_and_tables()
+    """应用启动时创建数据库表、预热并启动队列"""
+    global archive_task
+
+    with startup_phase("schema"):
+        if await init_db():
+            logger.info("数据表结构已创建或更新")
+    await bulk_grant_runner.recover()
+    await tracer.start()
+    if loop_block_detector:
+        loop_block_detector.start()
+    if settings.token_refresh_enabled:
+        token_refresher.start()
+    if settings.startup_warmup_enabled:
+        with startup_phase("warmup"):
+            await warm_up(
+                [
+                    lambda session: _has_claimed_today(session, 0),
+                    lambda session: fetch_history(session, 0, limit=20),
+                ]
+            )
+        # 预热已经探测过一次，下一次按正常间隔进行
+        health_prober.start(delay=settings.health_probe_interval)
+    else:
+        health_prober.start()
     await queue_manager.start_workers()
 
+    if settings.archive_interval_hours > 0:
+        archive_task = asyncio.create_task(
+            archive_loop(async_engine, settings.archive_interval_hours)
+        )
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时停止队列"""
+    if archive_task:
+        archive_task.cancel()
+    # 先停止批量发放，正在处理的批次记为中断而不是失败
+    await bulk_grant_runner.stop()
     await queue_manager.stop_workers()
+    await tracer.stop()
+    if loop_block_detector:
+        await loop_block_detector.stop()
+    await token_refresher.stop()
+    await health_prober.stop()
+    await oauth2_service.close()
+    await newapi_pool.close()
 
 
 if __name__ == "__main__":
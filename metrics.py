@@ -0,0 +1,356 @@
+"""指标模块 - 无第三方依赖的 Prometheus 文本格式指标
+
+每次观测只做常数次列表下标累加（直方图桶数固定，bisect 定位为常数开销），
+不加锁：应用在单个事件循环线程上记录指标，同一子指标的并发累加由 GIL 保证不会损坏数据结构。
+"""
+
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 默认延迟桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    """带标签的指标基类，子指标按标签值缓存，查找为一次字典访问"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    @abstractmethod
+    def _new_child(self):
+        """创建一个子指标"""
+
+    def labels(self, *values) -> object:
+        """获取指定标签值的子指标"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]:
+        """输出各子指标的样本行（Prometheus 文本格式）"""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def _samples(self) -> Iterator[str]:
+        for key, child in list(self._children.items()):
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_total{labels} {_format_value(child.value)}"
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """采集时调用 function 获取当前值"""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function else self.value
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._children[()].dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._children[()].set_function(function)
+
+    def _samples(self) -> Iterator[str]:
+        for key, child in list(self._children.items()):
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {_format_value(child.get())}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """直方图，按桶记录分布，采集时再累加为 Prometheus 的累计桶"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _samples(self) -> Iterator[str]:
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                labels = _format_labels(self.labelnames, key, le)
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """生成 Prometheus 文本格式"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求处理耗时",
+    ("method", "route", "status"),
+)
+UPSTREAM_REQUEST_DURATION = REGISTRY.histogram(
+    "upstream_request_duration_seconds",
+    "上游服务调用耗时",
+    ("service", "operation"),
+)
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    "upstream_requests",
+    "上游服务调用次数",
+    ("service", "operation", "status"),
+)
+QUEUE_WAIT_DURATION = REGISTRY.histogram(
+    "redeem_task_queue_wait_seconds",
+    "兑换任务从入队到开始处理的等待时间",
+)
+TASK_SERVICE_DURATION = REGISTRY.histogram(
+    "redeem_task_service_seconds",
+    "兑换任务从开始处理到结束的处理时间",
+    ("status",),
+)
+QUEUE_DEPTH = REGISTRY.gauge("redeem_queue_depth", "等待处理的兑换任务数")
+QUEUE_CLASS_DEPTH = REGISTRY.gauge(
+    "redeem_queue_class_depth", "各优先级类中等待处理的兑换任务数", ("priority",)
+)
+TASKS_IN_FLIGHT = REGISTRY.gauge("redeem_tasks_in_flight", "正在处理的兑换任务数")
+TASKS_CANCELLED = REGISTRY.counter("redeem_tasks_cancelled", "用户取消的等待中兑换任务数")
+TASKS_RECLAIMED = REGISTRY.counter(
+    "redeem_tasks_reclaimed", "超过截止时间仍未结束、由看门狗回收的兑换任务数"
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds",
+    "数据库语句执行耗时",
+    ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+class _UpstreamCall:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status: Optional[str] = None
+
+
+@contextmanager
+def track_upstream(service: str, operation: str) -> Iterator[_UpstreamCall]:
+    """
+    记录一次上游调用的耗时与状态
+
+    用法::
+
+        with track_upstream("newapi", "create_redemption") as call:
+            response = await client.post(...)
+            call.status = response.status_code
+    """
+    call = _UpstreamCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        if call.status is None:
+            call.status = "error"
+        raise
+    finally:
+        UPSTREAM_REQUEST_DURATION.labels(service, operation).observe(
+            time.perf_counter() - started
+        )
+        UPSTREAM_REQUESTS.labels(service, operation, call.status or "unknown").inc()
+
+
+def instrument_engine(engine):
+    """通过 SQLAlchemy 事件记录每条语句的执行耗时"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["_metrics_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+        DB_QUERY_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("_metrics_started"):
+            conn.info["_metrics_started"].pop()
+
+
+class MetricsMiddleware:
+    """记录每个路由的请求耗时（纯 ASGI 中间件，不包装响应体）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 使用路由模板而不是实际路径，避免 task_id 等参数导致标签无限增长
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope["method"], path, status[0]).observe(
+                time.perf_counter() - started
+            )
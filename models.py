@@ -2,6 +2,7 @@
 
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel
 
 
@@ -9,6 +10,10 @@ class RedeemCode(SQLModel, table=True):
     """兑换码表（已废弃，保留用于历史记录）"""
 
     __tablename__ = "redeem_codes"
+    __table_args__ = (
+        # 仅包含未使用兑换码的部分索引，分配时可 O(log n) 定位下一个可用兑换码
+        Index("ix_redeem_codes_unused", "id", sqlite_where=text("is_used = 0")),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     code: str = Field(unique=True, index=True, description="兑换码")
@@ -22,6 +27,12 @@ class UserRedeemRecord(SQLModel, table=True):
     """用户兑换记录表"""
 
     __tablename__ = "user_redeem_records"
+    __table_args__ = (
+        # 每日领取检查与历史分页都按 (user_id, redeemed_at) 查询
+        Index("ix_user_redeem_records_user_redeemed", "user_id", "redeemed_at"),
+        # 导出按 (redeemed_at, id) 顺序读取，归档按 redeemed_at 范围选取
+        Index("ix_user_redeem_records_redeemed_id", "redeemed_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(index=True, description="用户ID")
@@ -44,3 +55,44 @@ class UserRedeemRecord(SQLModel, table=True):
     source: str = Field(
         default="newapi", description="来源：newapi=实时创建, legacy=预生成"
     )
+
+
+class StatCounter(SQLModel, table=True):
+    """统计计数器表（与领取、导入在同一事务内更新，避免统计时扫描全表）"""
+
+    __tablename__ = "stat_counters"
+
+    key: str = Field(primary_key=True, description="计数器名称")
+    value: int = Field(default=0, description="计数值")
+
+
+class UserSession(SQLModel, table=True):
+    """登录会话表（SESSION_STORE=sqlite 时使用）"""
+
+    __tablename__ = "user_sessions"
+
+    id: str = Field(primary_key=True, description="会话 ID 的 SHA-256")
+    user_id: Optional[int] = Field(default=None, index=True, description="用户ID")
+    data: str = Field(description="会话数据（JSON）")
+    expires_at: datetime = Field(index=True, description="过期时间")
+
+
+class BulkGrantJob(SQLModel, table=True):
+    """批量发放任务表（processed 为断点续传的检查点）"""
+
+    __tablename__ = "bulk_grant_jobs"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(description="批次名称，同时作为兑换码名称")
+    quota: int = Field(description="每个兑换码的额度")
+    users: str = Field(description="发放对象（JSON 数组，元素为 [用户ID, 用户名]）")
+    total: int = Field(description="发放对象数量")
+    processed: int = Field(default=0, description="已发放的数量（按 users 顺序）")
+    status: str = Field(
+        default="pending",
+        index=True,
+        description="状态：pending/running/completed/failed/interrupted",
+    )
+    error: Optional[str] = Field(default=None, description="失败原因")
+    created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
+    updated_at: datetime = Field(default_factory=datetime.now, description="更新时间")
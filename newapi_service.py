@@ -1,7 +1,46 @@
-"""New API 服务模块 - 用于与 New API 交互创建兑换码"""
+"""New API 服务模块 - 用于与 New API 交互创建兑换码
 
+支持配置多个 New API 站点（NEWAPI_BACKENDS），由 NewAPIPool 按权重负载均衡：
+
+- 路由策略（NEWAPI_BALANCER）：p2c 按权重随机抽取两个站点，选负载
+  （进行中的请求数 × 平均延迟）较低的一个；least_outstanding 选进行中请求数/权重最小的站点
+- 每个站点记录进行中的请求数、延迟的指数移动平均、成功/失败次数；
+  还没有成功样本的站点按已测站点的平均延迟估计
+- HTTP 200 但 success=false 的响应与超时、HTTP 错误一样按站点失败计入
+- 连续失败 NEWAPI_EJECT_FAILURES 次的站点被摘除 NEWAPI_EJECT_COOLDOWN 秒，
+  冷却结束后自动恢复；恢复后的第一次请求再失败会立即重新摘除
+- 单次创建失败时换一个站点重试，最多尝试 NEWAPI_MAX_ATTEMPTS 个站点
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
 import httpx
-from typing import Optional, Dict, Any
+from config import settings
+from http_client import create_client, retire_client
+from metrics import REGISTRY, track_upstream
+
+logger = logging.getLogger(__name__)
+
+BALANCERS = ("p2c", "least_outstanding")
+
+NEWAPI_EJECTIONS = REGISTRY.counter(
+    "newapi_backend_ejections", "New API 站点因连续失败被摘除的次数", ("backend",)
+)
+
+# 延迟指数移动平均的平滑系数
+_LATENCY_ALPHA = 0.3
+
+
+def short_error(error: Exception) -> str:
+    """错误信息的第一行（上游错误可能带有完整的多行响应）"""
+    message = str(error).strip() or type(error).__name__
+    return message.split("\n", 1)[0][:200]
 
 
 class NewAPIService:
@@ -21,6 +60,26 @@ class NewAPIService:
         self.base_url = base_url.rstrip("/")
         self.access_token = access_token
         self.api_user = api_user
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共用的 HTTP 客户端（复用连接，避免每次请求重新建立 TLS 连接）"""
+        if self._client is None or self._client.is_closed:
+            self._client = create_client(settings.newapi_timeout)
+        return self._client
+
+    def reconfigure(self):
+        """按当前配置（超时、连接池上限）重建 HTTP 客户端"""
+        if self._client is not None:
+            retire_client(self._client, settings.newapi_timeout)
+            self._client = None
+
+    async def close(self):
+        """关闭共用的 HTTP 客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def _get_headers(self) -> Dict[str, str]:
         """获取请求头"""
@@ -62,24 +121,25 @@ class NewAPIService:
         if name:
             payload["name"] = name
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, json=payload, headers=self._get_headers())
-
-            if response.status_code == 200:
-                data = response.json()
-                return data
-            else:
-                error_msg = f"创建兑换码失败: HTTP {response.status_code}\n"
-                try:
-                    error_data = response.json()
-                    # 返回完整的 JSON 响应
-                    import json
-
-                    error_msg += f"完整响应: {json.dumps(error_data, ensure_ascii=False, indent=2)}"
-                except:
-                    # 如果无法解析为 JSON，返回原始文本
-                    error_msg += f"响应内容: {response.text}"
-                raise Exception(error_msg)
+        with track_upstream("newapi", "create_redemption") as call:
+            response = await self.client.post(
+                url, json=payload, headers=self._get_headers()
+            )
+            call.status = response.status_code
+
+        if response.status_code == 200:
+            data = response.json()
+            return data
+        else:
+            error_msg = f"创建兑换码失败: HTTP {response.status_code}\n"
+            try:
+                error_data = response.json()
+                # 返回完整的 JSON 响应
+                error_msg += f"完整响应: {json.dumps(error_data, ensure_ascii=False, indent=2)}"
+            except:
+                # 如果无法解析为 JSON，返回原始文本
+                error_msg += f"响应内容: {response.text}"
+            raise Exception(error_msg)
 
     async def test_connection(self) -> bool:
         """
@@ -91,41 +151,317 @@ class NewAPIService:
         try:
             # 尝试调用一个简单的 API 端点来验证连接
             url = f"{self.base_url}/api/status"
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url, headers=self._get_headers())
+            with track_upstream("newapi", "status") as call:
+                response = await self.client.get(
+                    url, headers=self._get_headers(), timeout=10.0
+                )
+                call.status = response.status_code
                 return response.status_code in [200, 401, 403]  # 能连接上就算成功
         except:
             return False
 
 
-# 全局服务实例（可选）
-_newapi_service: Optional[NewAPIService] = None
+@dataclass
+class NewAPIBackend:
+    """一个 New API 站点及其健康与延迟统计"""
+
+    name: str
+    service: NewAPIService
+    weight: float = 1.0
+    outstanding: int = 0  # 进行中的请求数
+    latency: Optional[float] = None  # 成功请求延迟的指数移动平均（秒）
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0  # 单调时间，摘除到该时间为止
+    ejections: int = 0
+    last_error: Optional[str] = field(default=None, repr=False)
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
 
+    def load(self, prior: float) -> float:
+        """
+        p2c 比较用的负载：排队后的预计等待时间
+
+        Args:
+            prior: 还没有成功样本时使用的延迟估计（只挂起或只失败的站点不能被当作零延迟）
+        """
+        latency = self.latency if self.latency is not None else prior
+        return (self.outstanding + 1) * latency
 
-def init_newapi_service(
-    base_url: str, access_token: str, api_user: Optional[str] = None
-) -> NewAPIService:
+    def record_success(self, elapsed: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.latency = (
+            elapsed
+            if self.latency is None
+            else self.latency + _LATENCY_ALPHA * (elapsed - self.latency)
+        )
+
+    def record_failure(self, error: Exception, threshold: int, cooldown: float):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = short_error(error)
+        if self.consecutive_failures >= threshold:
+            self.ejected_until = time.monotonic() + cooldown
+            self.ejections += 1
+            # 冷却结束后的第一次请求再失败就立即重新摘除
+            self.consecutive_failures = threshold - 1
+            NEWAPI_EJECTIONS.labels(self.name).inc()
+            logger.warning(
+                "New API 站点 %s 连续失败，摘除 %g 秒: %s",
+                self.name,
+                cooldown,
+                self.last_error,
+            )
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "weight": self.weight,
+            "healthy": self.available(now),
+            "outstanding": self.outstanding,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "ejected_for_s": round(max(self.ejected_until - now, 0.0), 1),
+            "last_error": self.last_error,
+        }
+
+
+def parse_backends(spec: str) -> List[NewAPIBackend]:
     """
-    初始化全局 New API 服务实例
+    解析 New API 站点列表
 
     Args:
-        base_url: New API 站点地址
-        access_token: New API 访问令牌
-        api_user: New API 用户标识
+        spec: 逗号分隔的站点，每个站点为 "地址|访问令牌|New-Api-User|权重"，
+            后两项可省略，例如 "https://a.example.com|sk-a|1|3,https://b.example.com|sk-b"
 
     Returns:
-        New API 服务实例
+        站点列表
     """
-    global _newapi_service
-    _newapi_service = NewAPIService(base_url, access_token, api_user)
-    return _newapi_service
+    backends = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        parts = [part.strip() for part in item.split("|")]
+        if len(parts) < 2 or not parts[0] or not parts[1]:
+            raise ValueError(f"无效的 New API 站点配置: {item}")
+        api_user = parts[2] if len(parts) > 2 and parts[2] else None
+        weight = float(parts[3]) if len(parts) > 3 and parts[3] else 1.0
+        if weight <= 0:
+            raise ValueError(f"New API 站点权重必须大于 0: {item}")
+        backends.append(
+            NewAPIBackend(
+                name=urlparse(parts[0]).netloc or parts[0],
+                service=NewAPIService(parts[0], parts[1], api_user),
+                weight=weight,
+            )
+        )
+    return backends
 
 
-def get_newapi_service() -> Optional[NewAPIService]:
-    """
-    获取全局 New API 服务实例
+class NewAPIPool:
+    """多个 New API 站点的负载均衡与故障转移"""
 
-    Returns:
-        New API 服务实例，如果未初始化则返回 None
-    """
-    return _newapi_service
+    def __init__(
+        self,
+        backends: List[NewAPIBackend],
+        balancer: str = "p2c",
+        eject_failures: int = 3,
+        eject_cooldown: float = 30.0,
+        max_attempts: int = 2,
+    ):
+        """
+        Args:
+            backends: 站点列表
+            balancer: 路由策略，p2c 或 least_outstanding
+            eject_failures: 连续失败多少次后摘除站点
+            eject_cooldown: 摘除时长（秒）
+            max_attempts: 单次创建最多尝试的站点数
+        """
+        if balancer not in BALANCERS:
+            raise ValueError(f"未知的路由策略: {balancer}（可选 {', '.join(BALANCERS)}）")
+        self.backends = backends
+        self.balancer = balancer
+        self.eject_failures = eject_failures
+        self.eject_cooldown = eject_cooldown
+        self.max_attempts = max_attempts
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.backends)
+
+    def pick(self, exclude: tuple = ()) -> Optional[NewAPIBackend]:
+        """
+        选择一个站点
+
+        Args:
+            exclude: 本次请求已经尝试过的站点
+
+        Returns:
+            选中的站点；全部被摘除时选择最早恢复的站点，没有可选站点时返回 None
+        """
+        candidates = [b for b in self.backends if b not in exclude]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        healthy = [b for b in candidates if b.available(now)]
+        if not healthy:
+            # 全部被摘除时仍然尝试最早恢复的站点，而不是直接失败
+            return min(candidates, key=lambda b: b.ejected_until)
+        if len(healthy) == 1:
+            return healthy[0]
+
+        prior = self._latency_prior()
+        if self.balancer == "least_outstanding":
+            return min(
+                healthy,
+                key=lambda b: (
+                    (b.outstanding + 1) / b.weight,
+                    b.latency if b.latency is not None else prior,
+                ),
+            )
+
+        # power of two choices：按权重抽取两个不同的站点，选负载较低的
+        first = random.choices(healthy, weights=[b.weight for b in healthy])[0]
+        rest = [b for b in healthy if b is not first]
+        second = random.choices(rest, weights=[b.weight for b in rest])[0]
+        return first if first.load(prior) <= second.load(prior) else second
+
+    def _latency_prior(self) -> float:
+        """没有成功样本的站点的延迟估计：已测站点的平均延迟，都没有测到时用请求超时"""
+        measured = [b.latency for b in self.backends if b.latency is not None]
+        if not measured:
+            return settings.newapi_timeout
+        return sum(measured) / len(measured)
+
+    async def create_redemption_code(
+        self,
+        quota: int = 500000,
+        count: int = 1,
+        name: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        选择站点创建兑换码，失败时换一个站点重试
+
+        每次尝试的超时为 NEWAPI_TIMEOUT 与"剩余时间 / 剩余尝试次数"中的较小者，
+        挂起的站点在调用方的处理时限到达之前就按失败计入并触发故障转移。
+
+        Args:
+            quota: 额度
+            count: 创建数量
+            name: 兑换码名称
+            deadline: 调用方的处理时限（事件循环时间，即 asyncio.timeout().when()），None 表示不限
+
+        Returns:
+            创建结果，包含兑换码列表
+
+        Raises:
+            Exception: 所有尝试都失败时抛出最后一次的异常
+        """
+        if not self.backends:
+            raise Exception("New API 未配置")
+
+        loop = asyncio.get_running_loop()
+        attempts = min(self.max_attempts, len(self.backends))
+        tried: tuple = ()
+        last_error: Optional[Exception] = None
+        for attempt in range(attempts):
+            timeout = settings.newapi_timeout
+            if deadline is not None:
+                timeout = min(timeout, (deadline - loop.time()) / (attempts - attempt))
+                if timeout <= 0:
+                    break
+            backend = self.pick(exclude=tried)
+            if backend is None:
+                break
+            tried += (backend,)
+            backend.outstanding += 1
+            started = time.perf_counter()
+            try:
+                async with asyncio.timeout(timeout):
+                    result = await backend.service.create_redemption_code(
+                        quota=quota, count=count, name=name
+                    )
+                # New API 的业务错误以 HTTP 200 + success=false 返回，同样按站点失败处理
+                if isinstance(result, dict) and result.get("success") is False:
+                    raise Exception(
+                        f"创建兑换码失败: {result.get('message') or '上游返回 success=false'}"
+                    )
+            except asyncio.CancelledError:
+                # 调用方的处理时限已到（看门狗也只在时限之后回收）：请求挂在这个站点上，按失败计入；
+                # 停机、取消批量任务等其他取消与站点无关，只释放进行中计数
+                if deadline is not None and loop.time() >= deadline:
+                    backend.record_failure(
+                        TimeoutError("请求未在调用方的处理时限内完成"),
+                        self.eject_failures,
+                        self.eject_cooldown,
+                    )
+                raise
+            except Exception as e:
+                if isinstance(e, TimeoutError):
+                    e = TimeoutError(f"请求超时（{timeout:.1f} 秒）")
+                backend.record_failure(e, self.eject_failures, self.eject_cooldown)
+                last_error = e
+                logger.info("New API 站点 %s 创建失败: %s", backend.name, short_error(e))
+                continue
+            finally:
+                backend.outstanding -= 1
+            backend.record_success(time.perf_counter() - started)
+            return result
+        raise last_error or TimeoutError("处理时限已到，未能尝试 New API 站点")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """各站点的统计信息"""
+        now = time.monotonic()
+        return [backend.stats(now) for backend in self.backends]
+
+    def reconfigure(self):
+        """按当前配置更新路由策略、摘除与重试参数"""
+        self.balancer = settings.newapi_balancer
+        self.eject_failures = settings.newapi_eject_failures
+        self.eject_cooldown = settings.newapi_eject_cooldown
+        self.max_attempts = settings.newapi_max_attempts
+
+    def reconfigure_clients(self):
+        """按当前配置（超时、连接池上限）重建各站点的 HTTP 客户端"""
+        for backend in self.backends:
+            backend.service.reconfigure()
+
+    async def close(self):
+        for backend in self.backends:
+            await backend.service.close()
+
+
+def _configured_backends() -> List[NewAPIBackend]:
+    """NEWAPI_BACKENDS 为空时使用单站点配置 NEWAPI_SITE_URL / NEWAPI_ACCESS_TOKEN"""
+    if settings.newapi_backends.strip():
+        return parse_backends(settings.newapi_backends)
+    if settings.newapi_site_url and settings.newapi_access_token:
+        return [
+            NewAPIBackend(
+                name=urlparse(settings.newapi_site_url).netloc or settings.newapi_site_url,
+                service=NewAPIService(
+                    settings.newapi_site_url,
+                    settings.newapi_access_token,
+                    settings.newapi_user or None,
+                ),
+            )
+        ]
+    return []
+
+
+# 全局站点池
+newapi_pool = NewAPIPool(
+    _configured_backends(),
+    balancer=settings.newapi_balancer,
+    eject_failures=settings.newapi_eject_failures,
+    eject_cooldown=settings.newapi_eject_cooldown,
+    max_attempts=settings.newapi_max_attempts,
+)
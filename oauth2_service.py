@@ -4,6 +4,8 @@ import base64
 from typing import Optional
 import httpx
 from config import settings
+from http_client import create_client, retire_client
+from metrics import track_upstream
 
 
 class OAuth2Service:
@@ -16,6 +18,30 @@ class OAuth2Service:
         self.authorize_url = settings.oauth2_authorize_url
         self.token_url = settings.oauth2_token_url
         self.user_info_url = settings.oauth2_user_info_url
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        共用的 HTTP 客户端
+
+        复用连接池，避免每次请求都新建客户端（创建 SSL 上下文、TCP/TLS 握手）。
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = create_client(settings.oauth2_timeout)
+        return self._client
+
+    def reconfigure(self):
+        """按当前配置（超时、连接池上限）重建 HTTP 客户端"""
+        if self._client is not None:
+            retire_client(self._client, settings.oauth2_timeout)
+            self._client = None
+
+    async def close(self):
+        """关闭共用的 HTTP 客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def get_authorization_url(self, state: str = "random_state") -> str:
         """
@@ -69,12 +95,13 @@ class OAuth2Service:
             "redirect_uri": self.redirect_uri,
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
+        with track_upstream("oauth2", "exchange_token") as call:
+            response = await self.client.post(
                 self.token_url,
                 headers=headers,
                 data=data,
             )
+            call.status = response.status_code
             response.raise_for_status()
             return response.json()
 
@@ -98,12 +125,13 @@ class OAuth2Service:
             "refresh_token": refresh_token,
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
+        with track_upstream("oauth2", "refresh_token") as call:
+            response = await self.client.post(
                 self.token_url,
                 headers=headers,
                 data=data,
             )
+            call.status = response.status_code
             response.raise_for_status()
             return response.json()
 
@@ -121,14 +149,27 @@ class OAuth2Service:
             "Authorization": f"Bearer {access_token}",
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
+        with track_upstream("oauth2", "user_info") as call:
+            response = await self.client.get(
                 self.user_info_url,
                 headers=headers,
             )
+            call.status = response.status_code
             response.raise_for_status()
             return response.json()
 
+    async def check_connection(self) -> bool:
+        """
+        检查 OAuth2 提供方能否连通（不带令牌请求用户信息接口，返回 4xx 也算连通）
+
+        Returns:
+            是否连通
+        """
+        with track_upstream("oauth2", "status") as call:
+            response = await self.client.get(self.user_info_url)
+            call.status = response.status_code
+            return response.status_code < 500
+
 
 # 创建全局服务实例
 oauth2_service = OAuth2Service()
@@ -0,0 +1,488 @@
+"""静态页面模块 - 启动时预先编码与压缩页面，按请求直接从内存返回
+
+页面不包含任何用户数据，用户相关信息由前端通过 /api/bootstrap 获取，
+因此同一份字节可以对所有用户复用，并配合强 ETag 与 Cache-Control 缓存。
+"""
+
+import gzip
+import hashlib
+from typing import Dict, Optional, Set
+from fastapi import Request, Response
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖
+    brotli = None
+
+
+def _accepted_encodings(header: str) -> Set[str]:
+    """解析 Accept-Encoding，返回客户端接受的编码（忽略 q=0）"""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+class StaticPage:
+    """预编码的静态页面"""
+
+    def __init__(self, html: str):
+        """
+        编码并预压缩页面
+
+        Args:
+            html: 页面 HTML
+        """
+        identity = html.encode("utf-8")
+        digest = hashlib.sha256(identity).hexdigest()[:32]
+
+        # 编码 -> (内容, 强 ETag)；不同编码的字节不同，ETag 也必须不同
+        self.variants: Dict[Optional[str], tuple[bytes, str]] = {
+            None: (identity, f'"{digest}"'),
+            "gzip": (gzip.compress(identity, compresslevel=9, mtime=0), f'"{digest}-gz"'),
+        }
+        if brotli is not None:
+            self.variants["br"] = (
+                brotli.compress(identity, quality=11),
+                f'"{digest}-br"',
+            )
+        self.etags = {etag for _, etag in self.variants.values()}
+
+    def _select_encoding(self, request: Request) -> Optional[str]:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and encoding in accepted:
+                return encoding
+        return None
+
+    def response(self, request: Request) -> Response:
+        """根据请求头返回 304 或对应编码的页面"""
+        encoding = self._select_encoding(request)
+        body, etag = self.variants[encoding]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={settings.page_cache_max_age}",
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match:
+            candidates = {tag.strip() for tag in if_none_match.split(",")}
+            if "*" in candidates or candidates & self.etags:
+                return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(
+            content=body, media_type="text/html; charset=utf-8", headers=headers
+        )
+
+
+HOME_HTML = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Linux.do OAuth2 Demo</title>
+        <style>
+            body {
+                font-family: Arial, sans-serif;
+                max-width: 800px;
+                margin: 50px auto;
+                padding: 20px;
+                background-color: #f5f5f5;
+            }
+            .container {
+                background-color: white;
+                padding: 30px;
+                border-radius: 8px;
+                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+            }
+            h1 {
+                color: #333;
+            }
+            .btn {
+                display: inline-block;
+                padding: 12px 24px;
+                background-color: #007bff;
+                color: white;
+                text-decoration: none;
+                border-radius: 4px;
+                margin-top: 20px;
+            }
+            .btn:hover {
+                background-color: #0056b3;
+            }
+            .info {
+                margin-top: 30px;
+                padding: 15px;
+                background-color: #e7f3ff;
+                border-left: 4px solid #007bff;
+            }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>🚀 Linux.do OAuth2 登录演示</h1>
+            <p>这是一个使用 FastAPI 和 Linux.do OAuth2 认证的示例应用。</p>
+            <a href="/login" class="btn">使用 Linux.do 登录</a>
+            
+            <div class="info">
+                <h3>可用端点：</h3>
+                <ul>
+                    <li><code>GET /</code> - 首页</li>
+                    <li><code>GET /login</code> - 开始 OAuth2 登录流程</li>
+                    <li><code>GET /oauth2/callback</code> - OAuth2 回调处理</li>
+                    <li><code>GET /logout</code> - 退出登录</li>
+                    <li><code>GET /user</code> - 获取用户信息（需要 access_token）</li>
+                    <li><code>POST /refresh</code> - 刷新 access token（需要 refresh_token）</li>
+                    <li><code>GET /docs</code> - API 文档</li>
+                </ul>
+            </div>
+        </div>
+    </body>
+    </html>
+"""
+
+REDEEM_HTML = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>每日兑换码</title>
+        <style>
+            body {
+                font-family: Arial, sans-serif;
+                max-width: 800px;
+                margin: 50px auto;
+                padding: 20px;
+                background-color: #f5f5f5;
+            }
+            .container {
+                background-color: white;
+                padding: 30px;
+                border-radius: 8px;
+                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+            }
+            h1 {
+                color: #333;
+            }
+            .btn {
+                display: inline-block;
+                padding: 12px 24px;
+                background-color: #28a745;
+                color: white;
+                text-decoration: none;
+                border: none;
+                border-radius: 4px;
+                margin-top: 20px;
+                cursor: pointer;
+                font-size: 16px;
+            }
+            .btn:hover {
+                background-color: #218838;
+            }
+            .btn:disabled {
+                background-color: #6c757d;
+                cursor: not-allowed;
+            }
+            .result {
+                margin-top: 20px;
+                padding: 15px;
+                border-radius: 4px;
+                display: none;
+            }
+            .result.success {
+                background-color: #d4edda;
+                border: 1px solid #c3e6cb;
+                color: #155724;
+            }
+            .result.error {
+                background-color: #f8d7da;
+                border: 1px solid #f5c6cb;
+                color: #721c24;
+            }
+            .code-display {
+                font-size: 24px;
+                font-weight: bold;
+                margin: 15px 0;
+                padding: 15px;
+                background-color: #fff;
+                border: 2px dashed #28a745;
+                text-align: center;
+                border-radius: 4px;
+            }
+            .history {
+                margin-top: 30px;
+            }
+            .history-item {
+                padding: 10px;
+                margin: 5px 0;
+                background-color: #f8f9fa;
+                border-radius: 4px;
+                display: flex;
+                justify-content: space-between;
+            }
+            .back-btn {
+                background-color: #007bff;
+                margin-right: 10px;
+            }
+            .back-btn:hover {
+                background-color: #0056b3;
+            }
+            .user-info {
+                background-color: #e7f3ff;
+                padding: 15px;
+                border-radius: 4px;
+                margin-bottom: 20px;
+            }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>🎁 每日兑换码</h1>
+<div class="user-info" id="user-info" style="display:none;">
+                <p><strong>欢迎：</strong><span id="username"></span></p>
+                <p><strong>信任等级：</strong><span id="trust-level"></span></p>
+                <p><a href="/logout">退出登录</a></p>
+            </div>
+            <p id="login-hint" style="display:none;">每天可以领取一个兑换码，<a href="/login">点击登录</a></p>
+            
+            <button class="btn" id="claim-btn" onclick="claimCode()" disabled title="请先登录">领取今日兑换码</button>
+            <button class="btn back-btn" onclick="location.href='/'">返回首页</button>
+            
+            <div class="result" id="result"></div>
+            
+            <div class="history" id="history" style="display:none;">
+                <h2>📜 领取历史</h2>
+                <div id="history-list"></div>
+                <button class="btn back-btn" id="history-more" style="display:none;" onclick="loadHistory(true)">加载更多</button>
+            </div>
+        </div>
+        
+        <script>
+            let loggedIn = false;
+            
+            async function claimCode() {
+                const resultDiv = document.getElementById('result');
+                const btn = event.target;
+                
+                if (!loggedIn) {
+                    showResult('error', '请先<a href="/login">登录</a>！');
+                    return;
+                }
+                
+                btn.disabled = true;
+                btn.textContent = '提交中...';
+                
+                try {
+                    const response = await fetch('/api/redeem/daily', {
+                        method: 'POST'
+                    });
+                    
+                    const data = await response.json();
+                    
+                    if (data.success) {
+                        // 任务已提交到队列，开始轮询状态
+                        const taskId = data.data.task_id;
+                        showResult('success', `<p>⏳ 任务已提交，正在生成兑换码...</p>`);
+                        btn.textContent = '生成中...';
+                        
+                        // 轮询任务状态
+                        await pollTaskStatus(taskId, btn);
+                    } else {
+                        showResult('error', data.detail || '提交失败');
+                        btn.disabled = false;
+                        btn.textContent = '领取今日兑换码';
+                    }
+                } catch (error) {
+                    showResult('error', '网络错误，请重试');
+                    btn.disabled = false;
+                    btn.textContent = '领取今日兑换码';
+                }
+            }
+            
+            async function pollTaskStatus(taskId, btn) {
+                const maxAttempts = 60; // 最多轮询60次
+                const interval = 1000; // 每秒轮询一次
+                let attempts = 0;
+                
+                const poll = async () => {
+                    try {
+                        const response = await fetch(`/api/task/${encodeURIComponent(taskId)}`);
+                        const data = await response.json();
+                        
+                        if (data.success) {
+                            const status = data.data.status;
+                            
+                            if (status === 'completed') {
+                                // 任务完成
+                                showResult('success', `
+                                    <p>✅ 领取成功！</p>
+                                    <div class="code-display">${data.data.code}</div>
+                                    <p>完成时间：${new Date(data.data.completed_at).toLocaleString('zh-CN')}</p>
+                                `);
+                                btn.disabled = false;
+                                btn.textContent = '领取今日兑换码';
+                                loadHistory();
+                                return;
+                            } else if (status === 'failed') {
+                                // 任务失败
+                                showResult('error', `生成失败：${data.data.error || '未知错误'}`);
+                                btn.disabled = false;
+                                btn.textContent = '领取今日兑换码';
+                                return;
+                            } else if (status === 'cancelled') {
+                                showResult('error', '任务已取消');
+                                btn.disabled = false;
+                                btn.textContent = '领取今日兑换码';
+                                return;
+                            } else if (status === 'processing') {
+                                showResult('success', `<p>⚙️ 正在生成兑换码，请稍候...</p>`);
+                            } else if (status === 'pending' && data.data.queue_position) {
+                                showResult('success', `<p>⏳ 排队中，前方还有 ${data.data.queue_position - 1} 个任务...</p>`);
+                            }
+                        }
+                        
+                        // 继续轮询
+                        attempts++;
+                        if (attempts < maxAttempts) {
+                            setTimeout(poll, interval);
+                        } else {
+                            showResult('error', '任务超时，请稍后查看历史记录');
+                            btn.disabled = false;
+                            btn.textContent = '领取今日兑换码';
+                        }
+                    } catch (error) {
+                        console.error('轮询失败:', error);
+                        attempts++;
+                        if (attempts < maxAttempts) {
+                            setTimeout(poll, interval);
+                        } else {
+                            showResult('error', '网络错误，请稍后查看历史记录');
+                            btn.disabled = false;
+                            btn.textContent = '领取今日兑换码';
+                        }
+                    }
+                };
+                
+                // 开始轮询
+                poll();
+            }
+            
+            let historyCursor = null;
+            
+            function renderHistory(history, more = false) {
+                if (history.history.length > 0) {
+                    const historyDiv = document.getElementById('history');
+                    const historyList = document.getElementById('history-list');
+                    
+                    const items = history.history.map(item => `
+                        <div class="history-item">
+                            <span><strong>${item.code}</strong></span>
+                            <span>${new Date(item.redeemed_at).toLocaleString('zh-CN')}</span>
+                        </div>
+                    `).join('');
+                    historyList.innerHTML = more ? historyList.innerHTML + items : items;
+                    
+                    historyDiv.style.display = 'block';
+                }
+                historyCursor = history.next_cursor;
+                document.getElementById('history-more').style.display = historyCursor ? 'inline-block' : 'none';
+            }
+            
+            async function loadHistory(more = false) {
+                if (!loggedIn) return;
+                
+                try {
+                    let url = '/api/redeem/history';
+                    if (more && historyCursor) {
+                        url += `?cursor=${encodeURIComponent(historyCursor)}`;
+                    }
+                    const response = await fetch(url);
+                    const data = await response.json();
+                    
+                    if (data.success) {
+                        renderHistory(data.data, more);
+                    }
+                } catch (error) {
+                    console.error('加载历史记录失败:', error);
+                }
+            }
+            
+            // 一次请求获取今日领取状态、进行中的任务与第一页历史记录
+            async function loadDashboard() {
+                try {
+                    const response = await fetch('/api/redeem/dashboard');
+                    const data = await response.json();
+                    if (!data.success) return;
+                    
+                    renderHistory(data.data.history);
+                    
+                    const btn = document.getElementById('claim-btn');
+                    const task = data.data.task;
+                    if (task && (task.status === 'pending' || task.status === 'processing')) {
+                        // 恢复未完成任务的轮询
+                        btn.disabled = true;
+                        btn.textContent = '生成中...';
+                        showResult('success', `<p>⏳ 兑换码正在生成中...</p>`);
+                        pollTaskStatus(task.task_id, btn);
+                    } else if (data.data.claimed_today) {
+                        btn.disabled = true;
+                        btn.textContent = '今日已领取';
+                    }
+                } catch (error) {
+                    console.error('加载页面状态失败:', error);
+                }
+            }
+            
+            function showResult(type, message) {
+                const resultDiv = document.getElementById('result');
+                resultDiv.className = `result ${type}`;
+                resultDiv.innerHTML = message;
+                resultDiv.style.display = 'block';
+            }
+            
+            // 页面本身是静态的，用户数据通过 bootstrap 接口获取（会话 Cookie 随请求自动发送）
+            async function bootstrap() {
+                try {
+                    const response = await fetch('/api/bootstrap');
+                    const data = await response.json();
+                    
+                    if (data.success && data.data.logged_in) {
+                        loggedIn = true;
+                        document.getElementById('username').textContent = data.data.username || '未知用户';
+                        document.getElementById('trust-level').textContent = data.data.trust_level ?? 'N/A';
+                        document.getElementById('user-info').style.display = 'block';
+                        
+                        const btn = document.getElementById('claim-btn');
+                        btn.disabled = false;
+                        btn.removeAttribute('title');
+                        
+                        loadDashboard();
+                        return;
+                    }
+                } catch (error) {
+                    console.error('加载用户信息失败:', error);
+                }
+                document.getElementById('login-hint').style.display = 'block';
+            }
+            
+            // 页面加载时获取用户信息并加载页面状态
+            window.onload = bootstrap;
+        </script>
+    </body>
+    </html>
+"""
+
+HOME_PAGE = StaticPage(HOME_HTML)
+REDEEM_PAGE = StaticPage(REDEEM_HTML)
@@ -0,0 +1,186 @@
+"""性能剖析模块 - 线上实例的采样剖析与事件循环阻塞检测
+
+两部分都只依赖标准库，运行期开销很小：
+
+- 采样剖析：后台线程按固定间隔读取事件循环线程的调用栈（sys._current_frames），
+  输出 flamegraph.pl / speedscope 可直接读取的 collapsed stack 格式。
+- 阻塞检测：事件循环内的心跳协程定期打点，看门狗线程发现心跳停滞超过阈值时
+  抓取事件循环线程当前的调用栈；心跳恢复后记录阻塞时长和抓到的调用栈。
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from types import FrameType
+from typing import Optional
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOP_BLOCKS = REGISTRY.counter(
+    "event_loop_blocks", "事件循环被阻塞超过阈值的次数"
+)
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "event_loop_lag_seconds",
+    "事件循环心跳延迟",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+def _frame_label(frame: FrameType) -> str:
+    """栈帧标签：函数名 (文件名:函数首行)"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame: Optional[FrameType]) -> str:
+    """把调用栈折叠成 root;...;leaf 格式"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class SamplingProfiler:
+    """对指定线程做定时采样的剖析器"""
+
+    def __init__(self, thread_id: int, interval: float):
+        """
+        Args:
+            thread_id: 被采样的线程（事件循环所在线程）
+            interval: 采样间隔（秒）
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def run(self, duration: float):
+        """在当前线程中采样 duration 秒（阻塞调用，应在独立线程中运行）"""
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+                self.samples += 1
+            del frame
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        """collapsed stack 文本，每行 "栈 次数"，按次数降序"""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+_profile_lock = asyncio.Lock()
+
+
+def profile_in_progress() -> bool:
+    """是否已有剖析在运行"""
+    return _profile_lock.locked()
+
+
+async def profile_event_loop(seconds: float, interval: float) -> SamplingProfiler:
+    """
+    对事件循环线程采样剖析，同一时间只允许一个剖析
+
+    Args:
+        seconds: 采样时长（秒）
+        interval: 采样间隔（秒）
+
+    Returns:
+        完成采样的剖析器
+    """
+    async with _profile_lock:
+        profiler = SamplingProfiler(threading.get_ident(), interval)
+        sampler = threading.Thread(
+            target=profiler.run, args=(seconds,), name="profiler", daemon=True
+        )
+        sampler.start()
+        # 不占用线程池，按间隔轮询采样线程是否结束
+        while sampler.is_alive():
+            await asyncio.sleep(min(0.1, seconds))
+        return profiler
+
+
+class LoopBlockDetector:
+    """事件循环阻塞检测器"""
+
+    def __init__(self, threshold: float):
+        """
+        Args:
+            threshold: 阻塞阈值（秒）
+        """
+        self.threshold = threshold
+        self.interval = threshold / 2  # 心跳间隔
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._blocked_stack: Optional[str] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """在事件循环中启动心跳协程和看门狗线程"""
+        if self._heartbeat_task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self):
+        """停止检测"""
+        if self._heartbeat_task is None:
+            return
+        self._stopped.set()
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat_task = None
+        self._watchdog = None
+
+    async def _heartbeat(self):
+        """定期打点，并根据唤醒延迟判断刚才是否发生了阻塞"""
+        while True:
+            expected = time.monotonic() + self.interval
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - expected
+            EVENT_LOOP_LAG.observe(max(lag, 0.0))
+            stack, self._blocked_stack = self._blocked_stack, None
+            if lag < self.threshold:
+                continue
+
+            EVENT_LOOP_BLOCKS.inc()
+            logger.warning(
+                "事件循环被阻塞 %.1f ms（阈值 %.0f ms）\n%s",
+                lag * 1000,
+                self.threshold * 1000,
+                stack or "阻塞时间过短，未抓取到调用栈",
+            )
+
+    def _watch(self):
+        """看门狗线程：心跳停滞超过阈值时抓取事件循环线程的调用栈"""
+        while not self._stopped.wait(self.interval / 2):
+            stalled = time.monotonic() - self._last_beat - self.interval
+            if stalled < self.threshold or self._blocked_stack is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._blocked_stack = "".join(traceback.format_stack(frame))
+            del frame
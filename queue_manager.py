@@ -1,13 +1,35 @@
 """队列管理模块 - 管理兑换码生成任务队列"""
 
 import asyncio
-import uuid
+import logging
+import secrets
+import string
+import sys
+import time
+from collections import Counter
 from datetime import datetime
-from typing import Dict, Optional, Any
-from enum import Enum
+from typing import Dict, Hashable, List, Optional, Any, Tuple, Union
+from enum import Enum, IntEnum
 from dataclasses import dataclass, field
-from newapi_service import NewAPIService
+from newapi_service import newapi_pool
 from config import settings
+from database import async_session_maker
+from fair_queue import FairQueue
+from legacy_pool import allocate_legacy_code
+from stats_service import record_legacy_allocation
+from tracing import SpanContext, tracer
+from logging_config import log_context
+from metrics import (
+    QUEUE_CLASS_DEPTH,
+    QUEUE_DEPTH,
+    QUEUE_WAIT_DURATION,
+    TASK_SERVICE_DURATION,
+    TASKS_CANCELLED,
+    TASKS_IN_FLIGHT,
+    TASKS_RECLAIMED,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class TaskStatus(str, Enum):
@@ -17,22 +39,114 @@ class TaskStatus(str, Enum):
     PROCESSING = "processing"  # 处理中
     COMPLETED = "completed"  # 已完成
     FAILED = "failed"  # 失败
+    CANCELLED = "cancelled"  # 用户在处理前取消
 
 
-@dataclass
+class TaskPriority(IntEnum):
+    """任务优先级类（数值越小越先处理，类内按用户轮转）"""
+
+    INTERACTIVE = 0  # 用户实时领取
+    RETRY = 1  # 失败后自动重试
+    BULK = 2  # 后台批量任务
+
+
+# 批量任务不属于任何用户，使用这个占位用户ID（OAuth 用户ID从 1 开始）
+BATCH_USER_ID = 0
+
+# 公开任务 ID 的字符表（URL 安全），每个字符 6 位
+_TASK_ID_ALPHABET = string.ascii_letters + string.digits + "-_"
+_TASK_ID_INDEX = {char: i for i, char in enumerate(_TASK_ID_ALPHABET)}
+_TASK_ID_CHARS = 10
+# 内部任务 ID 的位数，60 位整数在 CPython 中仍是两位小整数，编码后正好 10 个字符
+TASK_ID_BITS = _TASK_ID_CHARS * 6
+
+# 单调时钟到墙上时间的偏移，任务时间戳以单调时间保存，对外展示时再换算
+_MONOTONIC_EPOCH = time.time() - time.monotonic()
+
+
+def encode_task_id(task_id: int) -> str:
+    """把内部整数任务 ID 编码为对外的短字符串"""
+    chars = []
+    for _ in range(_TASK_ID_CHARS):
+        task_id, digit = divmod(task_id, 64)
+        chars.append(_TASK_ID_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def decode_task_id(public_id: str) -> Optional[int]:
+    """
+    解析对外的任务 ID
+
+    Returns:
+        内部整数任务 ID，格式不正确时返回 None
+    """
+    if len(public_id) != _TASK_ID_CHARS:
+        return None
+    task_id = 0
+    for char in public_id:
+        digit = _TASK_ID_INDEX.get(char)
+        if digit is None:
+            return None
+        task_id = task_id * 64 + digit
+    return task_id
+
+
+def _to_datetime(monotonic: Optional[float]) -> Optional[datetime]:
+    """单调时间转换为本地时间"""
+    if monotonic is None:
+        return None
+    return datetime.fromtimestamp(_MONOTONIC_EPOCH + monotonic)
+
+
+@dataclass(slots=True)
 class RedeemTask:
-    """兑换码生成任务"""
+    """
+    兑换码生成任务
+
+    队列会长期保留大量任务，因此使用紧凑的表示：slots 去掉实例 __dict__，
+    任务 ID 为整数（对外使用 task_id 的短字符串形式），时间为单调时钟的浮点数，
+    用户名驻留（同一用户的多个任务共用一个字符串）。
+    """
 
-    task_id: str
+    id: int
     user_id: int
     username: str
     quota: int
     status: TaskStatus = TaskStatus.PENDING
-    created_at: datetime = field(default_factory=datetime.now)
-    started_at: Optional[datetime] = None
-    completed_at: Optional[datetime] = None
+    created: float = field(default_factory=time.monotonic)  # 单调时间
+    started: Optional[float] = None
+    completed: Optional[float] = None
     result: Optional[str] = None  # 生成的兑换码
     error: Optional[str] = None  # 错误信息
+    source: str = "newapi_queue"  # 兑换码来源：newapi_queue=New API, legacy=旧兑换码池
+    redeem_code_id: Optional[int] = None  # 旧兑换码池中的兑换码ID
+    priority: TaskPriority = TaskPriority.INTERACTIVE  # 优先级类
+    flow: Optional[Hashable] = None  # 类内轮转的分组，None 表示按用户
+    attempts: int = 0  # 已失败并重试的次数
+    queue_seq: int = 0  # 在所属优先级类中的入队序号，用于 O(1) 估算排队位置
+    trace_context: Optional[SpanContext] = None  # 提交任务时的 span 上下文
+    count: int = 1  # 申请的兑换码数量，批量任务一次申请一批
+    done: Optional[asyncio.Future] = None  # 批量任务结束时设置结果，提交方据此等待
+
+    def __post_init__(self):
+        self.username = sys.intern(self.username)
+
+    @property
+    def task_id(self) -> str:
+        """对外的任务 ID"""
+        return encode_task_id(self.id)
+
+    @property
+    def created_at(self) -> datetime:
+        return _to_datetime(self.created)
+
+    @property
+    def started_at(self) -> Optional[datetime]:
+        return _to_datetime(self.started)
+
+    @property
+    def completed_at(self) -> Optional[datetime]:
+        return _to_datetime(self.completed)
 
 
 class QueueManager:
@@ -46,11 +160,20 @@ class QueueManager:
             max_concurrent: 最大并发数（默认为1，按顺序处理）
         """
         self.max_concurrent = max_concurrent
-        self.tasks: Dict[str, RedeemTask] = {}  # 所有任务
-        self.queue: asyncio.Queue = asyncio.Queue()  # 任务队列
-        self.processing_count = 0  # 当前处理中的任务数
+        self.tasks: Dict[int, RedeemTask] = {}  # 所有任务（内部任务ID -> 任务）
+        # 任务队列（内部任务ID），按优先级类调度，类内按用户轮转
+        self.queue = FairQueue([priority.name.lower() for priority in TaskPriority])
+        self._active_tasks: Dict[int, int] = {}  # 用户ID -> 未完成的内部任务ID
+        # 处理中的任务（内部任务ID -> (处理该任务的 asyncio.Task, 等待它的工作进程)），按开始处理的先后排列
+        self._processing: Dict[int, Tuple[asyncio.Task, Optional[asyncio.Task]]] = {}
         self._worker_started = False
         self._workers: list = []
+        self._watchdog_task: Optional[asyncio.Task] = None
+
+    @property
+    def processing_count(self) -> int:
+        """当前处理中的任务数"""
+        return len(self._processing)
 
     async def start_workers(self):
         """启动工作进程"""
@@ -61,12 +184,40 @@ class QueueManager:
         for i in range(self.max_concurrent):
             worker = asyncio.create_task(self._worker(i))
             self._workers.append(worker)
+        self._watchdog_task = asyncio.create_task(self._watchdog())
+
+    def resize(self, max_concurrent: int):
+        """
+        调整工作进程数（运行时生效）
+
+        增加时立即启动新的工作进程；减少时多出的工作进程处理完当前任务后退出，
+        进行中的任务不会被中断。
+        """
+        self.max_concurrent = max_concurrent
+        if not self._worker_started:
+            return
+        if max_concurrent < len(self._workers):
+            del self._workers[max_concurrent:]
+        while len(self._workers) < max_concurrent:
+            worker = asyncio.create_task(self._worker(len(self._workers)))
+            self._workers.append(worker)
+
+    def _is_current_worker(self, worker_id: int) -> bool:
+        """工作进程是否仍在工作进程列表中（缩容或被替换后应退出）"""
+        return (
+            self._worker_started
+            and worker_id < len(self._workers)
+            and self._workers[worker_id] is asyncio.current_task()
+        )
 
     async def stop_workers(self):
         """停止工作进程"""
         self._worker_started = False
         for worker in self._workers:
             worker.cancel()
+        if self._watchdog_task is not None:
+            self._watchdog_task.cancel()
+            self._watchdog_task = None
         self._workers.clear()
 
     async def add_task(
@@ -74,6 +225,8 @@ class QueueManager:
         user_id: int,
         username: str,
         quota: int = 500000,
+        priority: TaskPriority = TaskPriority.INTERACTIVE,
+        flow: Optional[Hashable] = None,
     ) -> str:
         """
         添加任务到队列
@@ -82,154 +235,466 @@ class QueueManager:
             user_id: 用户ID
             username: 用户名
             quota: 额度
+            priority: 优先级类
+            flow: 类内轮转的分组（默认按用户），例如批量任务按批次分组
 
         Returns:
-            任务ID
+            对外的任务ID
         """
-        task_id = str(uuid.uuid4())
+        task_id = self._new_task_id()
         task = RedeemTask(
-            task_id=task_id,
+            id=task_id,
             user_id=user_id,
             username=username,
             quota=quota,
+            priority=priority,
+            flow=flow,
+            trace_context=tracer.current_context(),
         )
 
         self.tasks[task_id] = task
-        await self.queue.put(task_id)
+        self._active_tasks[user_id] = task_id
+        self._enqueue(task)
+
+        return task.task_id
+
+    async def run_batch(
+        self, name: str, quota: int, count: int, flow: Hashable
+    ) -> List[str]:
+        """
+        以批量优先级排队申请一批兑换码，并等待处理完成
 
-        return task_id
+        批量任务与实时领取共用工作进程，只有实时领取与重试都处理完后才会被取出，
+        同一类内按 flow 轮转。批量任务不属于任何用户，失败时不回退到旧兑换码池。
+
+        Args:
+            name: 兑换码名称（1-20 个字符）
+            quota: 每个兑换码的额度
+            count: 兑换码数量
+            flow: 类内轮转的分组，例如批量发放任务ID
+
+        Returns:
+            兑换码列表
+
+        Raises:
+            Exception: 处理失败（自动重试后仍失败）
+        """
+        task = RedeemTask(
+            id=self._new_task_id(),
+            user_id=BATCH_USER_ID,
+            username=name,
+            quota=quota,
+            priority=TaskPriority.BULK,
+            flow=flow,
+            trace_context=tracer.current_context(),
+            count=count,
+            done=asyncio.get_running_loop().create_future(),
+        )
+        self.tasks[task.id] = task
+        self._enqueue(task)
+        try:
+            return await task.done
+        except asyncio.CancelledError:
+            self.cancel_task(task)
+            raise
+        finally:
+            self.tasks.pop(task.id, None)
+
+    def _enqueue(self, task: RedeemTask):
+        """把任务放入所属优先级类的队列"""
+        task.queue_seq = self.queue.put_nowait(
+            task.id, task.priority, self._flow_of(task)
+        )
+
+    @staticmethod
+    def _flow_of(task: RedeemTask) -> Hashable:
+        """任务在类内轮转的分组"""
+        return task.user_id if task.flow is None else task.flow
+
+    def _new_task_id(self) -> int:
+        """生成随机的内部任务ID（不可猜测，避免泄露任务数量）"""
+        while True:
+            task_id = secrets.randbits(TASK_ID_BITS)
+            if task_id not in self.tasks:
+                return task_id
 
     async def get_task(self, task_id: str) -> Optional[RedeemTask]:
-        """获取任务信息"""
-        return self.tasks.get(task_id)
+        """根据对外的任务ID获取任务信息"""
+        internal_id = decode_task_id(task_id)
+        return self.tasks.get(internal_id) if internal_id is not None else None
 
     async def get_user_tasks(self, user_id: int) -> list[RedeemTask]:
         """获取用户的所有任务"""
         return [task for task in self.tasks.values() if task.user_id == user_id]
 
+    def get_active_task(self, user_id: int) -> Optional[RedeemTask]:
+        """获取用户尚未完成（等待中或处理中）的任务"""
+        task_id = self._active_tasks.get(user_id)
+        return self.tasks.get(task_id) if task_id is not None else None
+
+    def get_queue_position(self, task: RedeemTask) -> Optional[int]:
+        """
+        估算等待中任务的排队位置（1 表示下一个被处理）
+
+        更高优先级类中排队的任务全部排在前面；同一类内按入队顺序估算。
+        每个用户同时只有一个实时领取任务，轮转顺序与入队顺序一致，
+        因此对实时领取是准确的，对批量任务是近似值。
+
+        Returns:
+            排队位置，任务不在等待中时返回 None
+        """
+        if task.status != TaskStatus.PENDING:
+            return None
+        ahead = sum(self.queue.depth(cls) for cls in range(task.priority))
+        return ahead + max(task.queue_seq - self.queue.dequeued[task.priority], 1)
+
     async def _worker(self, worker_id: int):
         """工作进程"""
-        print(f"队列工作进程 {worker_id} 启动")
+        logger.info("队列工作进程 %d 启动", worker_id)
 
-        while self._worker_started:
+        while self._is_current_worker(worker_id):
             try:
                 # 从队列获取任务
                 task_id = await asyncio.wait_for(self.queue.get(), timeout=1.0)
                 task = self.tasks.get(task_id)
 
-                if not task:
+                if not task or task.status != TaskStatus.PENDING:
                     continue
 
-                # 处理任务
-                await self._process_task(task)
+                # 每个任务在单独的 asyncio.Task 中处理，看门狗可以只取消这一个任务而不影响工作进程；
+                # 任务内的日志都带上 task_id / user_id
+                with log_context(task_id=task.task_id, user_id=task.user_id):
+                    run = asyncio.create_task(
+                        self._process_task(task, asyncio.current_task())
+                    )
+                try:
+                    await asyncio.wait((run,))
+                except asyncio.CancelledError:
+                    run.cancel()
+                    raise
 
             except asyncio.TimeoutError:
                 continue
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                print(f"工作进程 {worker_id} 发生错误: {e}")
+                logger.exception("工作进程 %d 发生错误: %s", worker_id, e)
 
-        print(f"队列工作进程 {worker_id} 停止")
+        logger.info("队列工作进程 %d 停止", worker_id)
 
-    async def _process_task(self, task: RedeemTask):
-        """处理任务"""
-        print(f"开始处理任务 {task.task_id} - 用户: {task.username}")
+    async def _process_task(
+        self, task: RedeemTask, worker: Optional[asyncio.Task] = None
+    ):
+        """处理任务（整个处理过程受 TASK_DEADLINE_SECONDS 限制）"""
+        logger.info("开始处理任务 - 用户: %s", task.username)
 
         task.status = TaskStatus.PROCESSING
-        task.started_at = datetime.now()
-        self.processing_count += 1
+        task.started = time.monotonic()
+        run = asyncio.current_task()
+        self._processing[task.id] = (run, worker)
+        wait_seconds = task.started - task.created
+        QUEUE_WAIT_DURATION.observe(wait_seconds)
+        tracer.record(
+            "queue.wait",
+            task.trace_context,
+            task.created_at.timestamp(),
+            wait_seconds,
+            task_id=task.task_id,
+        )
 
+        deadline = asyncio.timeout(settings.task_deadline_seconds)
         try:
-            # 检查 New API 配置
-            if not settings.newapi_site_url or not settings.newapi_access_token:
-                raise Exception("New API 未配置")
-
-            # 创建 New API 服务
-            newapi_service = NewAPIService(
-                base_url=settings.newapi_site_url,
-                access_token=settings.newapi_access_token,
-                api_user=settings.newapi_user,
+            async with deadline:
+                with tracer.span(
+                    "task.process", parent=task.trace_context, task_id=task.task_id
+                ):
+                    if task.done is not None:
+                        code = await self._create_newapi_batch(task, deadline.when())
+                    else:
+                        try:
+                            code = await self._create_newapi_code(task, deadline.when())
+                        except Exception as e:
+                            if not settings.legacy_pool_fallback:
+                                raise
+                            logger.warning("New API 创建失败，尝试旧兑换码池: %s", e)
+                            code = await self._allocate_legacy_code(task, e)
+        except asyncio.CancelledError:
+            # 工作进程停止；被看门狗回收时任务已经处理过，这里不再重复
+            if self._owns(task, run):
+                self._fail(task, "任务处理被中断")
+            raise
+        except Exception as e:
+            if self._owns(task, run):
+                if deadline.expired():
+                    self._fail(task, f"处理超时（超过 {settings.task_deadline_seconds:g} 秒）")
+                else:
+                    self._fail(task, str(e))
+        else:
+            if self._owns(task, run):
+                self._complete(task, code)
+            else:
+                logger.warning("任务已被看门狗回收，丢弃迟到的兑换码")
+        finally:
+            if self._owns(task, run):
+                del self._processing[task.id]
+
+    def _owns(self, task: RedeemTask, run: asyncio.Task) -> bool:
+        """run 是否仍是该任务当前的处理协程（未被看门狗回收，也不是回收后重试的新一轮）"""
+        entry = self._processing.get(task.id)
+        return entry is not None and entry[0] is run
+
+    def _complete(self, task: RedeemTask, code: Union[str, List[str]]):
+        """标记任务完成（批量任务的兑换码交给等待方，不保存在任务上）"""
+        task.status = TaskStatus.COMPLETED
+        if task.done is None:
+            task.result = code
+        elif not task.done.done():
+            task.done.set_result(code)
+        task.completed = time.monotonic()
+        logger.info(
+            "任务处理完成",
+            extra={
+                "source": task.source,
+                "duration_ms": round((task.completed - task.started) * 1000, 1),
+            },
+        )
+        self._settle(task)
+
+    def _fail(self, task: RedeemTask, error: str):
+        """处理失败：还有重试次数时稍后重新入队，否则标记失败"""
+        task.error = error
+        if task.attempts < settings.queue_retry_attempts:
+            # 稍后以重试优先级重新入队，排在实时领取之后，避免重试风暴挤占新请求
+            task.attempts += 1
+            task.status = TaskStatus.PENDING
+            TASK_SERVICE_DURATION.labels("retry").observe(time.monotonic() - task.started)
+            logger.warning(
+                "任务处理失败，%g 秒后第 %d 次重试: %s",
+                settings.queue_retry_delay,
+                task.attempts,
+                error,
+            )
+            asyncio.get_running_loop().call_later(
+                settings.queue_retry_delay, self._retry, task
             )
+        else:
+            task.status = TaskStatus.FAILED
+            task.completed = time.monotonic()
+            logger.warning("任务处理失败: %s", error)
+            if task.done is not None and not task.done.done():
+                task.done.set_exception(Exception(error))
+            self._settle(task)
+
+    def _settle(self, task: RedeemTask):
+        """任务结束（完成或失败）后的统计与清理"""
+        TASK_SERVICE_DURATION.labels(task.status.value).observe(
+            task.completed - task.started
+        )
+        if self._active_tasks.get(task.user_id) == task.id:
+            del self._active_tasks[task.user_id]
+
+    def _retry(self, task: RedeemTask):
+        """失败的任务以重试优先级重新入队（等待期间被取消的不再入队）"""
+        if task.status != TaskStatus.PENDING:
+            return
+        # 批量任务重试时仍留在批量类，不排到其他重试任务前面
+        if task.priority != TaskPriority.BULK:
+            task.priority = TaskPriority.RETRY
+        self._enqueue(task)
+
+    def cancel_task(self, task: RedeemTask) -> bool:
+        """
+        取消等待中的任务
+
+        Returns:
+            是否已取消（处理中或已结束的任务不能取消）
+        """
+        if task.status != TaskStatus.PENDING:
+            return False
+        self.queue.remove(task.id, task.priority, self._flow_of(task))
+        task.status = TaskStatus.CANCELLED
+        task.completed = time.monotonic()
+        TASKS_CANCELLED.inc()
+        if self._active_tasks.get(task.user_id) == task.id:
+            del self._active_tasks[task.user_id]
+        logger.info("任务已取消", extra={"task_id": task.task_id, "user_id": task.user_id})
+        return True
+
+    async def _watchdog(self):
+        """
+        定期检查卡在 PROCESSING 的任务
 
-            # 调用 New API 创建兑换码
-            # 兑换码名称长度必须在 1-20 之间
-            # 格式：用户名(最多14字符) + "-daily"
-            max_username_len = 14  # "-daily" 占6个字符，总共不超过20
-            truncated_username = (
-                task.username[:max_username_len]
-                if len(task.username) > max_username_len
-                else task.username
+        正常情况下截止时间会让任务结束；超过截止时间 TASK_STUCK_GRACE_SECONDS 秒仍未结束
+        （例如代码吞掉了取消），说明处理协程已经失控：按失败处理（有重试次数时重新入队），
+        取消该任务的协程，并替换等待它的工作进程，处理能力不会因此减少。
+        """
+        while True:
+            await asyncio.sleep(settings.task_watchdog_interval)
+            try:
+                self._reclaim_stuck(time.monotonic())
+            except Exception as e:
+                logger.exception("看门狗检查出错: %s", e)
+
+    def _reclaim_stuck(self, now: float) -> int:
+        """回收卡住的任务，返回回收数量"""
+        cutoff = now - settings.task_deadline_seconds - settings.task_stuck_grace_seconds
+        stuck = []
+        # _processing 按开始处理的先后排列，遇到未超时的任务即可停止
+        for task_id, (run, worker) in self._processing.items():
+            task = self.tasks.get(task_id)
+            if task is not None and task.started > cutoff:
+                break
+            stuck.append((task_id, task, run, worker))
+
+        for task_id, task, run, worker in stuck:
+            del self._processing[task_id]
+            run.cancel()
+            if worker is not None:
+                self._replace_worker(worker)
+            TASKS_RECLAIMED.inc()
+            if task is None or task.status != TaskStatus.PROCESSING:
+                continue
+            logger.error(
+                "任务处理 %.1f 秒仍未结束，由看门狗回收",
+                now - task.started,
+                extra={"task_id": task.task_id, "user_id": task.user_id},
             )
-            redeem_name = f"{truncated_username}-daily"
+            self._fail(task, "处理超时，已由看门狗回收")
+        return len(stuck)
+
+    def _replace_worker(self, worker: asyncio.Task):
+        """用新的工作进程替换可能仍在等待失控任务的工作进程"""
+        worker.cancel()
+        if worker in self._workers:
+            worker_id = self._workers.index(worker)
+            self._workers[worker_id] = asyncio.create_task(self._worker(worker_id))
+
+    async def _create_newapi_code(
+        self, task: RedeemTask, deadline: Optional[float] = None
+    ) -> str:
+        """
+        通过 New API 创建兑换码
 
-            result = await newapi_service.create_redemption_code(
+        Args:
+            task: 任务
+            deadline: 任务的处理时限（事件循环时间），用于划分每次尝试的超时
+        """
+        # 检查 New API 配置
+        if not newapi_pool.configured:
+            raise Exception("New API 未配置")
+
+        # 调用 New API 创建兑换码（由站点池选择站点，失败时换站点重试）
+        # 兑换码名称长度必须在 1-20 之间
+        # 格式：用户名(最多14字符) + "-daily"
+        max_username_len = 14  # "-daily" 占6个字符，总共不超过20
+        truncated_username = (
+            task.username[:max_username_len]
+            if len(task.username) > max_username_len
+            else task.username
+        )
+        redeem_name = f"{truncated_username}-daily"
+
+        with tracer.span("newapi.create_redemption"):
+            result = await newapi_pool.create_redemption_code(
                 quota=task.quota,
                 count=1,
                 name=redeem_name,
+                deadline=deadline,
             )
 
-            # 提取兑换码
-            if not result or "data" not in result:
-                import json
+        # 提取兑换码
+        if not result or "data" not in result:
+            import json
 
-                raise Exception(
-                    f"返回数据格式错误，原始数据: {json.dumps(result, ensure_ascii=False)}"
-                )
+            raise Exception(
+                f"返回数据格式错误，原始数据: {json.dumps(result, ensure_ascii=False)}"
+            )
 
-            codes = result.get("data", [])
-            if not codes or len(codes) == 0:
-                import json
+        codes = result.get("data", [])
+        if not codes or len(codes) == 0:
+            import json
 
-                raise Exception(
-                    f"未返回兑换码，原始数据: {json.dumps(result, ensure_ascii=False)}"
-                )
+            raise Exception(
+                f"未返回兑换码，原始数据: {json.dumps(result, ensure_ascii=False)}"
+            )
 
-            code = codes[0] if isinstance(codes, list) else str(codes)
+        return codes[0] if isinstance(codes, list) else str(codes)
 
-            # 标记任务完成
-            task.status = TaskStatus.COMPLETED
-            task.result = code
-            task.completed_at = datetime.now()
+    async def _create_newapi_batch(
+        self, task: RedeemTask, deadline: Optional[float] = None
+    ) -> List[str]:
+        """
+        通过 New API 申请批量任务的一批兑换码
 
-            print(f"任务 {task.task_id} 处理完成 - 兑换码: {code}")
+        Args:
+            task: 批量任务（username 为兑换码名称）
+            deadline: 任务的处理时限（事件循环时间），用于划分每次尝试的超时
+        """
+        if not newapi_pool.configured:
+            raise Exception("New API 未配置")
 
-        except Exception as e:
-            # 标记任务失败
-            task.status = TaskStatus.FAILED
-            task.error = str(e)
-            task.completed_at = datetime.now()
+        with tracer.span("newapi.create_redemption", count=task.count):
+            result = await newapi_pool.create_redemption_code(
+                quota=task.quota,
+                count=task.count,
+                name=task.username,
+                deadline=deadline,
+            )
 
-            print(f"任务 {task.task_id} 处理失败: {e}")
+        codes = result.get("data") if isinstance(result, dict) else None
+        if not isinstance(codes, list) or len(codes) != task.count:
+            import json
 
-        finally:
-            self.processing_count -= 1
+            raise Exception(
+                f"New API 返回的兑换码数量不符（期望 {task.count} 个），"
+                f"原始数据: {json.dumps(result, ensure_ascii=False)[:200]}"
+            )
+        return codes
+
+    async def _allocate_legacy_code(
+        self, task: RedeemTask, newapi_error: Exception
+    ) -> str:
+        """从旧兑换码池分配兑换码（New API 不可用时的回退）"""
+        with tracer.span("legacy_pool.allocate"):
+            async with async_session_maker() as session:
+                claimed = await allocate_legacy_code(session, task.user_id)
+                if claimed is not None:
+                    await record_legacy_allocation(session)
+                await session.commit()
+
+        if claimed is None:
+            raise Exception(f"{newapi_error}；旧兑换码池已无可用兑换码")
+
+        task.redeem_code_id, code = claimed
+        task.source = "legacy"
+        return code
 
     def get_queue_info(self) -> Dict[str, Any]:
         """获取队列信息"""
-        pending_count = sum(
-            1 for task in self.tasks.values() if task.status == TaskStatus.PENDING
-        )
-        processing_count = sum(
-            1 for task in self.tasks.values() if task.status == TaskStatus.PROCESSING
-        )
-        completed_count = sum(
-            1 for task in self.tasks.values() if task.status == TaskStatus.COMPLETED
-        )
-        failed_count = sum(
-            1 for task in self.tasks.values() if task.status == TaskStatus.FAILED
-        )
+        # 一次遍历统计各状态的任务数
+        counts = Counter(task.status for task in self.tasks.values())
 
         return {
             "total_tasks": len(self.tasks),
-            "pending": pending_count,
-            "processing": processing_count,
-            "completed": completed_count,
-            "failed": failed_count,
+            "pending": counts[TaskStatus.PENDING],
+            "processing": counts[TaskStatus.PROCESSING],
+            "completed": counts[TaskStatus.COMPLETED],
+            "failed": counts[TaskStatus.FAILED],
+            "cancelled": counts[TaskStatus.CANCELLED],
             "queue_size": self.queue.qsize(),
+            "queue_classes": self.queue.depths(),
             "max_concurrent": self.max_concurrent,
+            "workers": len(self._workers),
+            "newapi_backends": newapi_pool.stats(),
         }
 
 
 # 全局队列管理器实例
-queue_manager = QueueManager(max_concurrent=1)
+queue_manager = QueueManager(max_concurrent=settings.queue_max_concurrent)
+
+QUEUE_DEPTH.set_function(lambda: queue_manager.queue.qsize())
+for _priority in TaskPriority:
+    QUEUE_CLASS_DEPTH.labels(_priority.name.lower()).set_function(
+        lambda cls=_priority: queue_manager.queue.depth(cls)
+    )
+TASKS_IN_FLIGHT.set_function(lambda: queue_manager.processing_count)
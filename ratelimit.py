@@ -0,0 +1,194 @@
+"""限流模块 - 基于 GCRA 的内存限流器
+
+GCRA（Generic Cell Rate Algorithm）对每个 key 只保存一个浮点数：
+理论到达时间 TAT。请求到达时若 TAT 距现在不超过突发容量，则放行并把 TAT 向后推一个
+发射间隔，否则拒绝，并能精确算出需要等待多久（用于 Retry-After）。
+
+限流规则按路由模板配置，格式为 "路由=次数/周期"，多条规则用逗号分隔，
+"*" 表示没有单独配置的其他路由（共用一份额度），例如：
+    /api/redeem/daily=5/minute,/api/task/{task_id}=120/minute,*=300/minute
+
+- 按 IP 限流：limit_by_ip 作为全局依赖，在认证之前执行，拦截脚本的无效请求
+- 按用户限流：check_user_limit 在认证（带缓存）之后按用户 ID 执行
+
+key 长时间不活跃时 TAT 会落后于当前时间，此时它的状态与"从未出现"等价，
+可以直接删除；每次请求顺带清理最久未活跃的几个 key，并限制 key 的总数，内存有界。
+"""
+
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from config import settings
+from metrics import REGISTRY
+
+RATE_LIMITED = REGISTRY.counter(
+    "rate_limited_requests", "被限流拒绝的请求数", ("route", "scope")
+)
+
+_PERIODS = {
+    "s": 1,
+    "second": 1,
+    "m": 60,
+    "minute": 60,
+    "h": 3600,
+    "hour": 3600,
+    "d": 86400,
+    "day": 86400,
+}
+
+_RATE_PATTERN = re.compile(r"^(\d+)\s*/\s*(\d*\.?\d*)\s*([a-z]+)$")
+
+# 每次请求最多顺带清理的过期 key 数
+_SWEEP_PER_HIT = 2
+
+
+def parse_rate(spec: str) -> Tuple[int, float]:
+    """
+    解析限流速率
+
+    Args:
+        spec: "次数/周期"，周期为 second/minute/hour/day（或 s/m/h/d），
+            可带倍数，例如 "10/minute"、"3/10s"
+
+    Returns:
+        (次数, 周期秒数)
+    """
+    match = _RATE_PATTERN.match(spec.strip())
+    if not match or match.group(3) not in _PERIODS or int(match.group(1)) <= 0:
+        raise ValueError(f"无效的限流速率: {spec}")
+    count, multiplier, unit = match.groups()
+    return int(count), float(multiplier or 1) * _PERIODS[unit]
+
+
+class RateLimiter:
+    """单条限流规则，按 key 独立计算"""
+
+    def __init__(self, count: int, period: float, max_keys: int = 100000):
+        """
+        Args:
+            count: 周期内允许的请求数（同时也是突发容量）
+            period: 周期（秒）
+            max_keys: 最多跟踪的 key 数量
+        """
+        self.count = count
+        self.period = period
+        self.interval = period / count  # 发射间隔
+        self.tolerance = self.interval * count  # 突发容量
+        self.max_keys = max_keys
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def hit(self, key: str, now: Optional[float] = None) -> float:
+        """
+        记录一次请求
+
+        Args:
+            key: 限流对象（用户 ID 或 IP）
+            now: 当前单调时间，默认 time.monotonic()
+
+        Returns:
+            0 表示放行，否则为需要等待的秒数
+        """
+        if now is None:
+            now = time.monotonic()
+        self._sweep(now)
+
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + self.interval
+        allow_at = new_tat - self.tolerance
+        if allow_at > now:
+            return allow_at - now
+
+        self._tat[key] = new_tat
+        self._tat.move_to_end(key)
+        if len(self._tat) > self.max_keys:
+            # 超出上限时淘汰最久未活跃的 key（相当于让它重新开始计数）
+            self._tat.popitem(last=False)
+        return 0.0
+
+    def _sweep(self, now: float):
+        """清理最久未活跃且已完全恢复的 key"""
+        for _ in range(_SWEEP_PER_HIT):
+            if not self._tat:
+                return
+            key, tat = next(iter(self._tat.items()))
+            if tat > now:
+                return
+            del self._tat[key]
+
+
+def parse_rules(spec: str, max_keys: int) -> Dict[str, RateLimiter]:
+    """
+    解析按路由配置的限流规则
+
+    Args:
+        spec: "路由=次数/周期" 列表，逗号分隔
+        max_keys: 每条规则最多跟踪的 key 数量
+
+    Returns:
+        路由模板 -> 限流器
+    """
+    rules = {}
+    for item in spec.split(","):
+        route, sep, rate = item.strip().rpartition("=")
+        if not sep or not route.strip():
+            continue
+        count, period = parse_rate(rate)
+        rules[route.strip()] = RateLimiter(count, period, max_keys)
+    return rules
+
+
+ip_limiters = parse_rules(settings.rate_limit_ip_routes, settings.rate_limit_max_keys)
+user_limiters = parse_rules(
+    settings.rate_limit_user_routes, settings.rate_limit_max_keys
+)
+
+
+def reload_rules():
+    """按当前配置重新生成限流规则（运行时修改规则后调用，已有的计数会清空）"""
+    global ip_limiters, user_limiters
+    ip_limiters = parse_rules(settings.rate_limit_ip_routes, settings.rate_limit_max_keys)
+    user_limiters = parse_rules(
+        settings.rate_limit_user_routes, settings.rate_limit_max_keys
+    )
+
+
+def _route_path(request: Request) -> str:
+    """请求匹配到的路由模板，例如 /api/task/{task_id}"""
+    route = request.scope.get("route")
+    return getattr(route, "path", request.url.path)
+
+
+def _enforce(limiters: Dict[str, RateLimiter], route: str, key: str, scope: str):
+    """按路由规则检查限流，超限时返回 429"""
+    if not settings.rate_limit_enabled:
+        return
+    rule = route if route in limiters else "*"
+    limiter = limiters.get(rule)
+    if limiter is None:
+        return
+
+    retry_after = limiter.hit(key)
+    if retry_after:
+        RATE_LIMITED.labels(rule, scope).inc()
+        raise HTTPException(
+            status_code=429,
+            detail="请求过于频繁，请稍后再试",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+async def limit_by_ip(request: Request):
+    """按客户端 IP 限流（全局依赖，在认证之前执行）"""
+    client = request.client.host if request.client else "unknown"
+    _enforce(ip_limiters, _route_path(request), client, "ip")
+
+
+def check_user_limit(request: Request, user_id: int):
+    """按用户 ID 限流（认证之后执行）"""
+    _enforce(user_limiters, _route_path(request), str(user_id), "user")
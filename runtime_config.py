@@ -0,0 +1,149 @@
+"""运行时配置模块 - 不重启进程修改部分性能相关配置
+
+重启会丢失内存中的任务队列，因此把常用的性能相关配置开放为运行时可修改：
+管理接口 PATCH /api/admin/settings 按白名单校验后写入全局 settings，再调用
+受影响组件的重新配置钩子（调整工作进程数、重建 HTTP 客户端、重新生成限流规则等）。
+其余配置（密钥、数据库、上游地址等）仍需修改 .env 后重启。
+
+运行时修改只保存在内存中，重启后恢复为 .env 中的值。每次修改都会记录日志，
+最近的修改记录与当前值在 /api/queue/info 的 runtime 中返回。
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from pydantic import TypeAdapter, ValidationError
+from bulk_grant import bulk_grant_runner
+from config import Settings, check_task_deadline, settings
+from newapi_service import BALANCERS, newapi_pool
+from oauth2_service import oauth2_service
+from queue_manager import queue_manager
+from ratelimit import parse_rules, reload_rules
+
+logger = logging.getLogger(__name__)
+
+# 可在运行时修改的配置项 -> 允许的最小值（None 表示不是数值或不限制）
+TUNABLE_SETTINGS: Dict[str, Optional[float]] = {
+    "queue_max_concurrent": 1,
+    "queue_retry_attempts": 0,
+    "queue_retry_delay": 0,
+    "task_deadline_seconds": 0.1,
+    "task_watchdog_interval": 0.1,
+    "task_stuck_grace_seconds": 0,
+    "newapi_redeem_quota": 1,
+    "newapi_timeout": 0.1,
+    "newapi_balancer": None,
+    "newapi_max_attempts": 1,
+    "newapi_eject_failures": 1,
+    "newapi_eject_cooldown": 0,
+    "oauth2_timeout": 0.1,
+    "http_max_connections": 1,
+    "http_max_keepalive_connections": 0,
+    "rate_limit_enabled": None,
+    "rate_limit_ip_routes": None,
+    "rate_limit_user_routes": None,
+    "bulk_grant_batch_size": 1,
+    "health_max_queue_depth": 1,
+}
+
+# 保留的最近修改记录数
+_HISTORY_SIZE = 50
+
+_HTTP_CLIENT_SETTINGS = {"http_max_connections", "http_max_keepalive_connections"}
+
+# (受影响的配置项, 重新配置钩子)；未列出的配置项在每次使用时直接读取 settings，无需钩子
+_HOOKS: List[Tuple[Set[str], Callable[[], None]]] = [
+    ({"queue_max_concurrent"}, lambda: queue_manager.resize(settings.queue_max_concurrent)),
+    ({"oauth2_timeout"} | _HTTP_CLIENT_SETTINGS, oauth2_service.reconfigure),
+    ({"newapi_timeout"} | _HTTP_CLIENT_SETTINGS, newapi_pool.reconfigure_clients),
+    (
+        {
+            "newapi_balancer",
+            "newapi_max_attempts",
+            "newapi_eject_failures",
+            "newapi_eject_cooldown",
+        },
+        newapi_pool.reconfigure,
+    ),
+    ({"rate_limit_ip_routes", "rate_limit_user_routes"}, reload_rules),
+    (
+        {"bulk_grant_batch_size"},
+        lambda: setattr(bulk_grant_runner, "batch_size", settings.bulk_grant_batch_size),
+    ),
+]
+
+# 需要一起校验的配置项：处理时限必须大于 New API 单次超时 × 尝试次数
+_DEADLINE_SETTINGS = ("task_deadline_seconds", "newapi_timeout", "newapi_max_attempts")
+
+_history: Deque[Dict[str, Any]] = deque(maxlen=_HISTORY_SIZE)
+
+
+def _validate(name: str, value: Any) -> Any:
+    """按 Settings 中的类型与白名单中的最小值校验新值，不合法时抛出 ValueError"""
+    if name not in TUNABLE_SETTINGS:
+        raise ValueError(f"{name} 不能在运行时修改")
+    annotation = Settings.model_fields[name].annotation
+    try:
+        value = TypeAdapter(annotation).validate_python(value)
+    except ValidationError as e:
+        raise ValueError(f"{name} 的值无效: {e.errors()[0]['msg']}")
+
+    minimum = TUNABLE_SETTINGS[name]
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} 不能小于 {minimum:g}")
+    if name == "newapi_balancer" and value not in BALANCERS:
+        raise ValueError(f"未知的路由策略: {value}（可选 {', '.join(BALANCERS)}）")
+    if name in ("rate_limit_ip_routes", "rate_limit_user_routes"):
+        # 启动时 parse_rules 会跳过格式不对的项，运行时修改直接拒绝，避免规则悄悄失效
+        for item in filter(None, (item.strip() for item in value.split(","))):
+            route, sep, _ = item.rpartition("=")
+            if not sep or not route.strip():
+                raise ValueError(f"{name} 中的规则格式应为 路由=次数/周期: {item}")
+        parse_rules(value, settings.rate_limit_max_keys)
+    return value
+
+
+def update_settings(changes: Dict[str, Any], source: str) -> Dict[str, Dict[str, Any]]:
+    """
+    修改运行时配置
+
+    先校验全部修改，任何一项不合法时都不会生效。
+
+    Args:
+        changes: 配置项 -> 新值
+        source: 修改来源（记录在日志中，例如客户端 IP）
+
+    Returns:
+        实际发生变化的配置项 -> {"old": 旧值, "new": 新值}
+
+    Raises:
+        ValueError: 配置项不在白名单中或值不合法
+    """
+    validated = {name: _validate(name, value) for name, value in changes.items()}
+    check_task_deadline(
+        **{name: validated.get(name, getattr(settings, name)) for name in _DEADLINE_SETTINGS}
+    )
+
+    applied: Dict[str, Dict[str, Any]] = {}
+    for name, value in validated.items():
+        old = getattr(settings, name)
+        if old == value:
+            continue
+        setattr(settings, name, value)
+        applied[name] = {"old": old, "new": value}
+        _history.append({"name": name, "old": old, "new": value, "at": time.time()})
+        logger.warning("运行时修改配置 %s: %r -> %r（来源 %s）", name, old, value, source)
+
+    for names, hook in _HOOKS:
+        if names & applied.keys():
+            hook()
+    return applied
+
+
+def runtime_settings() -> Dict[str, Any]:
+    """可运行时修改的配置项的当前值与最近的修改记录"""
+    return {
+        "settings": {name: getattr(settings, name) for name in TUNABLE_SETTINGS},
+        "changes": list(_history),
+    }
@@ -0,0 +1,115 @@
+"""接口请求与响应模型
+
+响应模型仅用于 OpenAPI 文档描述响应结构。接口直接返回 FastJSONResponse，
+FastAPI 不会再按这些模型逐字段校验和转换响应数据。
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Generic, List, Optional, TypeVar, Union
+from pydantic import BaseModel, Field
+
+T = TypeVar("T")
+
+
+class ApiResponse(BaseModel, Generic[T]):
+    """统一响应格式"""
+
+    success: bool = True
+    message: Optional[str] = None
+    data: T
+
+
+class ClaimData(BaseModel):
+    """领取任务提交结果"""
+
+    task_id: str
+    status: str
+
+
+class TaskData(BaseModel):
+    """任务状态"""
+
+    task_id: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    queue_position: Optional[int] = None
+    code: Optional[str] = None
+    error: Optional[str] = None
+
+
+class HistoryItem(BaseModel):
+    """兑换历史记录"""
+
+    code: str
+    redeemed_at: datetime
+
+
+class HistoryPage(BaseModel):
+    """兑换历史分页"""
+
+    history: List[HistoryItem]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class DashboardUser(BaseModel):
+    """页面用户信息"""
+
+    id: int
+    username: Optional[str] = None
+    trust_level: Optional[int] = None
+
+
+class DashboardData(BaseModel):
+    """兑换页面聚合状态"""
+
+    user: DashboardUser
+    claimed_today: bool
+    task: Optional[TaskData] = None
+    history: HistoryPage
+
+
+class BootstrapData(BaseModel):
+    """兑换页面启动数据"""
+
+    logged_in: bool
+    username: Optional[str] = None
+    trust_level: Optional[int] = None
+
+
+class BulkGrantUser(BaseModel):
+    """批量发放对象"""
+
+    user_id: int
+    username: Optional[str] = None
+
+
+class BulkGrantRequest(BaseModel):
+    """创建批量发放任务"""
+
+    name: str = Field(min_length=1, max_length=20, description="批次名称，同时作为兑换码名称")
+    quota: int = Field(gt=0, description="每个兑换码的额度")
+    users: List[Union[int, BulkGrantUser]] = Field(
+        min_length=1, description="发放对象：用户ID，或包含 user_id / username 的对象"
+    )
+
+
+class BulkGrantJobData(BaseModel):
+    """批量发放任务状态"""
+
+    job_id: int
+    name: str
+    quota: int
+    status: str
+    total: int
+    processed: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+QueueInfo = Dict[str, Any]
+RuntimeSettings = Dict[str, Any]
+Stats = Dict[str, Any]
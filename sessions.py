@@ -0,0 +1,272 @@
+"""会话模块 - 服务端会话存储
+
+登录成功后生成随机的会话 ID，通过 HttpOnly Cookie 下发给浏览器，access_token 等
+令牌数据只保存在服务端，不再出现在页面或 URL 中。
+
+会话存储可插拔（SESSION_STORE）：
+- memory：进程内 LRU + TTL，默认，重启后需要重新登录
+- sqlite：user_sessions 表，重启后保留，可供同一数据库上的多个进程共享
+
+两种存储都只保存会话 ID 的 SHA-256，过期会话惰性清理：读取到时删除，
+写入时顺带清理（内存存储每次清理最久未活跃的几个，SQLite 存储按间隔批量删除）。
+"""
+
+import hashlib
+import json
+import secrets
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import Request, Response
+from sqlalchemy import text
+from config import settings
+from database import async_session_maker
+
+SESSION_STORES = ("memory", "sqlite")
+
+# 内存存储每次写入最多顺带清理的过期会话数
+_SWEEP_PER_SET = 2
+
+
+def _key(session_id: str) -> str:
+    """存储中使用的键（会话 ID 的 SHA-256，存储泄露时无法直接冒用会话）"""
+    return hashlib.sha256(session_id.encode()).hexdigest()
+
+
+class SessionStore(ABC):
+    """会话存储接口"""
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[dict]:
+        """读取会话数据，不存在或已过期时返回 None"""
+
+    @abstractmethod
+    async def set(self, session_id: str, data: dict, ttl: float):
+        """写入会话数据，ttl 秒后过期"""
+
+    @abstractmethod
+    async def update(self, session_id: str, data: dict) -> bool:
+        """替换会话数据，不改变过期时间；会话不存在或已过期时返回 False"""
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        """删除会话"""
+
+
+class MemorySessionStore(SessionStore):
+    """进程内 LRU + TTL 会话存储"""
+
+    def __init__(self, max_size: int):
+        """
+        Args:
+            max_size: 最多保存的会话数量，超出时淘汰最久未活跃的会话
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        key = _key(session_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    async def set(self, session_id: str, data: dict, ttl: float):
+        now = time.monotonic()
+        self._sweep(now)
+        key = _key(session_id)
+        self._entries[key] = (now + ttl, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def update(self, session_id: str, data: dict) -> bool:
+        key = _key(session_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return False
+        self._entries[key] = (entry[0], data)
+        return True
+
+    async def delete(self, session_id: str):
+        self._entries.pop(_key(session_id), None)
+
+    def _sweep(self, now: float):
+        """清理最久未活跃且已过期的会话"""
+        for _ in range(_SWEEP_PER_SET):
+            if not self._entries:
+                return
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                return
+            del self._entries[key]
+
+
+class SQLiteSessionStore(SessionStore):
+    """保存在 user_sessions 表中的会话存储"""
+
+    def __init__(self, gc_interval: float):
+        """
+        Args:
+            gc_interval: 批量删除过期会话的最小间隔（秒）
+        """
+        self.gc_interval = gc_interval
+        self._last_gc = 0.0
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        key = _key(session_id)
+        async with async_session_maker() as session:
+            row = (
+                await session.execute(
+                    text("SELECT data, expires_at FROM user_sessions WHERE id = :id"),
+                    {"id": key},
+                )
+            ).first()
+            if row is None:
+                return None
+            data, expires_at = row
+            if _parse_datetime(expires_at) <= datetime.now():
+                await session.execute(
+                    text("DELETE FROM user_sessions WHERE id = :id"), {"id": key}
+                )
+                await session.commit()
+                return None
+        return json.loads(data)
+
+    async def set(self, session_id: str, data: dict, ttl: float):
+        now = datetime.now()
+        async with async_session_maker() as session:
+            await session.execute(
+                text(
+                    "INSERT INTO user_sessions (id, user_id, data, expires_at) "
+                    "VALUES (:id, :user_id, :data, :expires_at) "
+                    "ON CONFLICT(id) DO UPDATE SET user_id = excluded.user_id, "
+                    "data = excluded.data, expires_at = excluded.expires_at"
+                ),
+                {
+                    "id": _key(session_id),
+                    "user_id": data.get("user_id"),
+                    "data": json.dumps(data, ensure_ascii=False),
+                    "expires_at": _format_datetime(now + timedelta(seconds=ttl)),
+                },
+            )
+            if time.monotonic() - self._last_gc >= self.gc_interval:
+                self._last_gc = time.monotonic()
+                await session.execute(
+                    text("DELETE FROM user_sessions WHERE expires_at <= :now"),
+                    {"now": _format_datetime(now)},
+                )
+            await session.commit()
+
+    async def update(self, session_id: str, data: dict) -> bool:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                text(
+                    "UPDATE user_sessions SET data = :data "
+                    "WHERE id = :id AND expires_at > :now"
+                ),
+                {
+                    "id": _key(session_id),
+                    "data": json.dumps(data, ensure_ascii=False),
+                    "now": _format_datetime(datetime.now()),
+                },
+            )
+            await session.commit()
+        return result.rowcount > 0
+
+    async def delete(self, session_id: str):
+        async with async_session_maker() as session:
+            await session.execute(
+                text("DELETE FROM user_sessions WHERE id = :id"),
+                {"id": _key(session_id)},
+            )
+            await session.commit()
+
+
+def _format_datetime(value: datetime) -> str:
+    """与 SQLAlchemy 在 SQLite 中保存 DateTime 的格式一致，可直接按字符串比较"""
+    return value.isoformat(sep=" ", timespec="microseconds")
+
+
+def _parse_datetime(value) -> datetime:
+    """SQLite 中的时间以字符串保存"""
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def create_session_store(kind: str) -> SessionStore:
+    """
+    按配置创建会话存储
+
+    Args:
+        kind: memory 或 sqlite
+    """
+    if kind == "memory":
+        return MemorySessionStore(settings.session_max_size)
+    if kind == "sqlite":
+        return SQLiteSessionStore(settings.session_gc_interval)
+    raise ValueError(f"未知的会话存储: {kind}（可选 {', '.join(SESSION_STORES)}）")
+
+
+session_store = create_session_store(settings.session_store)
+
+
+async def create_session(request: Request, response: Response, data: dict) -> str:
+    """
+    创建会话并通过 Cookie 下发会话 ID
+
+    请求中已有的会话会被删除（登录后更换会话 ID）。
+
+    Args:
+        request: 当前请求
+        response: 要设置 Cookie 的响应
+        data: 会话数据（需可 JSON 序列化）
+
+    Returns:
+        会话 ID
+    """
+    old_session_id = get_session_id(request)
+    if old_session_id:
+        await session_store.delete(old_session_id)
+
+    session_id = secrets.token_urlsafe(32)
+    await session_store.set(session_id, data, settings.session_ttl)
+    response.set_cookie(
+        settings.session_cookie_name,
+        session_id,
+        max_age=settings.session_ttl,
+        httponly=True,
+        samesite="lax",
+        secure=settings.session_cookie_secure,
+    )
+    return session_id
+
+
+def get_session_id(request: Request) -> Optional[str]:
+    """当前请求携带的会话 ID"""
+    return request.cookies.get(settings.session_cookie_name)
+
+
+async def load_session(request: Request) -> Optional[dict]:
+    """读取当前请求的会话数据，未登录或会话已过期时返回 None"""
+    session_id = get_session_id(request)
+    if not session_id:
+        return None
+    return await session_store.get(session_id)
+
+
+async def destroy_session(request: Request, response: Response):
+    """删除当前请求的会话并清除 Cookie"""
+    session_id = get_session_id(request)
+    if session_id:
+        await session_store.delete(session_id)
+    response.delete_cookie(settings.session_cookie_name)
@@ -0,0 +1,172 @@
+"""统计服务模块 - 维护物化的库存与领取计数器
+
+计数器以 key/value 形式存放在 stat_counters 表中，由领取、导入等写操作在
+同一事务内增量更新，读取统计时只需按主键读取少量计数器行，不必扫描业务表。
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+INVENTORY_AVAILABLE = "inventory.available"  # 旧兑换码池可用数量
+INVENTORY_USED = "inventory.used"  # 旧兑换码池已使用数量
+CLAIMS_TOTAL = "claims.total"  # 领取总数
+INITIALIZED = "meta.initialized"  # 计数器是否已从业务表回填
+
+_SOURCE_PREFIX = "claims.source."
+_DAY_PREFIX = "claims.day."
+
+_UPSERT_SQL = text(
+    "INSERT INTO stat_counters (key, value) VALUES (:key, :delta) "
+    "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value"
+)
+
+Deltas = Iterable[Tuple[str, int]]
+
+
+def _day_key(day: date, source: Optional[str] = None) -> str:
+    """按天领取计数器名称，可附带来源"""
+    key = f"{_DAY_PREFIX}{day.isoformat()}"
+    return f"{key}.{source}" if source else key
+
+
+def claim_deltas(source: str, when: Optional[datetime] = None) -> Deltas:
+    """一次领取需要更新的计数器"""
+    day = (when or datetime.now()).date()
+    return [
+        (CLAIMS_TOTAL, 1),
+        (f"{_SOURCE_PREFIX}{source}", 1),
+        (_day_key(day), 1),
+        (_day_key(day, source), 1),
+    ]
+
+
+def _params(deltas: Deltas) -> list[Dict[str, Any]]:
+    return [{"key": key, "delta": delta} for key, delta in deltas if delta]
+
+
+async def apply_deltas(session: AsyncSession, deltas: Deltas):
+    """在当前事务中累加计数器（不提交）"""
+    params = _params(deltas)
+    if params:
+        await session.execute(_UPSERT_SQL, params)
+
+
+def apply_deltas_sync(conn: Connection, deltas: Deltas):
+    """在当前同步事务中累加计数器（用于脚本，不提交）"""
+    params = _params(deltas)
+    if params:
+        conn.execute(_UPSERT_SQL, params)
+
+
+async def record_claim(
+    session: AsyncSession, source: str, when: Optional[datetime] = None
+):
+    """记录一次领取（与兑换记录在同一事务内调用）"""
+    await apply_deltas(session, claim_deltas(source, when))
+
+
+async def record_legacy_allocation(session: AsyncSession):
+    """记录旧兑换码池分配出一个兑换码"""
+    await apply_deltas(session, [(INVENTORY_AVAILABLE, -1), (INVENTORY_USED, 1)])
+
+
+def record_import(conn: Connection, inserted: int):
+    """记录导入了新的兑换码"""
+    apply_deltas_sync(conn, [(INVENTORY_AVAILABLE, inserted)])
+
+
+def ensure_counters(conn: Connection):
+    """
+    首次启用计数器时从业务表回填
+
+    只在 meta.initialized 计数器不存在时执行一次全表聚合，之后全部依赖增量更新。
+    """
+    initialized = conn.execute(
+        text("SELECT value FROM stat_counters WHERE key = :key"), {"key": INITIALIZED}
+    ).first()
+    if initialized:
+        return
+
+    total, used = conn.execute(
+        text("SELECT COUNT(*), COALESCE(SUM(is_used), 0) FROM redeem_codes")
+    ).one()
+    deltas = [
+        (INVENTORY_AVAILABLE, total - used),
+        (INVENTORY_USED, used),
+        (INITIALIZED, 1),
+    ]
+
+    rows = conn.execute(
+        text(
+            "SELECT date(redeemed_at) AS day, source, COUNT(*) AS n "
+            "FROM user_redeem_records GROUP BY day, source"
+        )
+    ).all()
+    for row in rows:
+        day = date.fromisoformat(row.day)
+        deltas += [
+            (CLAIMS_TOTAL, row.n),
+            (f"{_SOURCE_PREFIX}{row.source}", row.n),
+            (_day_key(day), row.n),
+            (_day_key(day, row.source), row.n),
+        ]
+
+    apply_deltas_sync(conn, deltas)
+
+
+async def read_stats(session: AsyncSession, days: int = 7) -> Dict[str, Any]:
+    """
+    读取统计信息
+
+    Args:
+        session: 数据库会话
+        days: 返回最近多少天的按天领取数
+
+    Returns:
+        库存与领取统计
+    """
+    today = date.today()
+    since = today - timedelta(days=days - 1)
+    result = await session.execute(
+        text(
+            "SELECT key, value FROM stat_counters "
+            "WHERE key NOT LIKE 'claims.day.%' OR key >= :since"
+        ),
+        {"since": _day_key(since)},
+    )
+    counters = dict(result.all())
+
+    by_source: Dict[str, int] = {}
+    daily: Dict[str, int] = {}
+    today_by_source: Dict[str, int] = {}
+    today_key = today.isoformat()
+    for key, value in counters.items():
+        if key.startswith(_SOURCE_PREFIX):
+            by_source[key[len(_SOURCE_PREFIX) :]] = value
+        elif key.startswith(_DAY_PREFIX):
+            day, _, source = key[len(_DAY_PREFIX) :].partition(".")
+            if not source:
+                daily[day] = value
+            elif day == today_key:
+                today_by_source[source] = value
+
+    available = counters.get(INVENTORY_AVAILABLE, 0)
+    used = counters.get(INVENTORY_USED, 0)
+    return {
+        "inventory": {
+            "available": available,
+            "used": used,
+            "total": available + used,
+        },
+        "claims": {
+            "total": counters.get(CLAIMS_TOTAL, 0),
+            "today": daily.get(today_key, 0),
+            "today_by_source": today_by_source,
+            "by_source": by_source,
+            "daily": dict(sorted(daily.items())),
+        },
+        "generated_at": datetime.now(),
+    }
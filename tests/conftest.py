@@ -0,0 +1,13 @@
+"""单元测试环境准备
+
+在导入 config / database 之前设置必需的环境变量，并把数据库指向临时 SQLite 文件，
+测试不会读取 .env 中的真实配置或触碰真实数据库。
+"""
+
+import os
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="newapi-test-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ.setdefault("OAUTH2_CLIENT_ID", "test")
+os.environ.setdefault("OAUTH2_CLIENT_SECRET", "test")
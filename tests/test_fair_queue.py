@@ -0,0 +1,152 @@
+"""FairQueue：类间严格优先、类内赤字轮转、取消后重新入队"""
+
+import asyncio
+
+import pytest
+
+from fair_queue import FairQueue
+
+
+def drain(queue: FairQueue) -> list:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_strict_priority_between_classes():
+    queue = FairQueue(["interactive", "retry", "bulk"])
+    queue.put_nowait("bulk", 2)
+    queue.put_nowait("retry", 1)
+    queue.put_nowait("interactive", 0)
+
+    assert queue.depths() == {"interactive": 1, "retry": 1, "bulk": 1}
+    assert drain(queue) == ["interactive", "retry", "bulk"]
+
+
+def test_higher_class_preempts_between_dequeues():
+    queue = FairQueue(["interactive", "bulk"])
+    for i in range(3):
+        queue.put_nowait(f"b{i}", 1, flow="job")
+
+    assert queue.get_nowait() == "b0"
+    queue.put_nowait("claim", 0, flow=1)
+    assert drain(queue) == ["claim", "b1", "b2"]
+
+
+def test_flows_take_turns_and_stay_fifo():
+    """同一个流大量入队不会让其他流排在它后面，流内保持入队顺序"""
+    queue = FairQueue(["interactive"])
+    for i in range(4):
+        queue.put_nowait(f"a{i}", flow="a")
+    queue.put_nowait("b0", flow="b")
+    queue.put_nowait("c0", flow="c")
+
+    assert drain(queue) == ["a0", "b0", "c0", "a1", "a2", "a3"]
+
+
+def test_weights_share_dequeues_proportionally():
+    queue = FairQueue(["bulk"])
+    for i in range(4):
+        queue.put_nowait(f"a{i}", flow="a", weight=2)
+        queue.put_nowait(f"b{i}", flow="b")
+
+    assert drain(queue) == ["a0", "a1", "b0", "a2", "a3", "b1", "b2", "b3"]
+
+
+def test_fractional_weight_skips_rounds():
+    queue = FairQueue(["bulk"])
+    for i in range(2):
+        queue.put_nowait(f"slow{i}", flow="slow", weight=0.5)
+    for i in range(4):
+        queue.put_nowait(f"fast{i}", flow="fast")
+
+    # 权重 0.5 的流每两轮才出队一次
+    assert drain(queue) == ["fast0", "slow0", "fast1", "fast2", "slow1", "fast3"]
+
+
+def test_drained_flow_forfeits_deficit():
+    """排空后重新入队的流不保留之前攒下的配额"""
+    queue = FairQueue(["bulk"])
+    queue.put_nowait("a0", flow="a", weight=3)
+    assert drain(queue) == ["a0"]
+    assert queue.flow_count(0) == 0
+
+    queue.put_nowait("a1", flow="a")
+    queue.put_nowait("a2", flow="a")
+    queue.put_nowait("b0", flow="b")
+    assert drain(queue) == ["a1", "b0", "a2"]
+
+
+def test_invalid_weight_rejected():
+    with pytest.raises(ValueError):
+        FairQueue(["bulk"]).put_nowait("x", weight=0)
+
+
+def test_remove_then_put_again():
+    queue = FairQueue(["interactive"])
+    queue.put_nowait("x", flow="a")
+    queue.put_nowait("y", flow="b")
+
+    assert queue.remove("x", flow="a")
+    assert not queue.remove("x", flow="a")
+    assert queue.qsize() == 1
+    assert queue.flow_count(0) == 1
+
+    # 取空的流留在轮转中；重新入队建立新的流，出队时不会重复或丢失元素
+    queue.put_nowait("x", flow="a")
+    assert queue.qsize() == 2
+    assert drain(queue) == ["y", "x"]
+    assert queue.flow_count(0) == 0
+
+
+def test_remove_from_middle_of_flow():
+    queue = FairQueue(["interactive"])
+    for item in ("a0", "a1", "a2"):
+        queue.put_nowait(item, flow="a")
+
+    assert queue.remove("a1", flow="a")
+    assert not queue.remove("a1", cls=0, flow="b")
+    assert drain(queue) == ["a0", "a2"]
+
+
+def test_sequence_numbers_and_counters():
+    queue = FairQueue(["interactive", "bulk"])
+    assert queue.put_nowait("a", 0) == 1
+    assert queue.put_nowait("b", 0, flow="b") == 2
+    assert queue.put_nowait("c", 1) == 1
+
+    queue.remove("b", 0, flow="b")
+    queue.get_nowait()
+    assert queue.dequeued == [2, 0]
+    assert queue.depth(1) == 1
+
+
+def test_get_nowait_on_empty_queue():
+    with pytest.raises(asyncio.QueueEmpty):
+        FairQueue(["interactive"]).get_nowait()
+
+
+def test_get_waits_for_put():
+    async def scenario():
+        queue = FairQueue(["interactive"])
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        queue.put_nowait("x")
+        return await asyncio.wait_for(getter, 1)
+
+    assert asyncio.run(scenario()) == "x"
+
+
+def test_timed_out_getter_does_not_swallow_wakeup():
+    async def scenario():
+        queue = FairQueue(["interactive"])
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(queue.get(), 0.01)
+        waiting = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        queue.put_nowait("x")
+        return await asyncio.wait_for(waiting, 1)
+
+    assert asyncio.run(scenario()) == "x"
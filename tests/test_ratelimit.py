@@ -0,0 +1,109 @@
+"""RateLimiter：GCRA 突发与 Retry-After、key 上限淘汰、过期 key 清理"""
+
+import pytest
+from fastapi import HTTPException
+
+import ratelimit
+from ratelimit import RateLimiter, parse_rate, parse_rules
+
+
+def test_burst_then_retry_after():
+    limiter = RateLimiter(3, 3.0)
+    assert [limiter.hit("ip", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # 突发容量用完后，需要等一个发射间隔
+    assert limiter.hit("ip", now=0.0) == pytest.approx(1.0)
+    assert limiter.hit("ip", now=0.25) == pytest.approx(0.75)
+
+
+def test_rejected_hit_does_not_consume_quota():
+    limiter = RateLimiter(1, 10.0)
+    assert limiter.hit("ip", now=0.0) == 0.0
+    for _ in range(5):
+        assert limiter.hit("ip", now=1.0) == pytest.approx(9.0)
+    # 被拒绝的请求不推迟恢复时间
+    assert limiter.hit("ip", now=10.0) == 0.0
+
+
+def test_quota_recovers_gradually():
+    limiter = RateLimiter(2, 2.0)
+    limiter.hit("ip", now=0.0)
+    limiter.hit("ip", now=0.0)
+    assert limiter.hit("ip", now=0.5) == pytest.approx(0.5)
+    assert limiter.hit("ip", now=1.0) == 0.0
+    assert limiter.hit("ip", now=1.0) == pytest.approx(1.0)
+
+
+def test_keys_are_independent():
+    limiter = RateLimiter(1, 60.0)
+    assert limiter.hit("a", now=0.0) == 0.0
+    assert limiter.hit("a", now=0.0) > 0
+    assert limiter.hit("b", now=0.0) == 0.0
+
+
+def test_max_keys_evicts_least_recently_active():
+    limiter = RateLimiter(1, 60.0, max_keys=2)
+    limiter.hit("a", now=0.0)
+    limiter.hit("b", now=1.0)
+    limiter.hit("c", now=2.0)
+
+    assert len(limiter) == 2
+    # a 被淘汰，相当于重新开始计数
+    assert limiter.hit("a", now=3.0) == 0.0
+    assert limiter.hit("c", now=3.0) > 0
+
+
+def test_sweep_removes_recovered_keys():
+    limiter = RateLimiter(1, 1.0)
+    limiter.hit("a", now=0.0)
+    limiter.hit("b", now=0.0)
+    limiter.hit("c", now=0.0)
+    assert len(limiter) == 3
+
+    # 每次请求最多顺带清理 _SWEEP_PER_HIT 个已恢复的 key
+    limiter.hit("d", now=5.0)
+    assert len(limiter) == 3 - ratelimit._SWEEP_PER_HIT + 1
+
+
+def test_sweep_stops_at_active_key():
+    limiter = RateLimiter(1, 10.0)
+    limiter.hit("old", now=0.0)
+    limiter.hit("recent", now=5.0)
+    # old 已恢复被清理；recent 仍在周期内，清理到此为止
+    limiter.hit("new", now=12.0)
+    assert len(limiter) == 2
+    assert limiter.hit("recent", now=12.0) == pytest.approx(3.0)
+
+
+def test_parse_rate():
+    assert parse_rate("10/minute") == (10, 60.0)
+    assert parse_rate("3/10s") == (3, 10.0)
+    assert parse_rate(" 5 / h ") == (5, 3600.0)
+    for spec in ("0/s", "10/fortnight", "ten/minute", "10"):
+        with pytest.raises(ValueError):
+            parse_rate(spec)
+
+
+def test_parse_rules_skips_items_without_route():
+    rules = parse_rules("/api/a=2/s, *=100/minute, garbage,", max_keys=10)
+    assert set(rules) == {"/api/a", "*"}
+    assert rules["/api/a"].count == 2
+    assert rules["*"].max_keys == 10
+
+
+def test_enforce_rounds_retry_after_up(monkeypatch):
+    monkeypatch.setattr(ratelimit.settings, "rate_limit_enabled", True)
+    limiters = {"*": RateLimiter(1, 10.0)}
+
+    ratelimit._enforce(limiters, "/api/any", "ip", "ip")
+    with pytest.raises(HTTPException) as excinfo:
+        ratelimit._enforce(limiters, "/api/any", "ip", "ip")
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "10"
+
+
+def test_enforce_disabled(monkeypatch):
+    monkeypatch.setattr(ratelimit.settings, "rate_limit_enabled", False)
+    limiters = {"*": RateLimiter(1, 10.0)}
+    for _ in range(3):
+        ratelimit._enforce(limiters, "/api/any", "ip", "ip")
+    assert len(limiters["*"]) == 0
@@ -0,0 +1,138 @@
+"""MemorySessionStore：TTL 过期、LRU 淘汰、过期会话清理"""
+
+import asyncio
+
+import pytest
+
+import sessions
+from sessions import MemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(sessions, "time", fake)
+    return fake
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_get_returns_data_until_expiry(clock):
+    store = MemorySessionStore(max_size=10)
+    run(store.set("sid", {"user_id": 1}, ttl=10))
+
+    clock.now = 9.9
+    assert run(store.get("sid")) == {"user_id": 1}
+    clock.now = 10.0
+    assert run(store.get("sid")) is None
+    # 读到过期会话时顺便删除
+    assert len(store) == 0
+
+
+def test_session_id_is_not_stored_in_plain_text(clock):
+    store = MemorySessionStore(max_size=10)
+    run(store.set("secret-session-id", {}, ttl=10))
+    assert "secret-session-id" not in store._entries
+
+
+def test_lru_evicts_least_recently_active(clock):
+    store = MemorySessionStore(max_size=2)
+    run(store.set("a", {"n": "a"}, ttl=100))
+    run(store.set("b", {"n": "b"}, ttl=100))
+    # 读取 a 使它成为最近活跃，超出上限时淘汰 b
+    run(store.get("a"))
+    run(store.set("c", {"n": "c"}, ttl=100))
+
+    assert len(store) == 2
+    assert run(store.get("b")) is None
+    assert run(store.get("a")) == {"n": "a"}
+    assert run(store.get("c")) == {"n": "c"}
+
+
+def test_set_existing_session_refreshes_ttl(clock):
+    store = MemorySessionStore(max_size=10)
+    run(store.set("sid", {"v": 1}, ttl=10))
+    clock.now = 8
+    run(store.set("sid", {"v": 2}, ttl=10))
+
+    clock.now = 15
+    assert run(store.get("sid")) == {"v": 2}
+    assert len(store) == 1
+
+
+def test_update_keeps_expiry(clock):
+    store = MemorySessionStore(max_size=10)
+    run(store.set("sid", {"v": 1}, ttl=10))
+
+    clock.now = 5
+    assert run(store.update("sid", {"v": 2}))
+    assert run(store.get("sid")) == {"v": 2}
+    clock.now = 10
+    assert run(store.get("sid")) is None
+
+
+def test_update_expired_or_missing_session(clock):
+    store = MemorySessionStore(max_size=10)
+    run(store.set("sid", {"v": 1}, ttl=10))
+
+    clock.now = 10
+    assert not run(store.update("sid", {"v": 2}))
+    assert not run(store.update("missing", {"v": 2}))
+    # 过期会话不会因为 update 复活
+    assert run(store.get("sid")) is None
+
+
+def test_delete(clock):
+    store = MemorySessionStore(max_size=10)
+    run(store.set("sid", {}, ttl=10))
+    run(store.delete("sid"))
+    run(store.delete("sid"))
+    assert run(store.get("sid")) is None
+
+
+def test_set_sweeps_expired_sessions(clock):
+    store = MemorySessionStore(max_size=10)
+    for sid in ("a", "b", "c"):
+        run(store.set(sid, {}, ttl=1))
+
+    clock.now = 2
+    # 每次写入最多顺带清理 _SWEEP_PER_SET 个过期会话
+    run(store.set("d", {}, ttl=1))
+    assert len(store) == 3 - sessions._SWEEP_PER_SET + 1
+    run(store.set("e", {}, ttl=1))
+    assert len(store) == 2
+
+
+def test_sweep_stops_at_unexpired_head(clock):
+    store = MemorySessionStore(max_size=10)
+    run(store.set("long", {}, ttl=100))
+    run(store.set("short", {}, ttl=1))
+
+    clock.now = 2
+    run(store.set("new", {}, ttl=1))
+    # 清理从最久未活跃的会话开始，遇到未过期的即停止；过期的 short 在读取时才删除
+    assert len(store) == 3
+    assert run(store.get("short")) is None
+    assert len(store) == 2
+
+
+def test_backend_missing_a_method_fails_on_creation():
+    class Incomplete(SessionStore):
+        async def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    # 内置的两种存储实现了全部接口
+    MemorySessionStore(max_size=1)
+    SQLiteSessionStore(gc_interval=60)
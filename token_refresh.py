@@ -0,0 +1,254 @@
+"""access token 主动刷新模块
+
+登录时把会话按 access token 的过期时间放入最小堆，后台协程在过期前
+TOKEN_REFRESH_LEAD_SECONDS 秒（再随机提前 0~TOKEN_REFRESH_JITTER_SECONDS 秒，
+避免同一时段登录的大量会话同时刷新）用 refresh_token 换取新的 token 并写回会话，
+用户下次打开页面时不必重新走 OAuth2 授权跳转。
+
+- 同时进行的刷新请求数不超过 TOKEN_REFRESH_CONCURRENCY
+- 网络错误或上游 5xx 时按 TOKEN_REFRESH_RETRY_SECONDS 重试，直到 token 过期
+- 上游拒绝（4xx，例如 refresh_token 已失效）时在会话中记录 refresh_failed，
+  之后不再刷新也不再加入调度，token 过期后用户重新登录
+- token 已过期仍刷新失败（网络错误或 5xx）时，请求路径上的兜底刷新同样按重试间隔退避
+- 会话被删除或淘汰后，堆中的条目在到期时自动丢弃
+
+进程重启后（SQLITE 会话存储）堆为空，会话在下一次请求时由 ensure_fresh 重新加入。
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import httpx
+from config import settings
+from metrics import REGISTRY
+from oauth2_service import oauth2_service
+from sessions import session_store
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REFRESHES = REGISTRY.counter(
+    "token_refreshes", "access token 主动刷新次数", ("result",)
+)
+
+
+class TokenRefresher:
+    """按过期时间排序的 token 刷新调度器"""
+
+    def __init__(
+        self,
+        lead: float,
+        jitter: float,
+        concurrency: int,
+        retry_delay: float,
+    ):
+        """
+        Args:
+            lead: 在过期前多少秒刷新
+            jitter: 在 lead 基础上再随机提前的最大秒数
+            concurrency: 同时进行的刷新请求数上限
+            retry_delay: 可重试的失败之后多久再试（秒）
+        """
+        self.lead = lead
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.retry_delay = retry_delay
+        self._heap: List[Tuple[float, str]] = []  # (计划刷新时间, 会话 ID)
+        self._due: Dict[str, float] = {}  # 会话 ID -> 当前有效的计划刷新时间
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # 会话 ID -> 过期后刷新失败时，下一次允许在请求路径上刷新的时间
+        self._backoff: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, session_id: str, expires_at: float):
+        """
+        按 access token 的过期时间安排刷新
+
+        Args:
+            session_id: 会话 ID
+            expires_at: access token 过期时间（Unix 时间戳）
+        """
+        due = expires_at - self.lead - random.uniform(0, self.jitter)
+        self._push(session_id, due)
+
+    def _push(self, session_id: str, due: float):
+        # 旧条目不从堆中删除，弹出时与 _due 不一致即丢弃
+        self._due[session_id] = due
+        heapq.heappush(self._heap, (due, session_id))
+        self._wake.set()
+
+    def unschedule(self, session_id: str):
+        """取消会话的刷新计划"""
+        self._due.pop(session_id, None)
+        self._backoff.pop(session_id, None)
+
+    def _pop_due(self, now: float) -> Optional[str]:
+        """弹出一个已到期的会话，没有则返回 None"""
+        while self._heap and self._heap[0][0] <= now:
+            due, session_id = heapq.heappop(self._heap)
+            if self._due.get(session_id) == due:
+                del self._due[session_id]
+                return session_id
+        return None
+
+    def _next_due(self) -> Optional[float]:
+        """最近的计划刷新时间（顺带清理堆顶的过期条目）"""
+        while self._heap:
+            due, session_id = self._heap[0]
+            if self._due.get(session_id) == due:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def start(self):
+        """启动后台调度协程"""
+        if self._runner is not None:
+            return
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._wake = asyncio.Event()
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止调度并取消进行中的刷新"""
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(self._runner, *self._tasks, return_exceptions=True)
+        self._runner = None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            due = self._next_due()
+            delay = None if due is None else due - time.time()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # 先占用并发名额再出堆，刷新跟不上时到期的会话留在堆中排队
+            await self._semaphore.acquire()
+            session_id = self._pop_due(time.time())
+            if session_id is None:
+                self._semaphore.release()
+                continue
+            task = asyncio.create_task(self._refresh_and_release(session_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_and_release(self, session_id: str):
+        try:
+            await self.refresh(session_id)
+        finally:
+            self._semaphore.release()
+
+    async def refresh(self, session_id: str) -> Optional[dict]:
+        """
+        立即刷新会话的 access token（同一会话同时只有一个刷新请求）
+
+        Returns:
+            刷新后的会话数据，失败或会话不存在时返回 None
+        """
+        task = self._in_flight.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(session_id))
+            self._in_flight[session_id] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(session_id, None))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, session_id: str) -> Optional[dict]:
+        data = await session_store.get(session_id)
+        if not data or not data.get("refresh_token") or data.get("refresh_failed"):
+            return None
+
+        try:
+            token_data = await oauth2_service.refresh_access_token(
+                data["refresh_token"]
+            )
+        except Exception as e:
+            retryable = not (
+                isinstance(e, httpx.HTTPStatusError)
+                and e.response.status_code < 500
+            )
+            retry_at = time.time() + self.retry_delay * random.uniform(0.5, 1.5)
+            if not retryable:
+                # refresh_token 已被上游拒绝，重试也不会成功：记录在会话中，直到重新登录
+                TOKEN_REFRESHES.labels("failed").inc()
+                logger.warning(
+                    "刷新 access token 被拒绝，等待重新登录: %s",
+                    e,
+                    extra={"user_id": data.get("user_id")},
+                )
+                await session_store.update(session_id, {**data, "refresh_failed": True})
+            elif retry_at < data.get("expires_at", 0):
+                TOKEN_REFRESHES.labels("retry").inc()
+                logger.warning("刷新 access token 失败，稍后重试: %s", e)
+                self._push(session_id, retry_at)
+            else:
+                # token 已过期，不再后台重试；请求路径上的兜底刷新也要等到 retry_at 之后
+                TOKEN_REFRESHES.labels("failed").inc()
+                logger.warning(
+                    "刷新 access token 失败: %s", e, extra={"user_id": data.get("user_id")}
+                )
+                self._backoff[session_id] = retry_at
+            return None
+
+        data = {
+            **data,
+            "access_token": token_data["access_token"],
+            "refresh_token": token_data.get("refresh_token", data["refresh_token"]),
+            "expires_at": time.time() + token_data.get("expires_in", 3600),
+        }
+        if not await session_store.update(session_id, data):
+            # 刷新期间会话已被删除或过期
+            return None
+        TOKEN_REFRESHES.labels("ok").inc()
+        self._backoff.pop(session_id, None)
+        self.schedule(session_id, data["expires_at"])
+        return data
+
+    async def ensure_fresh(self, session_id: str, data: dict) -> dict:
+        """
+        请求路径上的兜底：token 已过期时立即刷新，未在调度中的会话补充加入调度
+
+        Args:
+            session_id: 会话 ID
+            data: 当前会话数据
+
+        Returns:
+            可用的会话数据（刷新失败时原样返回）
+        """
+        expires_at = data.get("expires_at")
+        if expires_at is None or not settings.token_refresh_enabled:
+            return data
+        if data.get("refresh_failed"):
+            # 上游已拒绝 refresh_token，每次请求都重新刷新只会放大上游请求
+            return data
+        now = time.time()
+        if expires_at <= now:
+            if self._backoff.get(session_id, 0) > now:
+                return data
+            return await self.refresh(session_id) or data
+        if session_id not in self._due and session_id not in self._in_flight:
+            self.schedule(session_id, expires_at)
+        return data
+
+
+token_refresher = TokenRefresher(
+    lead=settings.token_refresh_lead_seconds,
+    jitter=settings.token_refresh_jitter_seconds,
+    concurrency=settings.token_refresh_concurrency,
+    retry_delay=settings.token_refresh_retry_seconds,
+)
@@ -0,0 +1,102 @@
+"""链路追踪报告脚本 - 汇总 NDJSON trace 文件中最慢的 trace"""
+
+import argparse
+import glob
+import json
+import logging
+import sys
+from collections import defaultdict
+from typing import Dict, List
+from config import settings
+from logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def _trace_files(path: str) -> List[str]:
+    """trace 文件及其滚动产生的历史文件"""
+    return sorted(glob.glob(f"{glob.escape(path)}*"))
+
+
+def load_traces(files: List[str]) -> Dict[str, List[dict]]:
+    """按 trace_id 归并 span"""
+    traces: Dict[str, List[dict]] = defaultdict(list)
+    for file_path in files:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def _trace_duration(spans: List[dict]) -> float:
+    """trace 总耗时（毫秒）：最早开始到最晚结束"""
+    start = min(span["start"] for span in spans)
+    end = max(span["start"] + span["duration_ms"] / 1000 for span in spans)
+    return (end - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总最慢的兑换流程 trace")
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help=f"trace 文件（默认读取 {settings.trace_file} 及其滚动文件）",
+    )
+    parser.add_argument("--top", type=int, default=10, help="显示最慢的多少条 trace")
+    parser.add_argument("--root", default="claim", help="只统计包含该 span 的 trace")
+    args = parser.parse_args()
+    # 报告本身输出到标准输出，日志写到标准错误
+    setup_logging(log_format="text", stream=sys.stderr)
+
+    files = args.files or _trace_files(settings.trace_file)
+    if not files:
+        logger.error("❌ 没有找到 trace 文件: %s", settings.trace_file)
+        return
+
+    traces = load_traces(files)
+    candidates = [
+        (trace_id, spans, _trace_duration(spans))
+        for trace_id, spans in traces.items()
+        if not args.root or any(span["name"] == args.root for span in spans)
+    ]
+    if not candidates:
+        logger.error("❌ 没有符合条件的 trace")
+        return
+
+    candidates.sort(key=lambda item: item[2], reverse=True)
+
+    # 各阶段耗时汇总
+    stages: Dict[str, List[float]] = defaultdict(list)
+    for _, spans, _ in candidates:
+        for span in spans:
+            stages[span["name"]].append(span["duration_ms"])
+
+    print(f"📊 共 {len(candidates)} 条 trace（来自 {len(files)} 个文件）\n")
+    print(f"{'阶段':<28}{'次数':>8}{'p50(ms)':>12}{'p99(ms)':>12}{'max(ms)':>12}")
+    for name, durations in sorted(stages.items()):
+        durations.sort()
+        p50 = durations[len(durations) // 2]
+        p99 = durations[min(int(len(durations) * 0.99), len(durations) - 1)]
+        print(f"{name:<28}{len(durations):>8}{p50:>12.2f}{p99:>12.2f}{durations[-1]:>12.2f}")
+
+    print(f"\n🐢 最慢的 {min(args.top, len(candidates))} 条 trace:")
+    for trace_id, spans, duration in candidates[: args.top]:
+        start = min(span["start"] for span in spans)
+        print(f"\n{trace_id}  总耗时 {duration:.2f} ms")
+        for span in sorted(spans, key=lambda s: s["start"]):
+            offset = (span["start"] - start) * 1000
+            flag = " ❌" if span.get("status") == "error" else ""
+            print(
+                f"  +{offset:>9.2f} ms  {span['name']:<28}{span['duration_ms']:>10.2f} ms{flag}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""链路追踪模块 - 记录兑换流程各阶段耗时
+
+一次领取会产生一条 trace：
+claim（请求） → auth / db.check_claimed / queue.enqueue
+→ queue.wait → task.process → newapi.create_redemption / legacy_pool.allocate
+→ db.persist_record（查询任务状态时保存记录）
+
+span 上下文通过 contextvars 在同一协程链内传递，跨越队列时保存在 RedeemTask 上。
+采样在根 span 决定，子 span 继承；未采样的 trace 只传递上下文，不产生任何记录。
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import secrets
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+import httpx
+from config import settings
+from http_client import create_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
+class SpanContext:
+    """跨协程、跨队列传递的 span 上下文"""
+
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+class Span:
+    """一个计时阶段"""
+
+    __slots__ = (
+        "name",
+        "context",
+        "parent_id",
+        "start_time",
+        "_started",
+        "duration",
+        "attributes",
+        "status",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        context: SpanContext,
+        parent_id: Optional[str],
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes = attributes or {}
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class NDJSONFileExporter:
+    """
+    写入本地滚动 NDJSON 文件，每行一个 span
+
+    与应用日志相同，span 经 QueueHandler 放入内存队列，由 QueueListener 在后台线程中
+    写入文件，事件循环上不做磁盘 IO（包括滚动文件时的重命名）。
+    """
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        self._logger = logging.getLogger(f"{__name__}.spans")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        self._file_handler.setFormatter(logging.Formatter("%(message)s"))
+        span_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._logger.addHandler(logging.handlers.QueueHandler(span_queue))
+        self._listener = logging.handlers.QueueListener(span_queue, self._file_handler)
+        self._started = False
+
+    def export(self, span: Span):
+        self._logger.info(json.dumps(span.to_dict(), ensure_ascii=False))
+
+    async def start(self):
+        if not self._started:
+            self._listener.start()
+            self._started = True
+
+    async def stop(self):
+        if self._started:
+            # 写出队列中剩余的 span 后结束监听线程
+            self._listener.stop()
+            self._started = False
+        self._file_handler.close()
+
+
+class OTLPHTTPExporter:
+    """以 OTLP/HTTP JSON 格式批量发送到 collector"""
+
+    def __init__(self, endpoint: str, flush_interval: float = 5.0, max_batch: int = 512):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._buffer: List[Span] = []
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def export(self, span: Span):
+        self._buffer.append(span)
+        if len(self._buffer) > self.max_batch * 4:
+            # collector 不可用时丢弃最旧的 span，避免内存无限增长
+            del self._buffer[: self.max_batch]
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        otlp_spans = []
+        for span in spans:
+            start_ns = int(span.start_time * 1e9)
+            otlp_spans.append(
+                {
+                    "traceId": span.context.trace_id,
+                    "spanId": span.context.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(start_ns),
+                    "endTimeUnixNano": str(start_ns + int((span.duration or 0) * 1e9)),
+                    "attributes": [
+                        self._attribute(k, v) for k, v in span.attributes.items()
+                    ],
+                    "status": {"code": 2 if span.status == "error" else 1},
+                }
+            )
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [self._attribute("service.name", "newapi-check")]
+                    },
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}],
+                }
+            ]
+        }
+
+    async def flush(self):
+        """发送缓冲区中的 span；发送失败（含 collector 返回错误状态）时保留本批，下次重试"""
+        if self._client is None:
+            self._client = create_client(10.0)
+        while self._buffer:
+            batch = self._buffer[: self.max_batch]
+            try:
+                response = await self._client.post(self.url, json=self._payload(batch))
+                response.raise_for_status()
+            except Exception as e:
+                logger.warning("发送 trace 失败: %s", e)
+                return
+            del self._buffer[: len(batch)]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_current: contextvars.ContextVar[Optional[SpanContext]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Tracer:
+    """span 的创建、采样与导出"""
+
+    def __init__(self, exporter=None, sample_rate: float = 0.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+
+    @staticmethod
+    def current_context() -> Optional[SpanContext]:
+        """当前协程中的 span 上下文"""
+        return _current.get()
+
+    def _new_context(self, parent: Optional[SpanContext]) -> SpanContext:
+        if parent is None:
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+            return SpanContext(secrets.token_hex(16), secrets.token_hex(8), sampled)
+        return SpanContext(parent.trace_id, secrets.token_hex(8), parent.sampled)
+
+    @contextmanager
+    def span(
+        self, name: str, parent: Optional[SpanContext] = None, **attributes
+    ) -> Iterator[Optional[Span]]:
+        """
+        记录一个阶段
+
+        Args:
+            name: 阶段名称
+            parent: 父 span 上下文，为空时使用当前协程中的 span
+            attributes: span 属性
+
+        Yields:
+            采样时返回 Span，否则返回 None
+        """
+        if self.sample_rate <= 0:
+            yield None
+            return
+
+        parent = parent or _current.get()
+        context = self._new_context(parent)
+        token = _current.set(context)
+        span = (
+            Span(name, context, parent.span_id if parent else None, attributes)
+            if context.sampled
+            else None
+        )
+        try:
+            yield span
+        except BaseException as e:
+            if span is not None:
+                span.status = "error"
+                span.set_attribute("error", str(e) or type(e).__name__)
+            raise
+        finally:
+            _current.reset(token)
+            if span is not None:
+                span.finish()
+                self.exporter.export(span)
+
+    def record(
+        self,
+        name: str,
+        parent: Optional[SpanContext],
+        start_time: float,
+        duration: float,
+        **attributes,
+    ):
+        """事后补记一个已经结束的阶段（例如排队等待）"""
+        if parent is None or not parent.sampled or self.sample_rate <= 0:
+            return
+        span = Span(name, self._new_context(parent), parent.span_id, attributes)
+        span.start_time = start_time
+        span.duration = duration
+        self.exporter.export(span)
+
+    async def start(self):
+        if self.exporter is not None:
+            await self.exporter.start()
+
+    async def stop(self):
+        if self.exporter is not None:
+            await self.exporter.stop()
+
+
+def _build_exporter():
+    if settings.trace_sample_rate <= 0:
+        return None
+    if settings.trace_exporter == "otlp":
+        if not settings.trace_otlp_endpoint:
+            raise ValueError("TRACE_EXPORTER=otlp 需要配置 TRACE_OTLP_ENDPOINT")
+        return OTLPHTTPExporter(settings.trace_otlp_endpoint)
+    return NDJSONFileExporter(
+        settings.trace_file,
+        settings.trace_file_max_bytes,
+        settings.trace_file_backup_count,
+    )
+
+
+# 全局 tracer 实例
+tracer = Tracer(_build_exporter(), settings.trace_sample_rate)
@@ -0,0 +1,95 @@
+"""启动预热模块 - 在开始接收请求前建立连接、填充缓存
+
+冷启动后的第一批请求明显更慢：数据库连接池是空的，上游 HTTP 客户端还没有建立 TLS 连接，
+SQLAlchemy 还没有编译热点查询，就绪检查也还没有探测结果（返回 not_probed）。
+预热在启动事件中完成，而 uvicorn 在启动事件结束后才开始接收请求，
+因此实例对外可见时第一次 /health/ready 就已就绪。
+
+预热失败（例如上游不可达）只记录日志，不阻止启动；整个预热受 STARTUP_WARMUP_TIMEOUT 限制。
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack, contextmanager
+from typing import Any, Awaitable, Callable, Iterator, Sequence
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+from database import async_engine, async_session_maker
+from health import health_prober
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+STARTUP_DURATION = REGISTRY.gauge(
+    "app_startup_phase_seconds", "启动各阶段耗时（秒）", ("phase",)
+)
+
+# 热点查询：接收会话的协程函数
+Query = Callable[[AsyncSession], Awaitable[Any]]
+
+
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    """记录一个启动阶段的耗时"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STARTUP_DURATION.labels(name).set(elapsed)
+        logger.info("启动阶段 %s 用时 %.1f ms", name, elapsed * 1000)
+
+
+async def warm_database_pool() -> int:
+    """
+    建立连接池保持的全部连接
+
+    Returns:
+        建立的连接数
+    """
+    size = async_engine.pool.size() if hasattr(async_engine.pool, "size") else 1
+    async with AsyncExitStack() as stack:
+        for _ in range(size):
+            conn = await stack.enter_async_context(async_engine.connect())
+            await conn.execute(text("SELECT 1"))
+    return size
+
+
+async def warm_queries(queries: Sequence[Query]):
+    """执行一次热点查询，填充 SQLAlchemy 的语句编译缓存"""
+    async with async_session_maker() as session:
+        for query in queries:
+            await query(session)
+
+
+async def _step(name: str, awaitable: Awaitable[Any]):
+    with startup_phase(f"warmup.{name}"):
+        try:
+            await awaitable
+        except Exception as e:
+            logger.warning("启动预热 %s 失败: %s", name, e)
+
+
+async def warm_up(queries: Sequence[Query] = ()):
+    """
+    启动预热
+
+    先填满数据库连接池，再并发执行热点查询与一轮健康探测（探测通过共用的客户端
+    请求 OAuth2 与每个 New API 站点，同时建立了上游连接并填充就绪检查结果）。
+
+    Args:
+        queries: 热点查询，应使用不存在的用户等不会修改数据的参数
+    """
+    try:
+        async with asyncio.timeout(settings.startup_warmup_timeout):
+            await _step("database_pool", warm_database_pool())
+            await asyncio.gather(
+                _step("queries", warm_queries(queries)),
+                _step("upstreams", health_prober.probe()),
+            )
+    except TimeoutError:
+        logger.warning(
+            "启动预热超过 %s 秒，跳过剩余步骤", settings.startup_warmup_timeout
+        )